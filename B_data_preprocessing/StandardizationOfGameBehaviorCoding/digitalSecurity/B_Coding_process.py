@@ -3,7 +3,8 @@ import numpy as np
 import re
 from collections import defaultdict
 import os
-import json
+
+from D_web_export import export_web_data, WEB_DATA_DIR
 
 # 行为映射规则（基于事件类型）
 BEHAVIOR_MAPPING = {
@@ -38,6 +39,9 @@ BEHAVIOR_MAPPING = {
 }
 
 
+# 第一轮答题详情字段（每题一组：Q1_correct、Q1_attempts、Q1_answer_time、Q1_feedbackProcess_time）
+QA_DETAIL_FIELDS = ["correct", "attempts", "answer_time", "feedbackProcess_time"]
+
 # 正确答案（第四关）
 CORRECT_ANSWERS = {
     'Q1': ['C'], 
@@ -110,6 +114,72 @@ def parse_behavior_sequence(sequence_str, game_round):
     return events
 
 
+def build_coded_event_table(raw_df):
+    """将全部学生各轮行为序列一次性展开为编码事件长表（与 parse_behavior_sequence 逐条解析结果一致）
+
+    每行一个事件：row_idx（raw_df 中的行位置）、Class、StuNum、game_round、event_idx（轮内序号）、
+    event_code、timestamp、duration、category、subcategory
+    """
+    columns = ["row_idx", "Class", "StuNum", "game_round", "event_idx", "event_code",
+               "timestamp", "duration", "category", "subcategory"]
+    frames = []
+    for round_idx in range(1, 6):
+        seq_col = f"BehaviorSeqStr_{round_idx}"
+        if seq_col not in raw_df.columns:
+            continue
+        seq = raw_df[seq_col].reset_index(drop=True)
+        valid = seq.notna() & (seq.astype(str).str.strip() != "")
+        if not valid.any():
+            continue
+
+        # 按"/"（关卡）和";"（事件）切分，只保留"代码:整数时间戳"形式的事件
+        tokens = seq[valid].astype(str).str.strip().str.strip("/").str.split(r"[/;]", regex=True).explode()
+        tokens = tokens.str.strip()
+        tokens = tokens[tokens.notna() & tokens.str.contains(":", regex=False)]
+        if tokens.empty:
+            continue
+        parts = tokens.str.split(":", n=1, expand=True)
+        parts = parts[parts[1].str.fullmatch(r"\s*[+-]?\d+\s*").fillna(False).astype(bool)]
+
+        frames.append(pd.DataFrame({
+            "row_idx": parts.index.to_numpy(),
+            "game_round": round_idx,
+            "event_code": parts[0].to_numpy(),
+            "timestamp": parts[1].astype(int).to_numpy(),
+        }))
+
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    events = pd.concat(frames, ignore_index=True)
+
+    # 每轮内按时间戳稳定排序（相同时间戳保留原始顺序）
+    order = np.lexsort((np.arange(len(events)), events["timestamp"].to_numpy(),
+                        events["game_round"].to_numpy(), events["row_idx"].to_numpy()))
+    events = events.iloc[order].reset_index(drop=True)
+
+    # 轮内序号与持续时间：每轮第一个事件的持续时间取其时间戳，其余取与前一事件的时间差
+    row_idx = events["row_idx"].to_numpy()
+    game_round = events["game_round"].to_numpy()
+    ts = events["timestamp"].to_numpy()
+    first = np.ones(len(events), dtype=bool)
+    first[1:] = (row_idx[1:] != row_idx[:-1]) | (game_round[1:] != game_round[:-1])
+    run_start = np.maximum.accumulate(np.where(first, np.arange(len(events)), 0))
+    events["event_idx"] = np.arange(len(events)) - run_start
+    duration = ts.copy()
+    later = np.flatnonzero(~first)
+    duration[later] = ts[later] - ts[later - 1]
+    events["duration"] = duration
+
+    # 行为编码：每个不同的事件代码只匹配一次规则
+    codes = events["event_code"].unique()
+    coded = {code: classify_event(code) for code in codes}
+    events["category"] = events["event_code"].map({c: v[0] for c, v in coded.items()})
+    events["subcategory"] = events["event_code"].map({c: v[1] for c, v in coded.items()})
+
+    events["Class"] = raw_df["Class"].to_numpy()[row_idx]
+    events["StuNum"] = raw_df["StuNum"].to_numpy()[row_idx]
+    return events[columns]
+
 
 def analyze_question_answer(events, question_num):
     """分析特定问题的答题情况（修正版）"""
@@ -238,9 +308,10 @@ def process_student_data(raw_df):
                     else:
                         student_metric[f"{prefix}_{cat}_{subcat}_duration"] = 0
         
-        # 答题详情初始化
-        student_metric["qa_details_round1"] = {f"Q{q}": {"correct": None, "attempts": None, "answer_time": None,"feedbackProcess_time":None} 
-                                              for q in range(1, 6)}
+        # 答题详情初始化（第一轮每题一组数值列：Q1_correct、Q1_attempts……）
+        for q in range(1, 6):
+            for field in QA_DETAIL_FIELDS:
+                student_metric[f"Q{q}_{field}"] = np.nan
         
         # 存储每次游戏的答题正确数
         correct_per_game = []
@@ -267,12 +338,10 @@ def process_student_data(raw_df):
                         
                         # 如果是第一次游戏，记录详细答题情况
                         if round_idx == 1:
-                            student_metric["qa_details_round1"][f"Q{q}"] = {
-                                "correct": qa_result["correct"],
-                                "attempts": qa_result["attempts"],
-                                "answer_time": qa_result["answer_time"] if qa_result["answer_time"] is not None else 0,
-                                "feedbackProcess_time": qa_result["feedbackProcess_time"] if qa_result["feedbackProcess_time"] is not None else 0
-                            }
+                            student_metric[f"Q{q}_correct"] = int(qa_result["correct"])
+                            student_metric[f"Q{q}_attempts"] = qa_result["attempts"]
+                            student_metric[f"Q{q}_answer_time"] = qa_result["answer_time"] if qa_result["answer_time"] is not None else 0
+                            student_metric[f"Q{q}_feedbackProcess_time"] = qa_result["feedbackProcess_time"] if qa_result["feedbackProcess_time"] is not None else 0
                         
                         if qa_result["correct"]:
                             correct_in_game += 1
@@ -379,19 +448,11 @@ def create_class_profile(student_df):
             print("分组后无数据")
             return pd.DataFrame()
         
-        # 1. 先挑出你要聚合的数值列
-        num_cols = [
-            "preScore","postScore","p_postScore","game_count","game_score_1","game_score_2","game_score_3","game_score_4","game_score_5","initial_correct_q","total_correct_q_avg","accuracy_rate_avg","round1_read_count","round1_read_duration","total_read_count","total_read_duration","round1_explore_count","round1_explore_duration","total_explore_count","total_explore_duration","round1_practice_count","round1_practice_duration","total_practice_count","total_practice_duration","round1_feedback_count","round1_feedback_duration","total_feedback_count","total_feedback_duration","round1_replay_end_count","round1_replay_end_duration","total_replay_end_count","total_replay_end_duration","round1_read_knowledge_count","round1_read_knowledge_duration","total_read_knowledge_count","total_read_knowledge_duration","round1_read_rules_count","round1_read_rules_duration","total_read_rules_count","total_read_rules_duration","round1_read_return_count","round1_read_return_duration","total_read_return_count","total_read_return_duration","round1_explore_move_count","round1_explore_move_duration","total_explore_move_count","total_explore_move_duration","round1_explore_positive_count","round1_explore_positive_duration","total_explore_positive_count","total_explore_positive_duration","round1_explore_negative_count","round1_explore_negative_duration","total_explore_negative_count","total_explore_negative_duration","round1_practice_choice_count","round1_practice_choice_duration","total_practice_choice_count","total_practice_choice_duration","round1_practice_sub_count","round1_practice_sub_duration","total_practice_sub_count","total_practice_sub_duration","round1_feedback_positive_count","round1_feedback_positive_duration","total_feedback_positive_count","total_feedback_positive_duration","round1_feedback_negative_count","round1_feedback_negative_duration","total_feedback_negative_count","total_feedback_negative_duration","round1_feedback_sumAssessment_count","round1_feedback_sumAssessment_duration","total_feedback_sumAssessment_count","total_feedback_sumAssessment_duration","round1_replay_end_part_replay_count","round1_replay_end_part_replay_duration","total_replay_end_part_replay_count","total_replay_end_part_replay_duration","round1_replay_end_replay_count","round1_replay_end_replay_duration","total_replay_end_replay_count","total_replay_end_replay_duration","avg_read_count","avg_read_duration","avg_explore_count","avg_explore_duration","avg_practice_count","avg_practice_duration","avg_feedback_count","avg_feedback_duration","avg_replay_end_count","avg_replay_end_duration","avg_read_knowledge_count","avg_read_knowledge_duration","avg_read_rules_count","avg_read_rules_duration","avg_read_return_count","avg_read_return_duration","avg_explore_move_count","avg_explore_move_duration","avg_explore_positive_count","avg_explore_positive_duration","avg_explore_negative_count","avg_explore_negative_duration","avg_practice_choice_count","avg_practice_choice_duration","avg_practice_sub_count","avg_practice_sub_duration","avg_feedback_positive_count","avg_feedback_positive_duration","avg_feedback_negative_count","avg_feedback_negative_duration","avg_feedback_sumAssessment_count","avg_feedback_sumAssessment_duration","avg_replay_end_part_replay_count","avg_replay_end_part_replay_duration","avg_replay_end_replay_count","avg_replay_end_replay_duration","replay_count"
-            # ……把你所有要平均的列都放进来，其余列不用管
-        ]
-
-        # # 2. 强制转数值（无法转换的会变成 NaN，不影响聚合。因为里面有qa信息，是字符串格式。但是不能影响前面学生画像的内容，所以多搞一个表）
-        # 或者直接删了qa_details_round1就行，我还是选这个方案吧，方便。
-        # student_df2=[]
-        # student_df2=student_df
-        # student_df2[num_cols] = student_df2[num_cols].apply(pd.to_numeric, errors='coerce')
-
-        # 3. 再 groupby + agg
+        # 1. 聚合全部数值列（答题详情已是Q1_correct等数值列，无需再绕开字符串列；学号、性别不参与平均）
+        num_cols = [col for col in student_df.select_dtypes(include="number").columns
+                    if col not in ["StuNum", "Sex"]]
+
+        # 2. 再 groupby + agg
         class_profile = student_df.groupby("Class")[num_cols].mean().reset_index()
 
         # 重命名列以区分学生指标
@@ -435,18 +496,9 @@ if __name__ == "__main__":
         student_df.to_excel(student_output_path, index=False)
         class_df.to_excel(class_output_path, index=False)
 
-        # 导出 JSON 供前端使用
-        import os
-        import json
-        out_dir = "../../../F_dashBoard_web/data"
-        os.makedirs(out_dir, exist_ok=True)
-        json_data = student_df.to_dict(orient="records")   # ← 先转 dict
-        json_data2 = class_df.to_dict(orient="records")   # ← 先转 dict
-        with open(f"{out_dir}/每个学生游戏行为画像.json", "w", encoding="utf-8") as f:
-            json.dump(json_data, f, ensure_ascii=False, indent=2)
-        with open(f"{out_dir}/班级行为画像.json", "w", encoding="utf-8") as f:
-            json.dump(json_data2, f, ensure_ascii=False, indent=2)
-        print("JSON 已生成到 dashboard-web/data/")
+        # 导出 JSON 供前端使用：清单 + 每班一个带内容哈希的分片，页面只下载正在查看的班级
+        manifest = export_web_data(student_df, class_df)
+        print(f"JSON 已生成到 {WEB_DATA_DIR}（清单 + {len(manifest['classes'])} 个班级分片）")
 
         print("处理完成！")
         print(f"学生画像保存到: {student_output_path} (共{len(student_df)}条记录)")
@@ -0,0 +1,122 @@
+# 前端数据导出：把学生行为画像、班级行为画像拆成"清单 + 每班一个分片"供 F_dashBoard_web 按需加载
+# - manifest.json：班级列表（全称、简称、学号列表、分片文件名），页面首屏只需下载它
+# - shards/class_<序号>.<内容哈希>.json：该班的班级画像 + 学生画像（列名只存一次，每个学生一行）
+#     {"class": 班级全称, "profile": {班级画像}, "columns": [列名...], "rows": {"学号": [取值...]}}
+# - 文件名带内容哈希：内容不变文件名不变，浏览器/CDN 可长期缓存；重新导出后旧分片自动删除
+# - 缺失值写为 null（不再输出非法 JSON 的 NaN），数值保留 JSON_DECIMALS 位小数、整数值写为整数，紧凑分隔符
+#   （同一数据以 int 或 float 列类型读入时分片内容与哈希一致）
+
+import os
+import json
+import hashlib
+import argparse
+
+import pandas as pd
+
+from class_names import short_class_name
+
+STUDENT_FILE = "./result/每个学生游戏行为画像.xlsx"
+CLASS_FILE = "./result/班级行为画像.xlsx"
+WEB_DATA_DIR = "../../../F_dashBoard_web/data"
+SHARD_DIR_NAME = "shards"
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+JSON_DECIMALS = 4
+HASH_LENGTH = 12
+
+
+def _json_number(value):
+    """数值归一化：NaN -> None，整数值 -> int，其余保持 float"""
+    if value != value:
+        return None
+    return int(value) if value.is_integer() else value
+
+
+def _json_values(df, decimals=JSON_DECIMALS):
+    """DataFrame -> 行列表，数值列统一按取值归一化（与 int/float 存储类型无关，内容哈希只取决于数值），
+    NaN 转为 null，numpy 标量转为 Python 类型"""
+    columns = []
+    for col in df.columns:
+        values = df[col]
+        if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            numbers = values.to_numpy(dtype=float).round(decimals).tolist()
+            columns.append([_json_number(v) for v in numbers])
+        else:
+            columns.append(values.astype(object).where(values.notna(), None).tolist())
+    return [list(row) for row in zip(*columns)]
+
+
+def _dumps(payload):
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"), allow_nan=False)
+
+
+def build_class_shards(student_df, class_df):
+    """按班级拆分，返回 [(班级全称, 学号列表, 分片内容), ...]（班级按名称排序）"""
+    profile_columns = [c for c in class_df.columns if c != "Class"]
+    profiles = {}
+    for name, values in zip(class_df["Class"], _json_values(class_df[profile_columns])):
+        profiles[name] = dict(zip(profile_columns, values))
+
+    columns = list(student_df.columns)
+    shards = []
+    for class_name, group in student_df.groupby("Class", sort=True):
+        group = group.sort_values("StuNum")
+        stu_nums = [str(s) for s, in _json_values(group[["StuNum"]])]
+        payload = {
+            "class": class_name,
+            "profile": profiles.get(class_name),
+            "columns": columns,
+            "rows": dict(zip(stu_nums, _json_values(group))),
+        }
+        shards.append((class_name, stu_nums, _dumps(payload)))
+    return shards
+
+
+def export_web_data(student_df, class_df, out_dir=WEB_DATA_DIR):
+    """写清单与各班分片，删除不再被清单引用的旧分片，返回清单内容"""
+    shard_dir = os.path.join(out_dir, SHARD_DIR_NAME)
+    os.makedirs(shard_dir, exist_ok=True)
+
+    classes, written = [], set()
+    for i, (class_name, stu_nums, content) in enumerate(build_class_shards(student_df, class_df)):
+        digest = hashlib.sha256(content.encode("utf-8")).hexdigest()[:HASH_LENGTH]
+        filename = f"class_{i}.{digest}.json"
+        path = os.path.join(shard_dir, filename)
+        if not os.path.exists(path):
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(content)
+        written.add(filename)
+        classes.append({
+            "name": class_name,
+            "short": short_class_name(class_name),
+            "students": stu_nums,
+            "file": f"{SHARD_DIR_NAME}/{filename}",
+            "hash": digest,
+            "bytes": len(content.encode("utf-8")),
+        })
+
+    for filename in os.listdir(shard_dir):
+        if filename.endswith(".json") and filename not in written:
+            os.remove(os.path.join(shard_dir, filename))
+
+    manifest = {"version": MANIFEST_VERSION, "classes": classes}
+    with open(os.path.join(out_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        f.write(_dumps(manifest))
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="导出前端仪表盘的清单与分班分片 JSON")
+    parser.add_argument("--out-dir", default=WEB_DATA_DIR, help="前端 data 目录")
+    args = parser.parse_args()
+
+    student_df = pd.read_excel(STUDENT_FILE)
+    class_df = pd.read_excel(CLASS_FILE)
+    manifest = export_web_data(student_df, class_df, args.out_dir)
+    for entry in manifest["classes"]:
+        print(f"- {entry['name']}: {len(entry['students'])} 名学生 -> {entry['file']} ({entry['bytes'] / 1024:.1f} KB)")
+    print(f"前端数据已导出到: {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,13 @@
+# 班级名称解析：上游数据的班级全称形如 '会元测试赋分汇总（6年1班）'
+# B 层导出、C 层分层分析、D 层建模与 E 层仪表盘共用这里的定义，保证各层口径一致
+
+
+def short_class_name(class_name):
+    """'会元测试赋分汇总（6年1班）' -> '6年1班'"""
+    class_name = str(class_name)
+    return class_name.split("（")[1].replace("）", "") if "（" in class_name else class_name
+
+
+def school_of(class_name):
+    """从班级名称中提取学校，如 '会元测试赋分汇总（6年1班）' -> '会元'"""
+    return str(class_name).split('测试')[0]
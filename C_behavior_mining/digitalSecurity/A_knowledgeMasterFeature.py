@@ -7,10 +7,21 @@
 import pandas as pd
 import numpy as np
 import re
-import ast
 import os
+import sys
 import json
+import argparse
+import warnings
 from collections import defaultdict
+from functools import lru_cache
+
+from normalization import NORMALIZATION_STRATEGIES, fit_normalization, apply_normalization
+
+B_DIR = "../../B_data_preprocessing/StandardizationOfGameBehaviorCoding/digitalSecurity"
+
+# 事件解析复用 B 层 B_Coding_process.build_coded_event_table，保证与 B 层行为编码口径一致
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), B_DIR))
+from B_Coding_process import build_coded_event_table
 
 # 知识赋分规则（优化版）
 KNOWLEDGE_FEATURE_SCORE = {
@@ -57,7 +68,10 @@ KNOWLEDGE_FEATURE_SCORE = {
     }
 }
 
-# 标准化参数（基于实际数据分布设定）
+# 标准化策略：cap（按下方 MAX_* 上限截断）/ minmax / quantile / robust，见 normalization.py
+NORMALIZATION_STRATEGY = "cap"
+
+# 标准化参数（cap 策略的上限，基于实际数据分布设定）
 MAX_read_DURATION = 20        # 最大阅读时长(秒)
 MAX_EXPLORE_COUNT = 20        # 最大探索事件次数
 MAX_ATTACKS = 20              # 最大遭受攻击次数
@@ -65,6 +79,10 @@ MAX_PASSWORD_INPUT = 20       # 最大密码输入次数
 MAX_FEEDBACK_DURATION=20      # 最大反馈事件处理时长
 MAX_OverORReplay= 5           # gamecount作为重玩指标
 
+# 密码列：L1PW_1 ... L3PW_5（关卡×游戏轮次）
+PASSWORD_LEVELS = ["L1", "L2", "L3"]
+PASSWORD_ROUNDS = [1, 2, 3, 4, 5]
+
 def calculate_password_strength(password):
     """计算密码强度得分（0-10分）"""
     if not password or pd.isna(password) or password == "":
@@ -96,237 +114,252 @@ def calculate_password_strength(password):
     
     return min(score, 10)
 
-def parse_behavior_sequence(sequence_str, game_round):
-    """解析行为序列字符串，提取事件信息"""
-    events = []
-    if pd.isna(sequence_str) or not sequence_str:
-        return events
-    
-    try:
-        # 移除首尾的"/"并分割关卡
-        levels = [lvl.strip() for lvl in sequence_str.strip("/").split("/") if lvl.strip()]
-        
-        all_events = []
-        for level_seq in levels:
-            event_strs = [e.strip() for e in level_seq.split(";") if e.strip()]
-            all_events.extend(event_strs)
-            
-        timestamps = []
-        for event_str in all_events:
-            if ":" in event_str:
-                parts = event_str.split(":", 1)
-                if len(parts) == 2:
-                    event_code, timestamp = parts
-                    try:
-                        timestamp = int(timestamp)
-                        events.append({
-                            "event_code": event_code,
-                            "timestamp": timestamp,
-                            "game_round": game_round
-                        })
-                        timestamps.append(timestamp)
-                    except ValueError:
-                        continue
-        
-        # 按时间戳排序事件
-        events.sort(key=lambda x: x["timestamp"])
-        
-        # 计算持续时间（使用您提供的逻辑）
-        if events:
-            events[0]["duration"] = events[0]["timestamp"]
-            for i in range(1, len(events)):
-                if events[i]["timestamp"] >= events[i-1]["timestamp"]:
-                    events[i]["duration"] = events[i]["timestamp"] - events[i-1]["timestamp"]
-        
-    except Exception as e:
-        print(f"解析行为序列出错: {str(e)}")
-    
-    return events
+def build_event_table(raw_df):
+    """将每个学生各轮行为序列展开为事件长表（一行一个事件，含持续时间），直接复用 B 层的编码事件长表"""
+    events = build_coded_event_table(raw_df)
+    return events.rename(columns={"row_idx": "student_idx"})[
+        ["student_idx", "game_round", "event_code", "timestamp", "duration"]]
 
-def calculate_knowledge_scores(raw_df, behavior_df):
-    """计算每个学生的知识得分（5知识点*行为特征 + 5综合掌握得分）"""
-    # 创建结果DataFrame
-    knowledge_scores = pd.DataFrame()
-    # 添加学生人口学信息
-    knowledge_scores["Class"] = raw_df["Class"]
-    knowledge_scores["StuNum"] = raw_df["StuNum"]
-    knowledge_scores["Sex"] = raw_df["Sex"]
-
-    # 添加学生测试和游戏总成绩信息
-    knowledge_scores["preScore"] = raw_df["preScore"]
-    knowledge_scores["postScore"] = raw_df["postScore"]
-    knowledge_scores["p_postScore"] = raw_df["p_postScore"]
-    knowledge_scores["game_count"] = raw_df["game_count"]
-    knowledge_scores["avg_game_score"] = raw_df["avg_gameScore"]
-    
-    # 结束重玩行为标准得分，不用看知识掌握程度，看整体游戏表现
-    game_count=behavior_df.iloc[0]["game_count"]
-    OverORReplay_score=min(game_count / MAX_OverORReplay, 1)
-    knowledge_scores["OverORReplay_score"]=OverORReplay_score
-    
-    # 初始化知识掌握程度得分列
-    for knowledge in KNOWLEDGE_FEATURE_SCORE.keys():
-        # 1个综合掌握程度得分（0-1）
-        knowledge_scores[f"{knowledge}_mastery"] = 0.0
-    for knowledge in KNOWLEDGE_FEATURE_SCORE.keys():
-        # 3个标准化行为特征（0-1）
-        knowledge_scores[f"{knowledge}_read"] = 0.0    # 阅读行为标准化得分
-        knowledge_scores[f"{knowledge}_explore"] = 0.0     # 探索行为标准化得分
-        knowledge_scores[f"{knowledge}_practice"] = 0.0        # 测试行为标准化得分
-        # # 新增两个反馈处理指标(0-1)
-        knowledge_scores[f"{knowledge}_feedbackProcess_positive"] = 0.0  # 正反馈处理得分
-        knowledge_scores[f"{knowledge}_feedbackProcess_negative"] = 0.0  # 负反馈处理得分
-        
-        
+def build_knowledge_membership(event_codes, pattern_key):
+    """预计算 事件代码×知识点 的匹配矩阵（值为该代码命中的规则条数）"""
+    membership = np.zeros((len(event_codes), len(KNOWLEDGE_FEATURE_SCORE)))
+    for k, config in enumerate(KNOWLEDGE_FEATURE_SCORE.values()):
+        patterns = [p for p in config[pattern_key] if p != "password_strength"]
+        for i, code in enumerate(event_codes):
+            membership[i, k] = sum(1 for p in patterns if re.match(p, code))
+    return membership
 
-    
-    # 计算每个学生的知识得分
-    for idx, row in raw_df.iterrows():
-        stu_num = row["StuNum"]
-        
-        # 获取学生的行为画像数据
-        behavior_row = behavior_df[behavior_df["StuNum"] == stu_num]
-        if behavior_row.empty:
-            continue
-        
-        # 获取答题详情（第一轮）
-        qa_details = {}
-        qa_details_str = behavior_row.iloc[0]["qa_details_round1"]
-        try:
-            if isinstance(qa_details_str, str):
-                qa_details = ast.literal_eval(qa_details_str)
-            else:
-                qa_details = qa_details_str
-        except:
-            pass
-        
-        # 提取所有关卡密码
-        passwords = []
-        for level in ["L1", "L2", "L3"]:
-            for i in range(1, 6):
-                pw_col = f"{level}PW_{i}"
-                if pw_col in row and not pd.isna(row[pw_col]) and row[pw_col].strip():
-                    passwords.append(row[pw_col])
-        
-        # 计算平均密码强度（0-10分）
-        strength_scores = [calculate_password_strength(pw) for pw in passwords if pw]
-        avg_strength = sum(strength_scores) / len(strength_scores) if strength_scores else 0
-        
-        # 解析所有行为事件
-        all_events = []
-        for round_idx in range(1, 6):
-            seq_col = f"BehaviorSeqStr_{round_idx}"
-            if seq_col in row and not pd.isna(row[seq_col]) and row[seq_col].strip():
-                events = parse_behavior_sequence(row[seq_col], round_idx)
-                all_events.extend(events)
-        
-        # 计算每个知识点的得分
-        for knowledge, config in KNOWLEDGE_FEATURE_SCORE.items():
-            # 1. 阅读行为得分（标准化0-1）
-            read_duration = 0
-            for event in all_events:
-                for pattern in config["read_events"]:
-                    if re.match(pattern, event["event_code"]):
-                        read_duration += event.get("duration", 0)
-            read_score = min(read_duration / MAX_read_DURATION, 1)
-            
-            # 2. 探索行为得分（标准化0-1）
-            explore_score = 0.0
-            if "password_strength" in config["explore_events"]:
-                # 使用密码强度作为探索行为
-                if config["explore_type"] == "strength":
-                    explore_score = min(avg_strength / 10, 1)
-            else:
-                # 计算匹配事件次数
-                explore_count = 0
-                for event in all_events:
-                    for pattern in config["explore_events"]:
-                        if re.match(pattern, event["event_code"]):
-                            explore_count += 1
-                
-                # 根据指标类型处理
-                if config.get("is_negative", False):
-                    # 负向指标（攻击次数），次数越少越好
-                    explore_score = max(0, 1 - min(explore_count / MAX_ATTACKS, 1))
-                elif knowledge == "passwordComposition":
-                    # 密码输入次数特殊处理
-                    explore_score = min(explore_count / MAX_PASSWORD_INPUT, 1)
-                else:
-                    # 正向指标（工具使用次数）
-                    explore_score = min(explore_count / MAX_EXPLORE_COUNT, 1)
-            
-            # 3. 测试行为得分（答题正确率0-1）
-            practice_score = 0.0
-            total_weight = sum(config["practice_weights"].values())
-            for q, weight in config["practice_weights"].items():
-                if q in qa_details and qa_details[q].get("correct") is not None:
-                    correct = qa_details[q].get("correct", False)
-                    practice_score += (1 if correct else 0) * weight
-            
-            if total_weight > 0:
-                practice_score /= total_weight
-
-            # 4. 反馈处理行为得分（新增）
-            positive_feedback_time = 0
-            negative_feedback_time = 0            
-            # 计算正负反馈处理时长
-            for q in config["feedbackProcess_events"]:
-                # 直接使用q作为键，因为它已经是"Q1"这样的格式
-                if q in qa_details:
-                    detail = qa_details[q]
-                    fb_time = detail.get("feedbackProcess_time", 0)
-                    
-                    # 使用正确的键名"correct"来获取答题正确性
-                    if detail.get("correct", False):
-                        positive_feedback_time += fb_time
-                    else:
-                        negative_feedback_time += fb_time
-            
-            # 标准化反馈处理时长
-            positive_feedback_score = min(positive_feedback_time / MAX_FEEDBACK_DURATION, 1)
-            negative_feedback_score = min(negative_feedback_time / MAX_FEEDBACK_DURATION, 1)                
-            
-
-            
-            # 6. 知识掌握程度（加权平均，只考虑客观评分，例如密码强度和答题准确得分）
-            mastery = 0.5 * explore_score + 0.5 * practice_score
-            
-            # 保存结果（只保留中间层和综合层）
-            knowledge_scores.at[idx, f"{knowledge}_read"] = read_score
-            knowledge_scores.at[idx, f"{knowledge}_explore"] = explore_score
-            knowledge_scores.at[idx, f"{knowledge}_practice"] = practice_score
-            knowledge_scores.at[idx, f"{knowledge}_feedbackProcess_positive"] = positive_feedback_score
-            knowledge_scores.at[idx, f"{knowledge}_feedbackProcess_negative"] = negative_feedback_score
-            # knowledge_scores.at[idx, f"{knowledge}_overORReplay"] = OverORReplay_score
-            knowledge_scores.at[idx, f"{knowledge}_mastery"] = mastery
-    
-    return knowledge_scores
+@lru_cache(maxsize=None)
+def _cached_password_strength(password):
+    """带缓存的单个密码强度计算（同一密码在各轮次、各学生间大量重复）"""
+    return calculate_password_strength(password)
+
+def calculate_password_strength_batch(passwords):
+    """批量计算密码强度：去重后只对唯一密码打分，再映射回原位置（空密码为NaN）"""
+    passwords = pd.Series(passwords, dtype=object).reset_index(drop=True)
+    valid = passwords.notna() & (passwords.astype(str).str.strip() != "")
+
+    codes, uniques = pd.factorize(passwords[valid].astype(str))
+    unique_scores = np.array([_cached_password_strength(pw) for pw in uniques], dtype=float)
+
+    scores = np.full(len(passwords), np.nan)
+    scores[valid.to_numpy()] = unique_scores[codes]
+    return scores
+
+def calculate_password_strength_features(raw_df):
+    """计算每个学生的密码强度特征：各关卡、各轮次平均强度及总平均强度（0-10分）"""
+    n_students = len(raw_df)
+    strength = np.full((n_students, len(PASSWORD_LEVELS), len(PASSWORD_ROUNDS)), np.nan)
+    cells = [(l, r) for l in range(len(PASSWORD_LEVELS)) for r in range(len(PASSWORD_ROUNDS))
+             if f"{PASSWORD_LEVELS[l]}PW_{PASSWORD_ROUNDS[r]}" in raw_df.columns]
+
+    if cells:
+        # 所有密码单元格拉平成一列，统一去重打分
+        pw_cols = [f"{PASSWORD_LEVELS[l]}PW_{PASSWORD_ROUNDS[r]}" for l, r in cells]
+        flat_scores = calculate_password_strength_batch(raw_df[pw_cols].to_numpy().ravel(order="F"))
+        flat_scores = flat_scores.reshape(len(cells), n_students)
+        for c, (l, r) in enumerate(cells):
+            strength[:, l, r] = flat_scores[c]
+
+    features = {}
+    with warnings.catch_warnings():
+        # 没有密码的关卡/轮次取NaN（忽略空切片均值警告）
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        for l, level in enumerate(PASSWORD_LEVELS):
+            features[f"{level}_password_strength"] = np.nanmean(strength[:, l, :], axis=1)
+        for r, round_idx in enumerate(PASSWORD_ROUNDS):
+            features[f"round{round_idx}_password_strength"] = np.nanmean(strength[:, :, r], axis=1)
+        avg_strength = np.nanmean(strength.reshape(n_students, -1), axis=1)
+    features["avg_password_strength"] = np.nan_to_num(avg_strength, nan=0.0)
+
+    return pd.DataFrame(features, index=raw_df.index)
+
+def load_qa_matrix(behavior_df, stu_nums):
+    """按学号取第一轮答题详情列，返回 正确矩阵 与 反馈处理时长矩阵（学生×题目）"""
+    questions = [f"Q{q}" for q in range(1, 6)]
+
+    # 与逐行查找保持一致：同一学号取行为画像中的第一条记录
+    first_rows = behavior_df.drop_duplicates("StuNum").set_index("StuNum").reindex(stu_nums)
+    correct = first_rows[[f"{q}_correct" for q in questions]].fillna(0).to_numpy(dtype=float) > 0
+    feedback_time = first_rows[[f"{q}_feedbackProcess_time" for q in questions]].fillna(0).to_numpy(dtype=float)
+    return correct, feedback_time
+
+def calculate_raw_knowledge_features(raw_df, behavior_df):
+    """计算每个学生各知识点的原始行为特征（未标准化：时长、次数、密码强度、答题正确率）"""
+    n_students = len(raw_df)
+    knowledges = list(KNOWLEDGE_FEATURE_SCORE.keys())
+    questions = [f"Q{q}" for q in range(1, 6)]
+    stu_nums = raw_df["StuNum"].to_numpy()
+
+    # 没有行为画像的学生原始特征记为NaN（评分时记0分，且不参与群体统计）
+    has_behavior = np.isin(stu_nums, behavior_df["StuNum"].to_numpy())
+
+    # 1. 事件长表 + 代码→知识点匹配矩阵，按学生分组求和得到阅读时长与探索次数
+    events = build_event_table(raw_df)
+    codes, code_ids = np.unique(events["event_code"].to_numpy(dtype=str), return_inverse=True)
+    read_membership = build_knowledge_membership(codes, "read_events")
+    explore_membership = build_knowledge_membership(codes, "explore_events")
+
+    student_idx = events["student_idx"].to_numpy(dtype=int)
+    duration = events["duration"].to_numpy(dtype=float)
+    read_duration = np.zeros((n_students, len(knowledges)))
+    explore_count = np.zeros((n_students, len(knowledges)))
+    np.add.at(read_duration, student_idx, read_membership[code_ids] * duration[:, None])
+    np.add.at(explore_count, student_idx, explore_membership[code_ids])
+
+    # 2. 密码强度与答题详情
+    password_features = calculate_password_strength_features(raw_df)
+    avg_strength = password_features["avg_password_strength"].to_numpy()
+    correct, feedback_time = load_qa_matrix(behavior_df, stu_nums)
+
+    practice_weights = np.array([
+        [config["practice_weights"].get(q, 0.0) for q in questions]
+        for config in KNOWLEDGE_FEATURE_SCORE.values()
+    ])
+    feedback_mask = np.array([
+        [1.0 if q in config["feedbackProcess_events"] else 0.0 for q in questions]
+        for config in KNOWLEDGE_FEATURE_SCORE.values()
+    ])
+    total_weight = practice_weights.sum(axis=1)
+
+    practice_rate = correct.astype(float) @ practice_weights.T
+    practice_rate = np.divide(practice_rate, total_weight, out=practice_rate, where=total_weight > 0)
+    positive_feedback_time = (feedback_time * correct) @ feedback_mask.T
+    negative_feedback_time = (feedback_time * ~correct) @ feedback_mask.T
+
+    # 结束重玩行为原始指标：游戏次数，不用看知识掌握程度，看整体游戏表现
+    game_count = behavior_df.iloc[0]["game_count"]
+
+    features = {
+        # 学生人口学信息
+        "Class": raw_df["Class"].to_numpy(),
+        "StuNum": stu_nums,
+        "Sex": raw_df["Sex"].to_numpy(),
+        # 学生测试和游戏总成绩信息
+        "preScore": raw_df["preScore"].to_numpy(),
+        "postScore": raw_df["postScore"].to_numpy(),
+        "p_postScore": raw_df["p_postScore"].to_numpy(),
+        "game_count": raw_df["game_count"].to_numpy(),
+        "avg_game_score": raw_df["avg_gameScore"].to_numpy(),
+        "OverORReplay_game_count": np.full(n_students, float(game_count)),
+    }
+    for k, (knowledge, config) in enumerate(KNOWLEDGE_FEATURE_SCORE.items()):
+        features[f"{knowledge}_read_duration"] = read_duration[:, k]
+        if "password_strength" in config["explore_events"]:
+            features[f"{knowledge}_explore_strength"] = avg_strength
+        else:
+            features[f"{knowledge}_explore_count"] = explore_count[:, k]
+        features[f"{knowledge}_practice_rate"] = practice_rate[:, k]
+        features[f"{knowledge}_feedbackProcess_positive_time"] = positive_feedback_time[:, k]
+        features[f"{knowledge}_feedbackProcess_negative_time"] = negative_feedback_time[:, k]
+
+    raw_features = pd.DataFrame(features, index=raw_df.index)
+    knowledge_cols = list(build_normalization_specs().keys())
+    raw_features.loc[~has_behavior, [c for c in knowledge_cols if c != "OverORReplay_game_count"]] = np.nan
+
+    # 密码强度原始特征（0-10分）：各关卡、各轮次平均强度及总平均强度
+    return pd.concat([raw_features, password_features], axis=1)
+
+def build_normalization_specs():
+    """原始特征列 → 标准化得分列 的映射（含 cap 策略的上限与指标方向）"""
+    specs = {"OverORReplay_game_count": {"output": "OverORReplay_score", "cap": MAX_OverORReplay}}
+    for knowledge, config in KNOWLEDGE_FEATURE_SCORE.items():
+        specs[f"{knowledge}_read_duration"] = {"output": f"{knowledge}_read", "cap": MAX_read_DURATION}
+        if "password_strength" in config["explore_events"]:
+            # 使用密码强度作为探索行为（0-10分）
+            specs[f"{knowledge}_explore_strength"] = {"output": f"{knowledge}_explore", "cap": 10}
+        elif config.get("is_negative", False):
+            # 负向指标（攻击次数），次数越少越好
+            specs[f"{knowledge}_explore_count"] = {"output": f"{knowledge}_explore", "cap": MAX_ATTACKS, "negative": True}
+        elif knowledge == "passwordComposition":
+            # 密码输入次数特殊处理
+            specs[f"{knowledge}_explore_count"] = {"output": f"{knowledge}_explore", "cap": MAX_PASSWORD_INPUT}
+        else:
+            # 正向指标（工具使用次数）
+            specs[f"{knowledge}_explore_count"] = {"output": f"{knowledge}_explore", "cap": MAX_EXPLORE_COUNT}
+        # 答题正确率本身就是0-1比例，不再缩放
+        specs[f"{knowledge}_practice_rate"] = {"output": f"{knowledge}_practice", "cap": None}
+        specs[f"{knowledge}_feedbackProcess_positive_time"] = {
+            "output": f"{knowledge}_feedbackProcess_positive", "cap": MAX_FEEDBACK_DURATION}
+        specs[f"{knowledge}_feedbackProcess_negative_time"] = {
+            "output": f"{knowledge}_feedbackProcess_negative", "cap": MAX_FEEDBACK_DURATION}
+    return specs
+
+def score_knowledge_features(raw_features, strategy=NORMALIZATION_STRATEGY, stats=None):
+    """对原始特征做标准化并计算知识掌握程度（中间层 + 综合层）
+
+    stats 为 fit_normalization 计算的群体统计量；不传时用 raw_features 本身的群体拟合
+    """
+    specs = build_normalization_specs()
+    if stats is None and strategy != "cap":
+        stats = fit_normalization(raw_features, list(specs.keys()))
+
+    normalized = apply_normalization(raw_features, specs, stats, strategy).fillna(0.0)
+
+    columns = {col: raw_features[col].to_numpy() for col in
+               ["Class", "StuNum", "Sex", "preScore", "postScore", "p_postScore", "game_count", "avg_game_score"]}
+    columns["OverORReplay_score"] = normalized["OverORReplay_score"].to_numpy()
+    for knowledge in KNOWLEDGE_FEATURE_SCORE:
+        # 知识掌握程度（加权平均，只考虑客观评分，例如密码强度和答题准确得分）
+        columns[f"{knowledge}_mastery"] = (0.5 * normalized[f"{knowledge}_explore"]
+                                           + 0.5 * normalized[f"{knowledge}_practice"]).to_numpy()
+    for knowledge in KNOWLEDGE_FEATURE_SCORE:
+        # 标准化行为特征与反馈处理指标（0-1）
+        for behavior in ["read", "explore", "practice", "feedbackProcess_positive", "feedbackProcess_negative"]:
+            columns[f"{knowledge}_{behavior}"] = normalized[f"{knowledge}_{behavior}"].to_numpy()
+
+    knowledge_scores = pd.DataFrame(columns, index=raw_features.index)
+    password_cols = [c for c in raw_features.columns if c.endswith("_password_strength")]
+    return pd.concat([knowledge_scores, raw_features[password_cols]], axis=1)
+
+def calculate_knowledge_scores(raw_df, behavior_df, strategy=NORMALIZATION_STRATEGY):
+    """计算每个学生的知识得分（5知识点*行为特征 + 5综合掌握得分）"""
+    raw_features = calculate_raw_knowledge_features(raw_df, behavior_df)
+    return score_knowledge_features(raw_features, strategy)
 
 def main():
+    parser = argparse.ArgumentParser(description="学生知识掌握程度评估")
+    parser.add_argument("--strategy", choices=NORMALIZATION_STRATEGIES, default=NORMALIZATION_STRATEGY,
+                        help="标准化策略（默认 cap：固定上限截断）")
+    parser.add_argument("--rescore", action="store_true",
+                        help="直接读取缓存的原始特征表重新评分，不再解析行为序列")
+    args = parser.parse_args()
+
     # 创建输出目录
     output_dir = "./result"
     os.makedirs(output_dir, exist_ok=True)
-    
-    # 读取原始数据
-    raw_file = "../../B_data_preprocessing/StandardizationOfGameBehaviorCoding/digitalSecurity/result/人口学信息_问卷_游戏匹配整合数据.xlsx"
-    if not os.path.exists(raw_file):
-        print(f"错误：文件不存在 - {raw_file}")
-        return
-    
-    raw_df = pd.read_excel(raw_file)
-    print(f"人口学信息数据加载成功，记录数: {len(raw_df)}")
-    
-    # 读取学生行为画像数据
-    behavior_file = "../../B_data_preprocessing/StandardizationOfGameBehaviorCoding/digitalSecurity/result/每个学生游戏行为画像.xlsx"
-    if not os.path.exists(behavior_file):
-        print(f"错误：文件不存在 - {behavior_file}")
-        return
-    
-    behavior_df = pd.read_excel(behavior_file)
-    print(f"学生行为画像数据加载成功，记录数: {len(behavior_df)}")
+    raw_features_file = os.path.join(output_dir, "学生知识原始特征.xlsx")
+
+    if args.rescore and os.path.exists(raw_features_file):
+        raw_features = pd.read_excel(raw_features_file)
+        print(f"原始特征缓存加载成功，记录数: {len(raw_features)}")
+    else:
+        # 读取原始数据
+        raw_file = "../../B_data_preprocessing/StandardizationOfGameBehaviorCoding/digitalSecurity/result/人口学信息_问卷_游戏匹配整合数据.xlsx"
+        if not os.path.exists(raw_file):
+            print(f"错误：文件不存在 - {raw_file}")
+            return
+        
+        raw_df = pd.read_excel(raw_file)
+        print(f"人口学信息数据加载成功，记录数: {len(raw_df)}")
+        
+        # 读取学生行为画像数据
+        behavior_file = "../../B_data_preprocessing/StandardizationOfGameBehaviorCoding/digitalSecurity/result/每个学生游戏行为画像.xlsx"
+        if not os.path.exists(behavior_file):
+            print(f"错误：文件不存在 - {behavior_file}")
+            return
+        
+        behavior_df = pd.read_excel(behavior_file)
+        print(f"学生行为画像数据加载成功，记录数: {len(behavior_df)}")
+
+        # 计算并缓存原始特征，换标准化策略时无需重新解析
+        raw_features = calculate_raw_knowledge_features(raw_df, behavior_df)
+        raw_features.to_excel(raw_features_file, index=False)
+        print(f"原始特征已缓存到: {raw_features_file}")
     
     # 计算知识得分
-    knowledge_df = calculate_knowledge_scores(raw_df, behavior_df)
+    knowledge_df = score_knowledge_features(raw_features, args.strategy)
+    print(f"标准化策略: {args.strategy}")
 
     
     # 保存结果
@@ -348,4 +381,4 @@ def main():
     print(knowledge_df.head(5))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,17 +1,38 @@
+import os
+import re
+import json
+import time
+import argparse
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 from sklearn.preprocessing import StandardScaler
-from sklearn.cluster import KMeans
+from sklearn.cluster import KMeans, MiniBatchKMeans
 from sklearn.metrics import silhouette_score
+from threadpoolctl import threadpool_limits
 import seaborn as sns
 
+from report_rendering import FigureJob, render_figures, print_render_summary, use_headless_backend
+
 # 解决中文显示问题
 plt.rcParams['font.sans-serif'] = ['SimHei']  # 使用黑体
 plt.rcParams['axes.unicode_minus'] = False    # 解决负号显示问题
 pd.set_option('display.unicode.ambiguous_as_wide', True)
 pd.set_option('display.unicode.east_asian_width', True)
 
+# 聚类参数
+CANDIDATE_CLUSTERS = range(2, 6)     # 候选簇数
+LARGE_COHORT_SIZE = 10000            # 超过该人数改用 MiniBatchKMeans + 抽样轮廓系数
+SILHOUETTE_SAMPLE_SIZE = 5000        # 大群体轮廓系数的抽样人数
+MINIBATCH_SIZE = 4096                # MiniBatchKMeans 每批样本数
+
+# 聚类模型存档（版本化，供新学生快速分配簇）
+CLUSTER_MODEL_DIR = "./result/cluster_model"
+UNASSIGNED_CLUSTER = -1              # 新学生有缺失的掌握特征时不分配簇
+
 # 1. 数据准备
 def prepare_clustering_data(knowledge_df):
     """准备聚类分析所需数据"""
@@ -32,7 +53,6 @@ def prepare_clustering_data(knowledge_df):
             f'{prefix}_read',
             f'{prefix}_explore',
             f'{prefix}_practice'
-            f'{prefix}_practice'
         ])
     
     # 提取相关特征
@@ -45,38 +65,135 @@ def prepare_clustering_data(knowledge_df):
     return cluster_df, mastery_features, behavior_features
 
 # 2. 聚类分析
-def perform_clustering(cluster_df, mastery_features, n_clusters=3):
+def fit_candidate_clustering(X, k, large_cohort, random_state=42):
+    """拟合单个候选簇数，返回模型、标签、轮廓系数及耗时"""
+    start = time.perf_counter()
+    # OpenMP 线程数按调用线程设置：每个候选 k 的拟合只用 1 个线程，由外层线程池提供并行
+    with threadpool_limits(limits=1, user_api="openmp"):
+        if large_cohort:
+            model = MiniBatchKMeans(n_clusters=k, random_state=random_state, n_init=3,
+                                    batch_size=MINIBATCH_SIZE)
+            labels = model.fit_predict(X)
+            score = silhouette_score(X, labels, sample_size=min(SILHOUETTE_SAMPLE_SIZE, len(X)),
+                                     random_state=random_state)
+        else:
+            model = KMeans(n_clusters=k, random_state=random_state, n_init=10)
+            labels = model.fit_predict(X)
+            score = silhouette_score(X, labels)
+    return {
+        "k": k,
+        "model": model,
+        "labels": labels,
+        "silhouette": score,
+        "inertia": model.inertia_,
+        "seconds": time.perf_counter() - start,
+    }
+
+def select_n_clusters(X, possible_clusters=CANDIDATE_CLUSTERS, large_cohort_size=LARGE_COHORT_SIZE,
+                      max_workers=None):
+    """并行拟合各候选簇数，按轮廓系数选出最佳结果（直接复用其拟合模型，不再重新拟合）
+
+    max_workers 为同时拟合的候选数（默认 CPU 核数），每个拟合限制为单线程（BLAS 与 OpenMP），
+    总线程数不超过 max_workers，避免每个拟合各自再开满核数的线程池造成超订
+    """
+    large_cohort = len(X) > large_cohort_size
+    max_workers = max_workers or os.cpu_count() or 1
+    # 线程池：各拟合共享同一份 X，不向子进程复制数据；BLAS 线程数为进程级设置，在外层统一限制
+    with threadpool_limits(limits=1, user_api="blas"), ThreadPoolExecutor(max_workers=max_workers) as executor:
+        fits = list(executor.map(lambda k: fit_candidate_clustering(X, k, large_cohort), possible_clusters))
+
+    selection = pd.DataFrame([
+        {"k": f["k"], "silhouette": f["silhouette"], "inertia": f["inertia"], "seconds": f["seconds"]}
+        for f in fits
+    ])
+    best_fit = fits[int(np.argmax(selection["silhouette"].to_numpy()))]
+    return best_fit, selection, large_cohort
+
+def perform_clustering(cluster_df, mastery_features, n_clusters=3, large_cohort_size=LARGE_COHORT_SIZE,
+                       max_workers=None):
     """执行聚类分析并返回结果"""
     # 标准化数据
     scaler = StandardScaler()
     mastery_scaled = scaler.fit_transform(cluster_df[mastery_features])
     
-    # 使用轮廓系数确定最佳聚类数
-    silhouette_scores = []
-    possible_clusters = range(2, 6)
-    
-    for k in possible_clusters:
-        kmeans = KMeans(n_clusters=k, random_state=42, n_init=10)
-        cluster_labels = kmeans.fit_predict(mastery_scaled)
-        silhouette_scores.append(silhouette_score(mastery_scaled, cluster_labels))
-    
-    # 选择最佳聚类数（轮廓系数最高）
-    best_n_clusters = possible_clusters[np.argmax(silhouette_scores)]
-    
-    # 使用最佳聚类数进行最终聚类
-    kmeans = KMeans(n_clusters=best_n_clusters, random_state=42, n_init=10)
-    cluster_labels = kmeans.fit_predict(mastery_scaled)
+    # 使用轮廓系数确定最佳聚类数（各候选k并行拟合）
+    best_fit, selection, large_cohort = select_n_clusters(
+        mastery_scaled, large_cohort_size=large_cohort_size, max_workers=max_workers
+    )
+    best_n_clusters = best_fit["k"]
+    kmeans = best_fit["model"]
+
+    print(f"\n候选簇数评估（{'MiniBatchKMeans + 抽样轮廓系数' if large_cohort else 'KMeans'}，学生数: {len(mastery_scaled)}）:")
+    print(selection.to_string(index=False, float_format=lambda v: f"{v:.4f}"))
     
     # 添加聚类结果到数据框
-    cluster_df['cluster'] = cluster_labels
+    cluster_df['cluster'] = best_fit["labels"]
     
     # 计算每个簇的中心点（知识掌握程度）
     cluster_centers = pd.DataFrame(
         scaler.inverse_transform(kmeans.cluster_centers_),
         columns=mastery_features
     )
-    
-    return cluster_df, cluster_centers, best_n_clusters
+
+    # 可存档的模型：标准化参数 + 标准化空间中的簇中心
+    cluster_model = {
+        "features": list(mastery_features),
+        "n_clusters": int(best_n_clusters),
+        "scaler_mean": scaler.mean_.tolist(),
+        "scaler_scale": scaler.scale_.tolist(),
+        "centers": kmeans.cluster_centers_.tolist(),
+        "silhouette": float(selection.loc[selection["k"] == best_n_clusters, "silhouette"].iloc[0]),
+        "n_students": int(len(mastery_scaled)),
+    }
+    
+    return cluster_df, cluster_centers, best_n_clusters, cluster_model
+
+# 模型存档与新学生分配
+def save_cluster_model(cluster_model, model_dir=CLUSTER_MODEL_DIR):
+    """将聚类模型保存为新版本的存档文件（cluster_model_v{版本号}.json），返回文件路径"""
+    os.makedirs(model_dir, exist_ok=True)
+    versions = list_cluster_model_versions(model_dir)
+    version = versions[-1] + 1 if versions else 1
+
+    artifact = dict(cluster_model, version=version, created_at=datetime.now().isoformat(timespec="seconds"))
+    path = os.path.join(model_dir, f"cluster_model_v{version}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(artifact, f, ensure_ascii=False, indent=2)
+    return path
+
+def list_cluster_model_versions(model_dir=CLUSTER_MODEL_DIR):
+    """列出已存档的模型版本号（升序）"""
+    if not os.path.isdir(model_dir):
+        return []
+    versions = [int(m.group(1)) for name in os.listdir(model_dir)
+                if (m := re.fullmatch(r"cluster_model_v(\d+)\.json", name))]
+    return sorted(versions)
+
+def load_cluster_model(version=None, model_dir=CLUSTER_MODEL_DIR):
+    """读取指定版本（默认最新版本）的聚类模型"""
+    versions = list_cluster_model_versions(model_dir)
+    if not versions:
+        raise FileNotFoundError(f"未找到聚类模型存档: {model_dir}")
+    version = versions[-1] if version is None else version
+    with open(os.path.join(model_dir, f"cluster_model_v{version}.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+def predict_clusters(knowledge_df, cluster_model):
+    """向量化地把学生分配到已存档模型中最近的簇中心，返回簇编号与到簇中心的距离
+
+    任一掌握特征缺失的学生无法计算距离：簇编号为 UNASSIGNED_CLUSTER，距离为 NaN
+    """
+    X = knowledge_df[cluster_model["features"]].to_numpy(dtype=float)
+    missing = np.isnan(X).any(axis=1)
+    X = (X - np.asarray(cluster_model["scaler_mean"])) / np.asarray(cluster_model["scaler_scale"])
+    centers = np.asarray(cluster_model["centers"])
+
+    # 平方距离 = |x|² - 2x·c + |c|²（学生数×簇数）
+    sq_dist = (X ** 2).sum(axis=1)[:, None] - 2 * X @ centers.T + (centers ** 2).sum(axis=1)[None, :]
+    sq_dist = np.maximum(sq_dist, 0)
+    labels = np.where(missing, 0, sq_dist.argmin(axis=1))
+    distances = np.where(missing, np.nan, np.sqrt(sq_dist[np.arange(len(X)), labels]))
+    return np.where(missing, UNASSIGNED_CLUSTER, labels), distances
 
 # 3. 行为模式分析
 def analyze_behavior_patterns(cluster_df, behavior_features):
@@ -99,9 +216,9 @@ def analyze_behavior_patterns(cluster_df, behavior_features):
     return behavior_means, cluster_behavior_summary
 
 # 4. 可视化结果
-def visualize_results(cluster_df, cluster_centers, behavior_means, cluster_behavior_summary):
-    """可视化聚类结果"""
-    plt.figure(figsize=(15, 12))
+def draw_clustering_figure(cluster_df, cluster_centers, behavior_means, cluster_behavior_summary):
+    """绘制聚类结果四联图，返回 Figure"""
+    fig = plt.figure(figsize=(15, 12))
     
     # 1. 知识掌握雷达图
     plt.subplot(2, 2, 1, polar=True)
@@ -171,11 +288,20 @@ def visualize_results(cluster_df, cluster_centers, behavior_means, cluster_behav
     plt.ylabel('密码功能掌握程度')
     
     plt.tight_layout()
+    return fig
+
+def visualize_results(cluster_df, cluster_centers, behavior_means, cluster_behavior_summary):
+    """可视化聚类结果"""
+    draw_clustering_figure(cluster_df, cluster_centers, behavior_means, cluster_behavior_summary)
     plt.savefig('./result/知识掌握聚类分析.png', dpi=300)
     plt.show()
 
 # 主函数
-def main():
+def run_fit(report=False, preview=False, max_workers=None):
+    """全量聚类：拟合模型、分析行为模式、保存结果并存档模型
+
+    report=True 时为无界面报告模式：Agg 后端出图、输入未变化的图跳过、不调用 plt.show()
+    """
     # 读取知识掌握数据
     knowledge_file = "./result/学生知识掌握程度评估.xlsx"
     knowledge_df = pd.read_excel(knowledge_file)
@@ -184,7 +310,8 @@ def main():
     cluster_df, mastery_features, behavior_features = prepare_clustering_data(knowledge_df)
     
     # 执行聚类分析
-    cluster_df, cluster_centers, n_clusters = perform_clustering(cluster_df, mastery_features)
+    cluster_df, cluster_centers, n_clusters, cluster_model = perform_clustering(
+        cluster_df, mastery_features, max_workers=max_workers)
     
     # 分析行为模式
     behavior_means, cluster_behavior_summary = analyze_behavior_patterns(cluster_df, behavior_features)
@@ -194,9 +321,24 @@ def main():
     cluster_centers.to_excel("./result/簇中心知识掌握程度.xlsx", index=False)
     behavior_means.to_excel("./result/簇行为特征平均值.xlsx")
     cluster_behavior_summary.to_excel("./result/簇游戏表现摘要.xlsx")
+
+    # 存档模型，后续新学生可直接分配到现有簇，簇编号保持可比
+    model_path = save_cluster_model(cluster_model)
+    print(f"聚类模型已存档: {model_path}")
     
     # 可视化结果
-    visualize_results(cluster_df, cluster_centers, behavior_means, cluster_behavior_summary)
+    if report:
+        status = render_figures([
+            FigureJob('./result/知识掌握聚类分析.png', draw_clustering_figure, {
+                "cluster_df": cluster_df,
+                "cluster_centers": cluster_centers,
+                "behavior_means": behavior_means,
+                "cluster_behavior_summary": cluster_behavior_summary,
+            }),
+        ], preview=preview, max_workers=max_workers)
+        print_render_summary(status)
+    else:
+        visualize_results(cluster_df, cluster_centers, behavior_means, cluster_behavior_summary)
     
     # 打印分析报告
     print(f"\n聚类分析完成！共识别出 {n_clusters} 个学生群体")
@@ -212,8 +354,8 @@ def main():
     # 生成群体描述
     cluster_descriptions = []
     for cluster_id in range(n_clusters):
-        mastery_desc = cluster_centers.loc[cluster_id].to_dict()
-        behavior_desc = behavior_means.loc[cluster_id].to_dict()
+        mastery_desc = cluster_centers.loc[cluster_id]
+        behavior_desc = behavior_means.loc[cluster_id]
         
         # 识别最强和最弱的知识点
         strongest_knowledge = mastery_desc.index[np.argmax(mastery_desc.values)]
@@ -241,5 +383,48 @@ def main():
     with open("./result/学生群体特征描述.txt", "w") as f:
         f.write("\n".join(cluster_descriptions))
 
+def run_predict(input_file, version=None):
+    """新学生分配：读取存档模型，把新评分的学生分配到最近的已有簇，不重新拟合"""
+    cluster_model = load_cluster_model(version)
+    knowledge_df = pd.read_excel(input_file)
+
+    labels, distances = predict_clusters(knowledge_df, cluster_model)
+    assigned_df = knowledge_df[['Class', 'StuNum']].copy()
+    assigned_df['cluster'] = labels
+    assigned_df['distance_to_center'] = distances
+    assigned_df['model_version'] = cluster_model["version"]
+    unassigned = assigned_df[assigned_df['cluster'] == UNASSIGNED_CLUSTER]
+    if not unassigned.empty:
+        print(f"警告：{len(unassigned)} 名学生的掌握特征有缺失，未分配簇（cluster={UNASSIGNED_CLUSTER}）: "
+              f"{', '.join(f'{c}-{s}' for c, s in zip(unassigned['Class'], unassigned['StuNum']))}")
+
+    output_file = "./result/新学生聚类分配结果.xlsx"
+    assigned_df.to_excel(output_file, index=False)
+    print(f"使用模型 v{cluster_model['version']}（{cluster_model['created_at']}）完成 {len(assigned_df)} 名学生的簇分配")
+    print(assigned_df['cluster'].value_counts().sort_index())
+    print(f"结果已保存到: {output_file}")
+
+def main():
+    parser = argparse.ArgumentParser(description="学生知识掌握聚类分析")
+    parser.add_argument("--mode", choices=["fit", "predict"], default="fit",
+                        help="fit：全量聚类并存档模型；predict：用存档模型为新学生分配簇")
+    parser.add_argument("--input", default="./result/学生知识掌握程度评估.xlsx",
+                        help="predict 模式下待分配学生的知识掌握评估文件")
+    parser.add_argument("--model-version", type=int, default=None,
+                        help="predict 模式使用的模型版本（默认最新）")
+    parser.add_argument("--report", action="store_true",
+                        help="无界面报告模式：Agg 后端出图，跳过输入未变化的图")
+    parser.add_argument("--preview", action="store_true", help="输出低分辨率预览图（配合 --report）")
+    parser.add_argument("--workers", type=int, default=None, help="并行数：同时拟合的候选簇数、渲染图表的进程数")
+    args = parser.parse_args()
+
+    if args.report:
+        use_headless_backend()
+
+    if args.mode == "predict":
+        run_predict(args.input, args.model_version)
+    else:
+        run_fit(report=args.report, preview=args.preview, max_workers=args.workers)
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
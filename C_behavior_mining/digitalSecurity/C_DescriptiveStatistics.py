@@ -2,12 +2,16 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
-from scipy import stats
 from sklearn.preprocessing import StandardScaler
 from sklearn.cluster import KMeans
 from sklearn.decomposition import PCA
+import argparse
 import warnings
 
+from hypothesis_tests import compare_two_groups, compare_k_groups
+from resampling_inference import N_RESAMPLES, compare_groups_resampling
+from report_rendering import FigureJob, render_figures, print_render_summary, use_headless_backend
+
 # 忽略警告
 warnings.filterwarnings('ignore')
 
@@ -49,8 +53,8 @@ def load_and_prepare_data():
     
     return merged_df, features
 
-def analyze_gender_differences(df, features):
-    """分析性别差异"""
+def analyze_gender_differences(df, features, report_jobs=None):
+    """分析性别差异（report_jobs 不为 None 时只登记出图任务，由报告模式统一渲染）"""
     print("\n" + "="*50)
     print("性别差异分析")
     print("="*50)
@@ -68,23 +72,34 @@ def analyze_gender_differences(df, features):
                            keys=['男生', '女生'])
     gender_desc.to_excel("./result/性别差异描述统计.xlsx")
     
-    # 差异性检验
-    t_test_results = []
-    for feature in features:
-        t_stat, p_value = stats.ttest_ind(male_df[feature].dropna(), 
-                                         female_df[feature].dropna())
-        t_test_results.append({
-            '特征': feature,
-            't值': t_stat,
-            'p值': p_value,
-            '显著性': '显著' if p_value < 0.05 else '不显著'
-        })
-    
-    t_test_df = pd.DataFrame(t_test_results)
+    # 差异性检验（全部特征一次性批量计算：t 检验、Welch t 检验、Mann-Whitney U 检验 + FDR 校正）
+    t_test_df = compare_two_groups(df, features, df['Sex'] == 1, df['Sex'] == 2)
     t_test_df.to_excel("./result/性别差异t检验结果.xlsx", index=False)
     
     # 可视化
-    plt.figure(figsize=(18, 12))
+    if report_jobs is None:
+        draw_gender_figure(df, features)
+        plt.savefig('./result/性别差异分析.png', dpi=300)
+        plt.show()
+    else:
+        report_jobs.append(FigureJob('./result/性别差异分析.png', draw_gender_figure,
+                                     {"df": df, "features": features}))
+    
+    # 打印关键结果
+    print("\n性别差异分析结果摘要:")
+    print(f"男生人数: {len(male_df)}, 女生人数: {len(female_df)}")
+    print("\n显著差异特征:")
+    for _, row in t_test_df[t_test_df['显著性'] == '显著'].iterrows():
+        print(f"- {row['特征']}: t值={row['t值']:.2f}, p值={row['p值']:.4f}, FDR校正p值={row['FDR校正p值']:.4f}")
+    
+    return t_test_df
+
+def draw_gender_figure(df, features):
+    """绘制性别差异四联图，返回 Figure"""
+    male_df = df[df['Sex'] == 1]
+    female_df = df[df['Sex'] == 2]
+    
+    fig = plt.figure(figsize=(18, 12))
     
     # 1. 行为特征对比
     plt.subplot(2, 2, 1)
@@ -142,20 +157,10 @@ def analyze_gender_differences(df, features):
     plt.ylabel('性别')
     
     plt.tight_layout()
-    plt.savefig('./result/性别差异分析.png', dpi=300)
-    plt.show()
-    
-    # 打印关键结果
-    print("\n性别差异分析结果摘要:")
-    print(f"男生人数: {len(male_df)}, 女生人数: {len(female_df)}")
-    print("\n显著差异特征:")
-    for _, row in t_test_df[t_test_df['显著性'] == '显著'].iterrows():
-        print(f"- {row['特征']}: t值={row['t值']:.2f}, p值={row['p值']:.4f}")
-    
-    return t_test_df
+    return fig
 
-def analyze_score_differences(df, features):
-    """分析成绩差异"""
+def analyze_score_differences(df, features, report_jobs=None):
+    """分析成绩差异（report_jobs 不为 None 时只登记出图任务，由报告模式统一渲染）"""
     print("\n" + "="*50)
     print("成绩差异分析")
     print("="*50)
@@ -175,26 +180,31 @@ def analyze_score_differences(df, features):
                            keys=['低分组', '中分组', '高分组'])
     score_desc.to_excel("./result/成绩差异描述统计.xlsx")
     
-    # 方差分析
-    anova_results = []
-    for feature in features:
-        f_stat, p_value = stats.f_oneway(
-            low_score[feature].dropna(),
-            mid_score[feature].dropna(),
-            high_score[feature].dropna()
-        )
-        anova_results.append({
-            '特征': feature,
-            'F值': f_stat,
-            'p值': p_value,
-            '显著性': '显著' if p_value < 0.05 else '不显著'
-        })
-    
-    anova_df = pd.DataFrame(anova_results)
+    # 方差分析（全部特征一次性批量计算：单因素方差分析、Kruskal-Wallis 检验 + FDR 校正）
+    anova_df = compare_k_groups(df, features, 'score_group', ['低分组', '中分组', '高分组'])
     anova_df.to_excel("./result/成绩差异方差分析结果.xlsx", index=False)
     
     # 可视化
-    plt.figure(figsize=(18, 12))
+    if report_jobs is None:
+        draw_score_figure(df, features)
+        plt.savefig('./result/成绩差异分析.png', dpi=300)
+        plt.show()
+    else:
+        report_jobs.append(FigureJob('./result/成绩差异分析.png', draw_score_figure,
+                                     {"df": df, "features": features}))
+    
+    # 打印关键结果
+    print("\n成绩差异分析结果摘要:")
+    print(f"低分组人数: {len(low_score)}, 中分组人数: {len(mid_score)}, 高分组人数: {len(high_score)}")
+    print("\n显著差异特征:")
+    for _, row in anova_df[anova_df['显著性'] == '显著'].iterrows():
+        print(f"- {row['特征']}: F值={row['F值']:.2f}, p值={row['p值']:.4f}, FDR校正p值={row['FDR校正p值']:.4f}")
+    
+    return anova_df
+
+def draw_score_figure(df, features):
+    """绘制成绩差异四联图，返回 Figure"""
+    fig = plt.figure(figsize=(18, 12))
     
     # 1. 知识掌握与成绩关系
     plt.subplot(2, 2, 1)
@@ -248,22 +258,12 @@ def analyze_score_differences(df, features):
     plt.ylabel(f"主成分2 (方差解释率: {pca.explained_variance_ratio_[1]:.2f})")
     
     plt.tight_layout()
-    plt.savefig('./result/成绩差异分析.png', dpi=300)
-    plt.show()
-    
-    # 打印关键结果
-    print("\n成绩差异分析结果摘要:")
-    print(f"低分组人数: {len(low_score)}, 中分组人数: {len(mid_score)}, 高分组人数: {len(high_score)}")
-    print("\n显著差异特征:")
-    for _, row in anova_df[anova_df['显著性'] == '显著'].iterrows():
-        print(f"- {row['特征']}: F值={row['F值']:.2f}, p值={row['p值']:.4f}")
-    
-    return anova_df
+    return fig
 
-def generate_cluster_profiles(df, features):
-    """生成性别和成绩组合群体的聚类画像"""
+def generate_cluster_profiles(df, features, report_jobs=None):
+    """生成性别和成绩组合群体的聚类画像（report_jobs 不为 None 时只登记出图任务）"""
     # 创建组合分组
-    df['gender_score_group'] = df['gender_group'] + '_' + df['score_group']
+    df['gender_score_group'] = df['gender_group'] + '_' + df['score_group'].astype(str)
     
     # 选择分析特征
     analysis_features = features + [
@@ -281,7 +281,19 @@ def generate_cluster_profiles(df, features):
     group_profiles.to_excel("./result/性别_成绩组合群体画像.xlsx")
     
     # 可视化
-    plt.figure(figsize=(15, 10))
+    if report_jobs is None:
+        draw_group_profile_figure(group_profiles)
+        plt.savefig('./result/性别_成绩组合群体画像.png', dpi=300)
+        plt.show()
+    else:
+        report_jobs.append(FigureJob('./result/性别_成绩组合群体画像.png', draw_group_profile_figure,
+                                     {"group_profiles": group_profiles}))
+    
+    return group_profiles
+
+def draw_group_profile_figure(group_profiles):
+    """绘制组合群体画像热力图，返回 Figure"""
+    fig = plt.figure(figsize=(15, 10))
     
     # 标准化数据以便比较
     scaler = StandardScaler()
@@ -299,29 +311,84 @@ def generate_cluster_profiles(df, features):
     plt.ylabel('群体')
     
     plt.tight_layout()
-    plt.savefig('./result/性别_成绩组合群体画像.png', dpi=300)
-    plt.show()
+    return fig
+
+def analyze_resampling_inference(df, features, n_resamples=N_RESAMPLES, max_workers=None):
+    """置换检验与 Bootstrap 置信区间（性别、成绩三分组、性别×成绩组合）"""
+    print("\n" + "="*50)
+    print(f"置换检验与Bootstrap置信区间（重抽样 {n_resamples} 次）")
+    print("="*50)
     
-    return group_profiles
+    score_groups = ['低分组', '中分组', '高分组']
+    combo = df['gender_group'] + '_' + df['score_group'].astype(str)
+    combo_df = df.assign(gender_score_group=combo)
+    combo_groups = [f"{g}_{s}" for g in ['男生', '女生'] for s in score_groups]
+    
+    comparisons = [
+        ('性别', combo_df, 'gender_group', ['男生', '女生']),
+        ('成绩分组', combo_df, 'score_group', score_groups),
+        ('性别×成绩分组', combo_df, 'gender_score_group', combo_groups),
+    ]
+    resampling_df = pd.concat([
+        compare_groups_resampling(data, features, col, order, comparison=name,
+                                  n_resamples=n_resamples, max_workers=max_workers)
+        for name, data, col, order in comparisons
+    ], ignore_index=True)
+    resampling_df.to_excel("./result/群体差异置换检验与Bootstrap置信区间.xlsx", index=False)
+    
+    # 打印关键结果
+    print("\n置换检验显著差异特征（FDR校正后）:")
+    ci_cols = [c for c in resampling_df.columns if 'CI' in c]
+    for _, row in resampling_df[resampling_df['显著性'] == '显著'].iterrows():
+        print(f"- [{row['比较']}] {row['特征']}: {row['统计量']}={row['统计量值']:.3f}, "
+              f"置换p值={row['置换p值']:.4f}, {row['效应量']} {ci_cols[0][:-2]}=[{row[ci_cols[0]]:.3f}, {row[ci_cols[1]]:.3f}]")
+    
+    return resampling_df
 
 def main():
+    parser = argparse.ArgumentParser(description="性别/成绩群体差异描述统计")
+    parser.add_argument("--report", action="store_true",
+                        help="无界面报告模式：Agg 后端并行出图，跳过输入未变化的图")
+    parser.add_argument("--preview", action="store_true", help="输出低分辨率预览图（配合 --report）")
+    parser.add_argument("--workers", type=int, default=None, help="并行进程数（图表渲染、重抽样）")
+    parser.add_argument("--resamples", type=int, default=N_RESAMPLES,
+                        help="置换检验/Bootstrap 重抽样次数，0 表示跳过")
+    args = parser.parse_args()
+
+    report_jobs = None
+    if args.report:
+        use_headless_backend()
+        report_jobs = []
+
     # 加载并准备数据
     df, features = load_and_prepare_data()
     
     # 性别差异分析
-    gender_results = analyze_gender_differences(df, features)
+    gender_results = analyze_gender_differences(df, features, report_jobs)
     
     # 成绩差异分析
-    score_results = analyze_score_differences(df, features)
+    score_results = analyze_score_differences(df, features, report_jobs)
     
     # 生成组合群体画像
-    group_profiles = generate_cluster_profiles(df, features)
+    group_profiles = generate_cluster_profiles(df, features, report_jobs)
+    
+    # 置换检验与 Bootstrap 置信区间
+    resampling_results = None
+    if args.resamples > 0:
+        resampling_results = analyze_resampling_inference(df, features, args.resamples, args.workers)
+    
+    # 报告模式：三张图相互独立，并行渲染
+    if report_jobs is not None:
+        status = render_figures(report_jobs, preview=args.preview, max_workers=args.workers)
+        print_render_summary(status)
     
     # 保存最终结果
     with pd.ExcelWriter("./result/群体差异分析报告.xlsx") as writer:
         gender_results.to_excel(writer, sheet_name="性别差异检验", index=False)
         score_results.to_excel(writer, sheet_name="成绩差异检验", index=False)
         group_profiles.to_excel(writer, sheet_name="组合群体画像")
+        if resampling_results is not None:
+            resampling_results.to_excel(writer, sheet_name="置换检验与Bootstrap", index=False)
     
     print("\n分析完成！结果已保存到./result/目录下")
 
@@ -0,0 +1,150 @@
+# 分层分析：按班级、学校、全体三个层次分别运行描述统计、性别差异、成绩分组差异和聚类分析
+# 各分层相互独立，在进程池中并行计算，结果汇总为一张长格式结果表：
+#   分层类型 | 分层 | 样本量 | 分析 | 特征 | 指标 | 值
+
+import io
+import os
+import sys
+import argparse
+import contextlib
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from C_DescriptiveStatistics import load_and_prepare_data
+from B_Grouping_clustering import prepare_clustering_data, perform_clustering
+from hypothesis_tests import compare_two_groups, compare_k_groups
+
+B_DIR = "../../B_data_preprocessing/StandardizationOfGameBehaviorCoding/digitalSecurity"
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), B_DIR))
+from class_names import school_of
+
+warnings.filterwarnings('ignore')
+
+STRATUM_LEVELS = ['班级', '学校', '全体']
+SCORE_GROUPS = ['低分组', '中分组', '高分组']
+MIN_GROUP_SIZE = 2          # 组内人数少于该值时跳过对应差异检验
+MIN_CLUSTER_STUDENTS = 10   # 分层人数少于该值时跳过聚类分析
+OUTPUT_FILE = "./result/分层分析结果.xlsx"
+
+
+def build_strata(df, levels=STRATUM_LEVELS):
+    """生成 (分层类型, 分层名称, 子数据) 列表"""
+    strata = []
+    if '班级' in levels:
+        strata += [('班级', name, sub) for name, sub in df.groupby('Class', sort=True)]
+    if '学校' in levels:
+        strata += [('学校', name, sub) for name, sub in df.groupby(df['Class'].map(school_of), sort=True)]
+    if '全体' in levels:
+        strata.append(('全体', '全体', df))
+    return strata
+
+
+def assign_score_groups(df):
+    """在分层内部重新划分成绩三分组（成绩并列导致分位点重复时按名次划分）"""
+    try:
+        return pd.qcut(df['postScore'], q=3, labels=SCORE_GROUPS)
+    except ValueError:
+        return pd.qcut(df['postScore'].rank(method='first'), q=3, labels=SCORE_GROUPS)
+
+
+def _melt_test_table(test_df, analysis):
+    """检验结果表（每个特征一行）转为长格式，只保留数值指标"""
+    value_cols = [c for c in test_df.columns if c != '特征' and pd.api.types.is_numeric_dtype(test_df[c])]
+    long_df = test_df.melt(id_vars='特征', value_vars=value_cols, var_name='指标', value_name='值')
+    long_df.insert(0, '分析', analysis)
+    return long_df
+
+
+def describe_stratum(df, features):
+    """描述统计：每个特征的有效人数、均值、标准差、最小值、最大值"""
+    desc = df[features].agg(['count', 'mean', 'std', 'min', 'max']).T
+    desc.columns = ['有效人数', '均值', '标准差', '最小值', '最大值']
+    desc = desc.rename_axis('特征').reset_index()
+    return _melt_test_table(desc, '描述统计')
+
+
+def cluster_stratum(df):
+    """聚类分析：最佳簇数、轮廓系数、各簇人数与簇中心"""
+    cluster_df, mastery_features, _ = prepare_clustering_data(df)
+    # 分层内部已在进程池中并行，聚类候选k串行拟合；屏蔽逐层的过程输出
+    with contextlib.redirect_stdout(io.StringIO()):
+        cluster_df, cluster_centers, best_n_clusters, cluster_model = perform_clustering(
+            cluster_df, mastery_features, max_workers=1
+        )
+
+    rows = [
+        {'特征': '', '指标': '最佳簇数', '值': best_n_clusters},
+        {'特征': '', '指标': '轮廓系数', '值': cluster_model['silhouette']},
+    ]
+    sizes = cluster_df['cluster'].value_counts().sort_index()
+    for c in range(best_n_clusters):
+        rows.append({'特征': '', '指标': f'簇{c}人数', '值': int(sizes.get(c, 0))})
+        for feature in mastery_features:
+            rows.append({'特征': feature, '指标': f'簇{c}中心', '值': cluster_centers.loc[c, feature]})
+    long_df = pd.DataFrame(rows)
+    long_df.insert(0, '分析', '聚类分析')
+    return long_df
+
+
+def analyze_stratum(stratum_type, stratum, df, features):
+    """对单个分层运行全部分析，返回长格式结果"""
+    df = df.copy()
+    df['score_group'] = assign_score_groups(df)
+    parts = [describe_stratum(df, features)]
+
+    male, female = df['Sex'] == 1, df['Sex'] == 2
+    if male.sum() >= MIN_GROUP_SIZE and female.sum() >= MIN_GROUP_SIZE:
+        parts.append(_melt_test_table(compare_two_groups(df, features, male, female), '性别差异'))
+
+    group_sizes = df['score_group'].value_counts()
+    if all(group_sizes.get(g, 0) >= MIN_GROUP_SIZE for g in SCORE_GROUPS):
+        parts.append(_melt_test_table(compare_k_groups(df, features, 'score_group', SCORE_GROUPS), '成绩差异'))
+
+    if len(df) >= MIN_CLUSTER_STUDENTS:
+        parts.append(cluster_stratum(df))
+
+    result = pd.concat(parts, ignore_index=True)
+    result.insert(0, '样本量', len(df))
+    result.insert(0, '分层', stratum)
+    result.insert(0, '分层类型', stratum_type)
+    return result
+
+
+def run_stratified_analysis(df, features, levels=STRATUM_LEVELS, max_workers=None):
+    """各分层并行分析，汇总为一张长格式结果表"""
+    strata = build_strata(df, levels)
+    if max_workers == 1:
+        results = [analyze_stratum(t, name, sub, features) for t, name, sub in strata]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(analyze_stratum, t, name, sub, features) for t, name, sub in strata]
+            results = [f.result() for f in futures]
+    return pd.concat(results, ignore_index=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="按班级/学校/全体分层的群体差异与聚类分析")
+    parser.add_argument("--levels", nargs="+", choices=STRATUM_LEVELS, default=STRATUM_LEVELS,
+                        help="要分析的分层类型")
+    parser.add_argument("--workers", type=int, default=None, help="并行进程数")
+    args = parser.parse_args()
+
+    df, features = load_and_prepare_data()
+    result = run_stratified_analysis(df, features, args.levels, args.workers)
+    result.to_excel(OUTPUT_FILE, index=False)
+
+    # 打印各分层摘要
+    summary = result.groupby(['分层类型', '分层'], sort=False).agg(
+        样本量=('样本量', 'first'),
+        分析项数=('分析', 'nunique'),
+        显著检验项数=('值', lambda v: int(((result.loc[v.index, '指标'] == 'p值') & (v < 0.05)).sum())),
+    )
+    print("\n分层分析摘要:")
+    print(summary)
+    print(f"\n分层分析完成！共 {len(summary)} 个分层，结果已保存到: {OUTPUT_FILE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+# 批量向量化假设检验：对整张特征矩阵沿 axis=0 一次性计算所有特征的检验统计量
+# - 两组比较：Student t 检验、Welch t 检验、Mann-Whitney U 检验
+# - 多组比较：单因素方差分析（含 eta²）、Kruskal-Wallis 检验
+# - 多重比较校正：Benjamini-Hochberg FDR
+# 缺失值（NaN）按特征逐列剔除，与逐特征 dropna 后调用 scipy 的结果一致
+
+import warnings
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+ALPHA = 0.05    # 显著性水平（原始 p 值与 FDR 校正 p 值共用）
+
+
+def _group_moments(X):
+    """按列计算有效样本量、均值、离差平方和（忽略NaN）"""
+    valid = ~np.isnan(X)
+    n = valid.sum(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = np.where(valid, X, 0).sum(axis=0) / n
+        ss = np.where(valid, (X - mean) ** 2, 0).sum(axis=0)
+    return n, mean, ss
+
+
+def ttest_batch(a, b, equal_var=True):
+    """两组独立样本 t 检验，a: (n_a, p)，b: (n_b, p)；返回 (t值, p值, 自由度)"""
+    n_a, m_a, ss_a = _group_moments(a)
+    n_b, m_b, ss_b = _group_moments(b)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        v_a, v_b = ss_a / (n_a - 1), ss_b / (n_b - 1)
+        if equal_var:
+            dof = n_a + n_b - 2.0
+            se = np.sqrt((ss_a + ss_b) / dof * (1.0 / n_a + 1.0 / n_b))
+        else:
+            s_a, s_b = v_a / n_a, v_b / n_b
+            se = np.sqrt(s_a + s_b)
+            dof = (s_a + s_b) ** 2 / (s_a ** 2 / (n_a - 1) + s_b ** 2 / (n_b - 1))
+        t = (m_a - m_b) / se
+    p = 2 * stats.t.sf(np.abs(t), dof)
+    return t, p, dof
+
+
+def anova_batch(groups):
+    """单因素方差分析，groups: [(n_g, p), ...]；返回 (F值, p值, eta²)"""
+    moments = [_group_moments(g) for g in groups]
+    n = np.array([m[0] for m in moments], dtype=float)
+    means = np.array([m[1] for m in moments])
+    ss_within = np.nansum([m[2] for m in moments], axis=0)
+
+    # 只有有效样本的组参与计算（与逐特征 dropna 后调用 f_oneway 一致）
+    k = (n > 0).sum(axis=0)
+    n_total = n.sum(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        grand_mean = np.nansum(n * means, axis=0) / n_total
+        ss_between = np.nansum(n * (means - grand_mean) ** 2, axis=0)
+        f = (ss_between / (k - 1)) / (ss_within / (n_total - k))
+        eta_sq = ss_between / (ss_between + ss_within)
+    p = stats.f.sf(f, k - 1, n_total - k)
+    return f, p, eta_sq
+
+
+def mannwhitney_batch(a, b):
+    """Mann-Whitney U 检验（双侧），一次 scipy 调用覆盖全部特征；返回 (U值, p值)"""
+    nan_policy = "omit" if np.isnan(a).any() or np.isnan(b).any() else "propagate"
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        res = stats.mannwhitneyu(a, b, axis=0, alternative="two-sided", nan_policy=nan_policy)
+    return np.asarray(res.statistic, dtype=float), np.asarray(res.pvalue, dtype=float)
+
+
+def kruskal_batch(groups):
+    """Kruskal-Wallis 检验，一次 scipy 调用覆盖全部特征；返回 (H值, p值)"""
+    nan_policy = "omit" if any(np.isnan(g).any() for g in groups) else "propagate"
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        res = stats.kruskal(*groups, axis=0, nan_policy=nan_policy)
+    return np.asarray(res.statistic, dtype=float), np.asarray(res.pvalue, dtype=float)
+
+
+def fdr_bh(pvals):
+    """Benjamini-Hochberg FDR 校正，NaN 不参与排序且保持为 NaN"""
+    pvals = np.asarray(pvals, dtype=float)
+    q = np.full_like(pvals, np.nan)
+    valid = ~np.isnan(pvals)
+    m = valid.sum()
+    if m == 0:
+        return q
+
+    p = pvals[valid]
+    order = np.argsort(p)
+    ranked = p[order] * m / np.arange(1, m + 1)
+    # 从后向前取累计最小值，保证校正后 p 值单调
+    ranked = np.minimum.accumulate(ranked[::-1])[::-1]
+    adjusted = np.empty(m)
+    adjusted[order] = np.minimum(ranked, 1)
+    q[valid] = adjusted
+    return q
+
+
+def _significance(p, alpha=ALPHA):
+    return np.where(p < alpha, '显著', '不显著')
+
+
+def compare_two_groups(df, features, mask_a, mask_b, alpha=ALPHA):
+    """两组差异检验汇总表：Student t、Welch t、Mann-Whitney U 及各自的 FDR 校正"""
+    a = df.loc[mask_a, features].to_numpy(dtype=float)
+    b = df.loc[mask_b, features].to_numpy(dtype=float)
+
+    t, p, _ = ttest_batch(a, b, equal_var=True)
+    welch_t, welch_p, welch_df = ttest_batch(a, b, equal_var=False)
+    u, u_p = mannwhitney_batch(a, b)
+    fdr_p = fdr_bh(p)
+
+    return pd.DataFrame({
+        '特征': features,
+        't值': t,
+        'p值': p,
+        '显著性': _significance(p, alpha),
+        'FDR校正p值': fdr_p,
+        'FDR显著性': _significance(fdr_p, alpha),
+        'Welch t值': welch_t,
+        'Welch 自由度': welch_df,
+        'Welch p值': welch_p,
+        'Welch FDR校正p值': fdr_bh(welch_p),
+        'Mann-Whitney U值': u,
+        'Mann-Whitney p值': u_p,
+        'Mann-Whitney FDR校正p值': fdr_bh(u_p),
+    })
+
+
+def compare_k_groups(df, features, group_col, group_order, alpha=ALPHA):
+    """多组差异检验汇总表：单因素方差分析、Kruskal-Wallis 及各自的 FDR 校正"""
+    groups = [df.loc[df[group_col] == g, features].to_numpy(dtype=float) for g in group_order]
+
+    f, p, eta_sq = anova_batch(groups)
+    h, h_p = kruskal_batch(groups)
+    fdr_p = fdr_bh(p)
+
+    return pd.DataFrame({
+        '特征': features,
+        'F值': f,
+        'p值': p,
+        '显著性': _significance(p, alpha),
+        'eta²': eta_sq,
+        'FDR校正p值': fdr_p,
+        'FDR显著性': _significance(fdr_p, alpha),
+        'Kruskal-Wallis H值': h,
+        'Kruskal-Wallis p值': h_p,
+        'Kruskal-Wallis FDR校正p值': fdr_bh(h_p),
+    })
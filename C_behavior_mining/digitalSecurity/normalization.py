@@ -0,0 +1,113 @@
+# 特征标准化引擎：先一次性向量化计算群体统计量，再按列套用标准化策略
+# 支持的策略：
+#   cap      —— 固定上限截断：min(x / cap, 1)（即原 MAX_* 常数的做法，不依赖群体分布）
+#   minmax   —— 群体最小-最大缩放到0-1
+#   quantile —— 群体分位秩（0-1），用分位数网格近似经验分布，新数据可直接套用
+#   robust   —— (x - 中位数) / 四分位距，再线性映射到0-1（±ROBUST_Z_RANGE 之外截断）；
+#               四分位距为 0（过半学生取同一值）时退回拟合范围，保证中位数两侧的学生仍有序
+# 统计量只与原始特征有关，换策略重新评分只是对缓存的原始特征做一次列变换
+
+import warnings
+
+import numpy as np
+import pandas as pd
+
+NORMALIZATION_STRATEGIES = ["cap", "minmax", "quantile", "robust"]
+
+QUANTILE_GRID_SIZE = 101         # 分位数网格点数（步长0.01，含四分位数和中位数）
+QUANTILE_SKETCH_SIZE = 200000    # 超过该人数时在随机样本上估计分位数网格
+ROBUST_Z_RANGE = 2               # robust 策略映射到0-1时的截断范围（单位：四分位距）
+
+
+def fit_normalization(features_df, columns, random_state=42):
+    """一次向量化计算各列的群体统计量（最小/最大值、分位数网格、中位数、四分位数）"""
+    X = features_df[columns].to_numpy(dtype=float)
+    grid = np.linspace(0, 1, QUANTILE_GRID_SIZE)
+
+    # 大群体：在随机样本上估计分位数网格，最小/最大值仍用全量数据
+    sample = X
+    if len(X) > QUANTILE_SKETCH_SIZE:
+        rng = np.random.default_rng(random_state)
+        sample = X[rng.choice(len(X), QUANTILE_SKETCH_SIZE, replace=False)]
+
+    with warnings.catch_warnings():
+        # 全为NaN的列统计量为NaN
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        quantiles = np.nanquantile(sample, grid, axis=0)
+        col_min = np.nanmin(X, axis=0) if len(X) else np.full(len(columns), np.nan)
+        col_max = np.nanmax(X, axis=0) if len(X) else np.full(len(columns), np.nan)
+
+    quantiles[0], quantiles[-1] = col_min, col_max
+
+    def q(p):
+        return quantiles[int(round(p * (QUANTILE_GRID_SIZE - 1)))]
+
+    return {
+        "columns": list(columns),
+        "n": len(X),
+        "grid": grid,
+        "quantiles": quantiles,
+        "min": col_min,
+        "max": col_max,
+        "median": q(0.5),
+        "q25": q(0.25),
+        "q75": q(0.75),
+    }
+
+
+def robust_scale(stats, idx):
+    """robust 策略的尺度：四分位距；为 0 时（此时过半取值等于中位数，MAD 也为 0）
+    退回拟合范围（中位数到较远端点的距离 / ROBUST_Z_RANGE，使拟合范围内的值不被截断）"""
+    iqr = stats["q75"][idx] - stats["q25"][idx]
+    median = stats["median"][idx]
+    spread = np.maximum(stats["max"][idx] - median, median - stats["min"][idx]) / ROBUST_Z_RANGE
+    return np.where(iqr > 0, iqr, spread)
+
+
+def _quantile_rank(X, quantiles, grid):
+    """按分位数网格计算分位秩（并列值取左右两端的平均秩）"""
+    ranks = np.empty_like(X)
+    for c in range(X.shape[1]):
+        xp = quantiles[:, c]
+        right = np.interp(X[:, c], xp, grid)
+        left = 1 - np.interp(-X[:, c], -xp[::-1], 1 - grid[::-1])
+        ranks[:, c] = 0.5 * (left + right)
+    return ranks
+
+
+def apply_normalization(features_df, specs, stats, strategy="cap"):
+    """按策略把原始特征列标准化为0-1得分列
+
+    specs: {原始列名: {"output": 输出列名, "cap": 上限(None表示已是0-1比例，直接透传), "negative": 是否负向指标}}
+    stats: fit_normalization 的返回值（cap 策略可为 None）
+    """
+    if strategy not in NORMALIZATION_STRATEGIES:
+        raise ValueError(f"未知的标准化策略: {strategy}，可选: {NORMALIZATION_STRATEGIES}")
+
+    raw_cols = list(specs.keys())
+    X = features_df[raw_cols].to_numpy(dtype=float)
+    caps = np.array([np.nan if specs[c]["cap"] is None else specs[c]["cap"] for c in raw_cols], dtype=float)
+    negative = np.array([specs[c].get("negative", False) for c in raw_cols])
+    passthrough = np.isnan(caps)
+
+    if strategy == "cap":
+        scores = np.minimum(X / np.where(passthrough, 1, caps), 1)
+    else:
+        idx = [stats["columns"].index(c) for c in raw_cols]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if strategy == "minmax":
+                span = stats["max"][idx] - stats["min"][idx]
+                scores = np.where(span > 0, (X - stats["min"][idx]) / span, 0.0)
+            elif strategy == "quantile":
+                scores = _quantile_rank(X, stats["quantiles"][:, idx], stats["grid"])
+            else:
+                scale = robust_scale(stats, idx)
+                z = np.where(scale > 0, (X - stats["median"][idx]) / scale, 0.0)
+                scores = (np.clip(z, -ROBUST_Z_RANGE, ROBUST_Z_RANGE) + ROBUST_Z_RANGE) / (2 * ROBUST_Z_RANGE)
+        scores = np.where(passthrough, X, scores)
+
+    # 负向指标（次数越多得分越低）
+    scores = np.where(negative, np.maximum(0, 1 - scores), scores)
+    scores = np.where(np.isnan(X), np.nan, scores)
+
+    return pd.DataFrame(scores, columns=[specs[c]["output"] for c in raw_cols], index=features_df.index)
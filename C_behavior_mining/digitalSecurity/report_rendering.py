@@ -0,0 +1,144 @@
+# 分析报告图表渲染：无界面服务器上批量出图
+# - 使用 Agg 后端，不调用 plt.show()
+# - 相互独立的图表在进程池中并行渲染
+# - 输入哈希（绘图函数源码 + 参数数据 + 分辨率 + 渲染器版本）未变化且图片已存在时跳过
+# - 支持低分辨率预览图（文件名加 _preview 后缀）
+
+import os
+import json
+import hashlib
+import inspect
+from dataclasses import dataclass, field
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+
+REPORT_DPI = 300            # 正式报告分辨率
+PREVIEW_DPI = 72            # 预览图分辨率
+HASH_MANIFEST = ".figure_hashes.json"
+RENDERER_VERSION = 1        # 渲染流程本身（保存方式、全局样式等）变化时递增，使旧图全部重绘
+
+
+@dataclass
+class FigureJob:
+    """一张待渲染的图：输出路径 + 绘图函数（返回 Figure）+ 绘图函数参数"""
+    output_path: str
+    draw_func: object
+    kwargs: dict = field(default_factory=dict)
+
+
+def use_headless_backend():
+    """切换到 Agg 后端（无界面服务器上不弹窗、不阻塞）"""
+    plt.switch_backend("Agg")
+
+
+def _hash_value(hasher, value):
+    """把绘图参数写入哈希（DataFrame/Series 按内容哈希）"""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        hasher.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+        names = value.columns if isinstance(value, pd.DataFrame) else [value.name]
+        hasher.update(repr(list(names)).encode("utf-8"))
+    elif isinstance(value, np.ndarray):
+        hasher.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, dict):
+        for key in sorted(value):
+            hasher.update(str(key).encode("utf-8"))
+            _hash_value(hasher, value[key])
+    else:
+        hasher.update(repr(value).encode("utf-8"))
+
+
+def _function_code(func):
+    """绘图函数的源码（取不到源码时用字节码和常量），改了绘图代码哈希随之变化"""
+    try:
+        return inspect.getsource(func).encode("utf-8")
+    except (OSError, TypeError):
+        code = func.__code__
+        return code.co_code + repr(code.co_consts).encode("utf-8")
+
+
+def figure_hash(job, dpi):
+    """图表输入哈希（渲染器版本 + 绘图函数及其源码 + 参数内容 + 分辨率）"""
+    hasher = hashlib.sha256()
+    hasher.update(f"v{RENDERER_VERSION}:{job.draw_func.__module__}.{job.draw_func.__qualname__}:{dpi}".encode("utf-8"))
+    hasher.update(_function_code(job.draw_func))
+    _hash_value(hasher, job.kwargs)
+    return hasher.hexdigest()
+
+
+def preview_path(output_path):
+    """预览图文件名：xxx.png -> xxx_preview.png"""
+    root, ext = os.path.splitext(output_path)
+    return f"{root}_preview{ext}"
+
+
+def _render_job(job, output_path, dpi):
+    """在子进程中渲染并保存单张图"""
+    use_headless_backend()
+    fig = job.draw_func(**job.kwargs)
+    fig.savefig(output_path, dpi=dpi)
+    plt.close(fig)
+    return output_path
+
+
+def _load_manifest(path):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def render_figures(jobs, preview=False, dpi=None, max_workers=None, force=False):
+    """并行渲染一组独立图表，输入未变化的图表直接跳过；返回 {输出路径: "rendered"/"skipped"}"""
+    dpi = dpi or (PREVIEW_DPI if preview else REPORT_DPI)
+    status = {}
+    pending = []
+    manifests = {}
+
+    for job in jobs:
+        output_path = preview_path(job.output_path) if preview else job.output_path
+        output_dir = os.path.dirname(output_path) or "."
+        os.makedirs(output_dir, exist_ok=True)
+        manifest_path = os.path.join(output_dir, HASH_MANIFEST)
+        manifest = manifests.setdefault(manifest_path, _load_manifest(manifest_path))
+
+        digest = figure_hash(job, dpi)
+        key = os.path.basename(output_path)
+        if not force and manifest.get(key) == digest and os.path.exists(output_path):
+            status[output_path] = "skipped"
+            continue
+        pending.append((job, output_path, manifest_path, key, digest))
+
+    if pending:
+        if max_workers == 1 or len(pending) == 1:
+            rendered = [_render_job(job, path, dpi) for job, path, *_ in pending]
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                futures = [executor.submit(_render_job, job, path, dpi) for job, path, *_ in pending]
+                rendered = [f.result() for f in futures]
+
+        for (_, output_path, manifest_path, key, digest), _ in zip(pending, rendered):
+            manifests[manifest_path][key] = digest
+            status[output_path] = "rendered"
+
+        for manifest_path, manifest in manifests.items():
+            with open(manifest_path, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    return status
+
+
+def print_render_summary(status):
+    """打印渲染结果摘要"""
+    rendered = [p for p, s in status.items() if s == "rendered"]
+    skipped = [p for p, s in status.items() if s == "skipped"]
+    print(f"\n图表渲染完成：新渲染 {len(rendered)} 张，未变化跳过 {len(skipped)} 张")
+    for path in rendered:
+        print(f"- 已渲染: {path}")
+    for path in skipped:
+        print(f"- 已跳过: {path}")
@@ -0,0 +1,195 @@
+# 置换检验与 Bootstrap 置信区间：批量 NumPy 重抽样，所有特征共用同一组重抽样矩阵
+# - 置换检验：每个分块生成一次置换标签矩阵 (B, n)，对全部特征同时计算统计量
+#   两组比较用均值差（双侧），多组比较用 F 统计量
+# - Bootstrap：组内分层重抽样（保持各组人数），用重抽样权重矩阵 (B, n) 与特征矩阵做一次矩阵乘法
+#   两组比较给出均值差的置信区间，多组比较给出 eta² 的置信区间
+# - 由 SeedSequence 为每个分块派生独立随机数种子，结果与进程数无关、可复现
+# - 分块在进程池中并行计算
+
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from hypothesis_tests import ALPHA, fdr_bh
+
+N_RESAMPLES = 10000         # 默认置换次数 / Bootstrap 次数
+CI_LEVEL = 0.95             # 置信区间水平
+RANDOM_SEED = 42
+CHUNK_SIZE = 500            # 每个分块的重抽样次数上限
+CHUNK_ELEMENTS = 5_000_000  # 每个分块权重矩阵 (组数 × B × n) 的元素数上限，防止大样本时内存过大
+
+_WORKER = {}
+
+
+def _prepare(X, codes, k):
+    """预先计算零填充矩阵、平方矩阵和有效值掩码（NaN 按缺失处理）"""
+    valid = ~np.isnan(X)
+    X0 = np.where(valid, X, 0.0)
+    return {"X0": X0, "X0sq": X0 ** 2, "M": valid.astype(float), "codes": codes, "k": k}
+
+
+def _init_worker(X, codes, k):
+    """进程池初始化：每个进程只接收一次特征矩阵"""
+    _WORKER.clear()
+    _WORKER.update(_prepare(X, codes, k))
+
+
+def _group_statistics(weights, data):
+    """weights: (k, B, n) 各组样本权重；返回 (统计量, 效应量)，形状均为 (B, p)
+
+    两组：统计量与效应量都是均值差（组0 - 组1），任一组无有效值时为 NaN
+    多组：统计量为 F 值，效应量为 eta²；组数按特征计（只计有有效值的组，与 hypothesis_tests.anova_batch 一致）
+    """
+    counts = weights @ data["M"]
+    sums = weights @ data["X0"]
+    sumsq = weights @ data["X0sq"]
+    k = data["k"]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        means = sums / counts
+        if k == 2:
+            diff = means[0] - means[1]
+            return diff, diff
+
+        k_valid = (counts > 0).sum(axis=0)
+        n_total = counts.sum(axis=0)
+        grand_mean = sums.sum(axis=0) / n_total
+        ss_between = np.nansum(counts * (means - grand_mean) ** 2, axis=0)
+        ss_within = np.nansum(sumsq - sums * means, axis=0)
+        f = (ss_between / (k_valid - 1)) / (ss_within / (n_total - k_valid))
+        f = np.where(k_valid > 1, f, np.nan)
+        eta_sq = ss_between / (ss_between + ss_within)
+    return f, eta_sq
+
+
+def _onehot(labels, k):
+    """标签矩阵 (B, n) -> 组权重 (k, B, n)"""
+    return (labels[None, :, :] == np.arange(k)[:, None, None]).astype(float)
+
+
+def _permutation_chunk(data, seed, size, observed):
+    """一个分块的置换：返回置换统计量不小于观测值的次数 (p,)"""
+    rng = np.random.default_rng(seed)
+    labels = rng.permuted(np.tile(data["codes"], (size, 1)), axis=1)
+    stat, _ = _group_statistics(_onehot(labels, data["k"]), data)
+
+    # 浮点误差容忍，避免与观测值相等的置换因舍入被漏计
+    tol = 1e-12 * np.maximum(1, np.abs(observed))
+    if data["k"] == 2:
+        exceed = np.abs(stat) >= np.abs(observed) - tol
+    else:
+        exceed = stat >= observed - tol
+    return exceed.sum(axis=0)
+
+
+def _bootstrap_chunk(data, seed, size):
+    """一个分块的组内分层 Bootstrap：返回效应量 (size, p)"""
+    rng = np.random.default_rng(seed)
+    codes, k = data["codes"], data["k"]
+    n = len(codes)
+
+    # 分层重抽样索引矩阵 (size, n)：每组在组内有放回抽取原组人数
+    index = np.empty((size, n), dtype=np.int64)
+    start = 0
+    for g in range(k):
+        rows = np.flatnonzero(codes == g)
+        if not len(rows):
+            continue
+        index[:, start:start + len(rows)] = rows[rng.integers(0, len(rows), (size, len(rows)))]
+        start += len(rows)
+
+    # 索引矩阵 -> 每行样本被抽中次数的权重矩阵
+    flat = (index + np.arange(size)[:, None] * n).ravel()
+    counts = np.bincount(flat, minlength=size * n).reshape(size, n).astype(float)
+    weights = _onehot(np.broadcast_to(codes, (size, n)), k) * counts[None, :, :]
+    _, effect = _group_statistics(weights, data)
+    return effect
+
+
+def _run_chunk(task):
+    kind, seed, size, observed = task
+    if kind == "permutation":
+        return kind, _permutation_chunk(_WORKER, seed, size, observed)
+    return kind, _bootstrap_chunk(_WORKER, seed, size)
+
+
+def _chunk_sizes(total, chunk_size):
+    sizes = [chunk_size] * (total // chunk_size)
+    if total % chunk_size:
+        sizes.append(total % chunk_size)
+    return sizes
+
+
+def resample_group_comparison(X, codes, n_permutations=N_RESAMPLES, n_bootstrap=N_RESAMPLES,
+                              ci_level=CI_LEVEL, seed=RANDOM_SEED, max_workers=None, n_groups=None):
+    """对特征矩阵 X (n, p) 按组编码 codes (n,) 做置换检验和 Bootstrap 置信区间
+
+    n_groups 为分组类别数（默认 codes 最大值 + 1），决定用均值差（2 组）还是 F 值；
+    数据中缺席的组不影响 F 的自由度
+    返回 dict：observed(统计量)、effect(效应量)、perm_p、ci_lower、ci_upper
+    """
+    X = np.asarray(X, dtype=float)
+    codes = np.asarray(codes)
+    k = int(codes.max()) + 1 if n_groups is None else n_groups
+    data = _prepare(X, codes, k)
+
+    observed, effect = _group_statistics(_onehot(codes[None, :], k), data)
+    observed, effect = observed[0], effect[0]
+
+    chunk_size = max(1, min(CHUNK_SIZE, CHUNK_ELEMENTS // (k * len(codes))))
+    perm_sizes = _chunk_sizes(n_permutations, chunk_size)
+    boot_sizes = _chunk_sizes(n_bootstrap, chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(perm_sizes) + len(boot_sizes))
+    tasks = [("permutation", s, size, observed) for s, size in zip(seeds, perm_sizes)]
+    tasks += [("bootstrap", s, size, None) for s, size in zip(seeds[len(perm_sizes):], boot_sizes)]
+
+    if max_workers == 1 or len(tasks) == 1:
+        _init_worker(X, codes, k)
+        results = [_run_chunk(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                 initargs=(X, codes, k)) as executor:
+            results = list(executor.map(_run_chunk, tasks))
+
+    exceed = sum(r for kind, r in results if kind == "permutation")
+    perm_p = (exceed + 1) / (n_permutations + 1)
+    perm_p = np.where(np.isnan(observed), np.nan, perm_p)
+
+    boot = np.concatenate([r for kind, r in results if kind == "bootstrap"], axis=0)
+    tail = (1 - ci_level) / 2 * 100
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        ci_lower, ci_upper = np.nanpercentile(boot, [tail, 100 - tail], axis=0)
+
+    return {"observed": observed, "effect": effect, "perm_p": perm_p,
+            "ci_lower": ci_lower, "ci_upper": ci_upper}
+
+
+def compare_groups_resampling(df, features, group_col, group_order, comparison=None,
+                              n_resamples=N_RESAMPLES, ci_level=CI_LEVEL, seed=RANDOM_SEED,
+                              max_workers=None, alpha=ALPHA):
+    """按分组列做置换检验 + Bootstrap 置信区间，返回每个特征一行的结果表（分组缺失的学生不参与）"""
+    sub = df[df[group_col].isin(group_order)]
+    codes = pd.Categorical(sub[group_col], categories=group_order).codes
+    res = resample_group_comparison(sub[features].to_numpy(dtype=float), codes,
+                                    n_permutations=n_resamples, n_bootstrap=n_resamples,
+                                    ci_level=ci_level, seed=seed, max_workers=max_workers,
+                                    n_groups=len(group_order))
+
+    two_groups = len(group_order) == 2
+    fdr_p = fdr_bh(res["perm_p"])
+    return pd.DataFrame({
+        '比较': comparison or group_col,
+        '特征': features,
+        '统计量': '均值差' if two_groups else 'F值',
+        '统计量值': res["observed"],
+        '置换p值': res["perm_p"],
+        '置换FDR校正p值': fdr_p,
+        '显著性': np.where(fdr_p < alpha, '显著', '不显著'),
+        '效应量': f'均值差({group_order[0]}-{group_order[1]})' if two_groups else 'eta²',
+        '效应量值': res["effect"],
+        f'{int(ci_level * 100)}%CI下限': res["ci_lower"],
+        f'{int(ci_level * 100)}%CI上限': res["ci_upper"],
+    })
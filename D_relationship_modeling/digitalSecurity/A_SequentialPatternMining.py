@@ -0,0 +1,200 @@
+# 行为序列模式挖掘（PrefixSpan）：在编码事件序列上挖掘各分组的频繁行为子序列
+# - 每个学生的每一轮游戏为一条序列，事件整数编码后拼接成一维数组 + 偏移量
+# - 投影数据库只保存"前缀末事件在一维数组中的位置"（伪投影），扩展时对全部序列向量化计算：
+#   不限间隔时每条序列只保留最左位置，按事件二分查找其后的第一次出现；
+#   限制间隔时保留全部出现位置，一次性生成间隔内的全部候选位置
+# - 支持最小支持度、最大间隔（相邻两个模式事件在原序列中的位置差上限）、最大模式长度
+# - 各分组（聚类簇、成绩分组、全体）在进程池中并行挖掘
+
+import os
+import math
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from event_data import EVENT_LEVELS, load_raw_data, load_student_groups, load_coded_events, encode_sequences
+
+MIN_SUPPORT = 0.3           # 最小支持度（包含该模式的序列占比）
+MAX_GAP = 3                 # 最大间隔，None 表示不限制；1 表示模式事件在原序列中必须相邻
+MAX_LENGTH = 4              # 最大模式长度
+EVENT_LEVEL = "subcategory"
+COLLAPSE_REPEATS = True     # 合并连续重复事件（如连续多次移动只记一次）
+PRESENCE_TABLE_SIZE = 1 << 24   # 事件×序列计数表的元素数上限，超过时改用排序去重统计支持数
+GROUP_COLUMNS = {"cluster": "聚类簇", "score_group": "成绩分组"}
+OUTPUT_DIR = "./result"
+OUTPUT_FILE = f"{OUTPUT_DIR}/频繁行为序列模式.xlsx"
+
+
+def _next_occurrence_extensions(positions, occurrences, seq_end, min_count):
+    """不限间隔：每条序列只保留前缀的最左出现位置，对每个事件二分查找其后的第一次出现
+
+    occurrences: 每个事件在一维数组中的出现位置（升序）
+    返回 [(事件编码, 支持数, 新投影位置), ...]
+    """
+    end = seq_end[positions]
+    extensions = []
+    for item, occ in enumerate(occurrences):
+        if len(occ) < min_count:
+            continue
+        idx = np.searchsorted(occ, positions + 1)
+        nxt = occ[np.minimum(idx, len(occ) - 1)]
+        valid = (idx < len(occ)) & (nxt < end)
+        support = int(valid.sum())
+        if support >= min_count:
+            extensions.append((item, support, nxt[valid]))
+    return extensions
+
+
+def _gap_candidates(positions, seq_end, max_gap):
+    """限制间隔：生成全部可扩展位置（同一序列内、位于其后、位置差不超过 max_gap）"""
+    cand = positions[:, None] + np.arange(1, max_gap + 1)
+    valid = cand < seq_end[positions][:, None]
+    return cand[valid]
+
+
+def _frequent_extensions(cand, items, seq_of, n_seq, n_items, min_count):
+    """统计候选位置上各事件的支持序列数，返回 [(事件编码, 支持数, 新投影位置), ...]"""
+    if len(cand) == 0:
+        return []
+    cand_items = items[cand].astype(np.int64)
+    pair_keys = cand_items * n_seq + seq_of[cand]
+    if n_items * n_seq <= PRESENCE_TABLE_SIZE:
+        # 词表 × 序列数不大时，用计数表标记 (事件, 序列) 是否出现，避免排序去重
+        present = np.bincount(pair_keys, minlength=n_items * n_seq).reshape(n_items, n_seq) > 0
+        support = present.sum(axis=1)
+    else:
+        support = np.bincount(np.unique(pair_keys) // n_seq, minlength=n_items)
+    frequent = np.flatnonzero(support >= min_count)
+    if len(frequent) == 0:
+        return []
+
+    # 候选位置按事件稳定排序后切分，每个频繁事件得到有序去重的新投影
+    order = np.argsort(cand_items, kind="stable")
+    sorted_items, sorted_cand = cand_items[order], cand[order]
+    bounds = np.searchsorted(sorted_items, np.stack([frequent, frequent + 1]))
+    extensions = []
+    for item, lo, hi in zip(frequent, bounds[0], bounds[1]):
+        extensions.append((int(item), int(support[item]), np.unique(sorted_cand[lo:hi])))
+    return extensions
+
+
+def _first_in_sequence(seq):
+    """有序位置对应的序列编号 -> 每条序列第一个位置的掩码"""
+    first = np.ones(len(seq), dtype=bool)
+    first[1:] = seq[1:] != seq[:-1]
+    return first
+
+
+def prefixspan(items, offsets, min_support=MIN_SUPPORT, max_gap=MAX_GAP, max_length=MAX_LENGTH):
+    """PrefixSpan 频繁子序列挖掘，返回 [(模式事件编码元组, 支持序列数), ...]"""
+    n_seq = len(offsets) - 1
+    if n_seq == 0:
+        return []
+    n_items = int(items.max()) + 1 if len(items) else 0
+    min_count = max(1, math.ceil(min_support * n_seq))
+    seq_of = np.repeat(np.arange(n_seq, dtype=np.int64), np.diff(offsets))
+    seq_end = offsets[1:][seq_of]
+
+    # 长度为1的模式：限制间隔时投影为该事件的全部出现位置，不限间隔时只需每条序列的最左出现位置
+    all_positions = np.arange(len(items), dtype=np.int64)
+    roots = _frequent_extensions(all_positions, items, seq_of, n_seq, n_items, min_count)
+    if max_gap is None:
+        occurrences = np.split(np.argsort(items, kind="stable"), np.cumsum(np.bincount(items, minlength=n_items))[:-1])
+        roots = [(item, support, proj[_first_in_sequence(seq_of[proj])]) for item, support, proj in roots]
+
+    stack = [((item,), support, proj) for item, support, proj in roots]
+    patterns = []
+    while stack:
+        pattern, support, positions = stack.pop()
+        patterns.append((pattern, support))
+        if len(pattern) >= max_length:
+            continue
+        if max_gap is None:
+            extensions = _next_occurrence_extensions(positions, occurrences, seq_end, min_count)
+        else:
+            cand = _gap_candidates(positions, seq_end, max_gap)
+            extensions = _frequent_extensions(cand, items, seq_of, n_seq, n_items, min_count)
+        for item, ext_support, proj in extensions:
+            stack.append((pattern + (item,), ext_support, proj))
+    return patterns
+
+
+def mine_group(group_type, group, items, offsets, vocab, min_support, max_gap, max_length):
+    """挖掘单个分组的频繁序列模式，返回结果表"""
+    n_seq = len(offsets) - 1
+    patterns = prefixspan(items, offsets, min_support, max_gap, max_length)
+    result = pd.DataFrame({
+        '分组类型': group_type,
+        '分组': group,
+        '序列数': n_seq,
+        '模式': [" → ".join(vocab[i] for i in p) for p, _ in patterns],
+        '长度': [len(p) for p, _ in patterns],
+        '支持序列数': [s for _, s in patterns],
+    })
+    result['支持度'] = result['支持序列数'] / max(n_seq, 1)
+    return result.sort_values(['长度', '支持序列数'], ascending=[True, False])
+
+
+def build_group_tasks(events, groups, group_columns, level, collapse_repeats):
+    """按分组切分事件并编码，生成挖掘任务（含全体）"""
+    tasks = [('全体', '全体', events)]
+    for col in group_columns:
+        labels = groups.set_index('row_idx')[col]
+        event_group = events['row_idx'].map(labels)
+        for group in sorted(event_group.dropna().unique()):
+            tasks.append((GROUP_COLUMNS[col], group, events[event_group == group]))
+    return [(t, g) + encode_sequences(ev, level, collapse_repeats)[:3] for t, g, ev in tasks]
+
+
+def run_sequence_mining(events, groups, group_columns=tuple(GROUP_COLUMNS), level=EVENT_LEVEL,
+                        collapse_repeats=COLLAPSE_REPEATS, min_support=MIN_SUPPORT, max_gap=MAX_GAP,
+                        max_length=MAX_LENGTH, max_workers=None):
+    """各分组并行挖掘，汇总为一张结果表"""
+    tasks = build_group_tasks(events, groups, group_columns, level, collapse_repeats)
+    params = (min_support, max_gap, max_length)
+    if max_workers == 1:
+        results = [mine_group(*task, *params) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(mine_group, *task, *params) for task in tasks]
+            results = [f.result() for f in futures]
+    return pd.concat(results, ignore_index=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="按分组挖掘频繁行为序列模式（PrefixSpan）")
+    parser.add_argument("--min-support", type=float, default=MIN_SUPPORT, help="最小支持度（序列占比）")
+    parser.add_argument("--max-gap", type=int, default=MAX_GAP, help="相邻模式事件的最大位置间隔，0 表示不限制")
+    parser.add_argument("--max-length", type=int, default=MAX_LENGTH, help="最大模式长度")
+    parser.add_argument("--level", choices=EVENT_LEVELS, default=EVENT_LEVEL, help="事件粒度")
+    parser.add_argument("--group-by", nargs="*", choices=list(GROUP_COLUMNS), default=list(GROUP_COLUMNS),
+                        help="分组方式（全体始终计算）")
+    parser.add_argument("--keep-repeats", action="store_true", help="保留连续重复事件")
+    parser.add_argument("--workers", type=int, default=None, help="并行进程数")
+    args = parser.parse_args()
+
+    raw_df = load_raw_data()
+    events = load_coded_events(raw_df)
+    groups = load_student_groups(raw_df)
+    print(f"编码事件 {len(events)} 条，学生 {len(raw_df)} 人")
+
+    max_gap = args.max_gap if args.max_gap and args.max_gap > 0 else None
+    result = run_sequence_mining(events, groups, args.group_by, args.level, not args.keep_repeats,
+                                 args.min_support, max_gap, args.max_length, args.workers)
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    result.to_excel(OUTPUT_FILE, index=False)
+
+    # 打印各分组最长且支持度最高的模式
+    print("\n各分组频繁序列模式（最长模式中支持度前5）:")
+    for (group_type, group), sub in result[result['长度'] >= 2].groupby(['分组类型', '分组'], sort=False):
+        print(f"\n[{group_type}] {group}（序列数 {sub['序列数'].iloc[0]}）")
+        for _, row in sub.sort_values(['长度', '支持度'], ascending=False).head(5).iterrows():
+            print(f"- {row['模式']}: 支持度={row['支持度']:.2f}")
+    print(f"\n序列模式挖掘完成！共 {len(result)} 条频繁模式，结果已保存到: {OUTPUT_FILE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+# 滞后序列分析（LSA）：行为类别/子类之间的转移矩阵、调整残差与 Yule's Q
+# - 基于 B 层编码事件，同一学生同一轮游戏内相隔 lag 个事件的 (前一行为, 后一行为) 记为一次 lag 阶转移
+# - 转移计数用 np.add.at 在 (学生, 前一行为, 后一行为) 三维数组上一次累加，不逐条循环
+# - 班级、聚类簇、全体的转移矩阵由学生矩阵再次 np.add.at 汇总得到
+# - 调整残差 z = (o - e) / sqrt(e (1 - 行和/N)(1 - 列和/N))，|z| > 1.96 视为显著高于/低于随机
+# - Yule's Q 基于每个转移格子的 2×2 列联表（是否为该前一行为 × 是否为该后一行为）
+
+import os
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from event_data import (EVENT_LEVELS, load_raw_data, load_student_groups, load_coded_events, event_labels,
+                        sequence_starts)
+
+MAX_LAG = 2                 # 最高滞后阶数
+EVENT_LEVEL = "subcategory"
+Z_CRITICAL = 1.96           # 调整残差显著性临界值（双侧 0.05）
+GROUP_LEVELS = {"Class": "班级", "cluster": "聚类簇"}
+OUTPUT_DIR = "./result"
+GROUP_OUTPUT_FILE = f"{OUTPUT_DIR}/行为转移分析_群体.xlsx"
+STUDENT_OUTPUT_FILE = f"{OUTPUT_DIR}/行为转移分析_学生.xlsx"
+
+
+def encode_events(events, level=EVENT_LEVEL, collapse_repeats=False):
+    """事件长表 -> (行为编码, 序列编号, 学生行位置, 行为词表)；同一学生同一轮游戏为一条序列
+
+    events 需已按 row_idx、game_round、event_idx 排好序（build_coded_event_table 的输出即如此）
+    """
+    labels = event_labels(events, level).astype(str).to_numpy()
+    vocab, codes = np.unique(labels, return_inverse=True)
+    row_idx = events["row_idx"].to_numpy()
+    new_seq = sequence_starts(events)
+
+    if collapse_repeats:
+        keep = new_seq.copy()
+        keep[1:] |= codes[1:] != codes[:-1]
+        codes, row_idx, new_seq = codes[keep], row_idx[keep], new_seq[keep]
+
+    seq_id = np.cumsum(new_seq) - 1
+    return codes, seq_id, row_idx, list(vocab)
+
+
+def count_transitions(codes, seq_id, unit, n_units, n_codes, lag=1):
+    """lag 阶转移计数，返回 (n_units, n_codes, n_codes) 数组"""
+    counts = np.zeros((n_units, n_codes, n_codes), dtype=np.int64)
+    if len(codes) <= lag:
+        return counts
+    src = np.arange(len(codes) - lag)
+    dst = src + lag
+    same_seq = seq_id[src] == seq_id[dst]
+    src, dst = src[same_seq], dst[same_seq]
+    np.add.at(counts, (unit[src], codes[src], codes[dst]), 1)
+    return counts
+
+
+def aggregate_counts(unit_counts, group_idx, n_groups):
+    """把学生级转移矩阵按分组汇总（group_idx 为 -1 的学生不参与）"""
+    grouped = np.zeros((n_groups,) + unit_counts.shape[1:], dtype=unit_counts.dtype)
+    valid = group_idx >= 0
+    np.add.at(grouped, group_idx[valid], unit_counts[valid])
+    return grouped
+
+
+def lag_statistics(counts):
+    """对 (..., n_codes, n_codes) 转移计数批量计算转移概率、期望频次、调整残差和 Yule's Q"""
+    counts = counts.astype(float)
+    row_sum = counts.sum(axis=-1, keepdims=True)
+    col_sum = counts.sum(axis=-2, keepdims=True)
+    total = counts.sum(axis=(-2, -1), keepdims=True)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        prob = counts / row_sum
+        expected = row_sum * col_sum / total
+        variance = expected * (1 - row_sum / total) * (1 - col_sum / total)
+        adj_residual = (counts - expected) / np.sqrt(variance)
+
+        # 2×2 列联表：a=该转移，b=同前一行为转向其他，c=其他转向同后一行为，d=其余
+        a = counts
+        b = row_sum - counts
+        c = col_sum - counts
+        d = total - row_sum - col_sum + counts
+        yules_q = (a * d - b * c) / (a * d + b * c)
+
+    return {"prob": prob, "expected": expected, "adj_residual": adj_residual, "yules_q": yules_q}
+
+
+def to_long_table(level_name, unit_names, counts, lag, vocab):
+    """分组转移矩阵 -> 长格式表（每个分组 × 前一行为 × 后一行为一行）"""
+    lag_stats = lag_statistics(counts)
+    n_units, n_codes = counts.shape[0], len(vocab)
+    unit, src, dst = np.meshgrid(np.arange(n_units), np.arange(n_codes), np.arange(n_codes), indexing="ij")
+    table = pd.DataFrame({
+        '层级': level_name,
+        '单元': np.asarray(unit_names, dtype=object)[unit.ravel()],
+        '滞后阶数': lag,
+        '前一行为': np.asarray(vocab, dtype=object)[src.ravel()],
+        '后一行为': np.asarray(vocab, dtype=object)[dst.ravel()],
+        '频次': counts.ravel(),
+        '转移概率': lag_stats["prob"].ravel(),
+        '期望频次': lag_stats["expected"].ravel(),
+        '调整残差': lag_stats["adj_residual"].ravel(),
+        "Yule's Q": lag_stats["yules_q"].ravel(),
+    })
+    table['显著性'] = np.select(
+        [table['调整残差'] > Z_CRITICAL, table['调整残差'] < -Z_CRITICAL],
+        ['显著高于随机', '显著低于随机'], default='不显著'
+    )
+    return table
+
+
+def student_feature_table(groups, counts, lag, vocab):
+    """学生级宽表：每个学生一行，各转移的概率、调整残差与 Yule's Q 作为特征列（供后续建模使用）"""
+    lag_stats = lag_statistics(counts)
+    pairs = [f"{s}→{d}" for s in vocab for d in vocab]
+    n = counts.shape[0]
+    prob = pd.DataFrame(lag_stats["prob"].reshape(n, -1), columns=[f"lag{lag}_{p}_概率" for p in pairs])
+    residual = pd.DataFrame(lag_stats["adj_residual"].reshape(n, -1), columns=[f"lag{lag}_{p}_调整残差" for p in pairs])
+    q = pd.DataFrame(lag_stats["yules_q"].reshape(n, -1), columns=[f"lag{lag}_{p}_YulesQ" for p in pairs])
+    # 全体学生都未出现的转移不输出
+    observed = counts.reshape(n, -1).sum(axis=0) > 0
+    return pd.concat([prob.loc[:, observed], residual.loc[:, observed], q.loc[:, observed]], axis=1)
+
+
+def run_transition_analysis(events, groups, level=EVENT_LEVEL, max_lag=MAX_LAG, collapse_repeats=False):
+    """一次遍历统计各阶转移，返回 (群体长表, 学生宽表)"""
+    codes, seq_id, row_idx, vocab = encode_events(events, level, collapse_repeats)
+    n_students, n_codes = len(groups), len(vocab)
+
+    group_tables = []
+    student_tables = [groups[['Class', 'StuNum']].reset_index(drop=True)]
+    for lag in range(1, max_lag + 1):
+        student_counts = count_transitions(codes, seq_id, row_idx, n_students, n_codes, lag)
+
+        for col, level_name in GROUP_LEVELS.items():
+            labels = groups[col]
+            names = sorted(labels.dropna().unique())
+            group_idx = labels.map({name: i for i, name in enumerate(names)}).fillna(-1).astype(int).to_numpy()
+            group_counts = aggregate_counts(student_counts, group_idx, len(names))
+            group_tables.append(to_long_table(level_name, names, group_counts, lag, vocab))
+
+        pooled = student_counts.sum(axis=0, keepdims=True)
+        group_tables.append(to_long_table('全体', ['全体'], pooled, lag, vocab))
+        student_tables.append(student_feature_table(groups, student_counts, lag, vocab))
+
+    return pd.concat(group_tables, ignore_index=True), pd.concat(student_tables, axis=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="行为转移矩阵与滞后序列分析")
+    parser.add_argument("--level", choices=EVENT_LEVELS, default=EVENT_LEVEL, help="事件粒度")
+    parser.add_argument("--max-lag", type=int, default=MAX_LAG, help="最高滞后阶数")
+    parser.add_argument("--collapse-repeats", action="store_true", help="合并连续重复事件后再统计转移")
+    args = parser.parse_args()
+
+    raw_df = load_raw_data()
+    events = load_coded_events(raw_df)
+    groups = load_student_groups(raw_df)
+    print(f"编码事件 {len(events)} 条，学生 {len(raw_df)} 人")
+
+    group_table, student_table = run_transition_analysis(events, groups, args.level, args.max_lag,
+                                                         args.collapse_repeats)
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    group_table.to_excel(GROUP_OUTPUT_FILE, index=False)
+    student_table.to_excel(STUDENT_OUTPUT_FILE, index=False)
+
+    # 打印全体学生的显著转移
+    pooled = group_table[(group_table['层级'] == '全体') & (group_table['显著性'] == '显著高于随机')]
+    print("\n全体学生显著高于随机的行为转移（按调整残差排序）:")
+    for lag, sub in pooled.groupby('滞后阶数'):
+        print(f"\n滞后 {lag} 阶:")
+        for _, row in sub.nlargest(10, '调整残差').iterrows():
+            yules_q = row["Yule's Q"]
+            print(f"- {row['前一行为']} → {row['后一行为']}: 频次={row['频次']}, "
+                  f"z={row['调整残差']:.2f}, Q={yules_q:.2f}")
+    print(f"\n转移分析完成！群体结果: {GROUP_OUTPUT_FILE}，学生特征: {STUDENT_OUTPUT_FILE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+# 关联分析：在离散化的学生特征（行为画像分档、知识掌握水平、前后测成绩变化）上挖掘频繁项集与关联规则
+# - 每个项（如 avg_explore_count=高）用学生位向量表示：np.packbits 压缩后按 uint64 存储
+# - Eclat 深度优先搜索：项集的支持学生 = 各项位向量按位与，支持数 = popcount（np.bitwise_count 或查表）
+# - 同一前缀下的全部候选扩展一次性批量按位与、批量计数
+# - 各第一层前缀的搜索子树相互独立，在进程池中并行
+# - 规则输出支持度、置信度、提升度
+
+import os
+import argparse
+from itertools import combinations
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from event_data import MASTERY_FEATURES, load_student_features
+
+BEHAVIOR_FEATURES = [
+    'game_count',
+    'avg_read_count', 'avg_read_duration',
+    'avg_explore_count', 'avg_explore_duration',
+    'avg_practice_count', 'avg_practice_duration',
+    'avg_feedback_count', 'avg_feedback_duration',
+]
+SCORE_FEATURES = ['preScore', 'postScore']
+LEVEL_LABELS = {3: ['低', '中', '高'], 2: ['低', '高']}   # 分位数分档标签（并列值导致分位点重复时档数减少）
+
+MIN_SUPPORT = 0.1           # 最小支持度
+MIN_CONFIDENCE = 0.6        # 最小置信度
+MAX_LENGTH = 4              # 最大项集长度
+OUTPUT_DIR = "./result"
+OUTPUT_FILE = f"{OUTPUT_DIR}/关联规则分析结果.xlsx"
+
+# 0-65535 每个16位整数中 1 的个数（NumPy 无 bitwise_count 时查表计数）
+POPCOUNT_TABLE = np.unpackbits(np.arange(1 << 16, dtype=np.uint16).view(np.uint8)).reshape(-1, 16).sum(axis=1).astype(np.uint8)
+
+_WORKER = {}
+
+
+def discretize_levels(values, n_bins=3):
+    """按分位数分为 低/中/高 三档（分位点重复时合并为更少的档），缺失值保持缺失"""
+    edges = np.unique(np.nanquantile(values, np.linspace(0, 1, n_bins + 1)))
+    if len(edges) < 3:
+        return pd.Series(np.nan, index=values.index, dtype=object)
+    labels = LEVEL_LABELS[len(edges) - 1]
+    return pd.cut(values, bins=edges, labels=labels, include_lowest=True).astype(object)
+
+
+def discretize_gain(pre, post):
+    """前后测成绩变化：进步 / 持平 / 退步"""
+    gain = post - pre
+    return pd.Series(np.select([gain > 0, gain < 0], ['进步', '退步'], default='持平'),
+                     index=gain.index).where(gain.notna())
+
+
+def build_item_table(student_df):
+    """离散化学生特征，返回 0/1 项矩阵（每列一个"特征=档位"项）"""
+    levels = {}
+    for col in BEHAVIOR_FEATURES + MASTERY_FEATURES + SCORE_FEATURES:
+        if col in student_df.columns:
+            levels[col] = discretize_levels(student_df[col])
+    levels['成绩变化'] = discretize_gain(student_df['preScore'], student_df['postScore'])
+    levels = pd.DataFrame(levels, index=student_df.index)
+    return pd.get_dummies(levels, prefix_sep='=', dtype=bool)
+
+
+def pack_items(item_table):
+    """0/1 项矩阵 -> 每个项一个学生位向量（uint64 数组，形状 (项数, 字数)）"""
+    bits = np.packbits(item_table.to_numpy().T, axis=1)
+    pad = (-bits.shape[1]) % 8
+    if pad:
+        bits = np.pad(bits, ((0, 0), (0, pad)))
+    return np.ascontiguousarray(bits).view(np.uint64)
+
+
+def popcount(bitsets):
+    """批量统计位向量中 1 的个数，bitsets 形状 (..., 字数)"""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(bitsets).sum(axis=-1, dtype=np.int64)
+    return POPCOUNT_TABLE[bitsets.view(np.uint16)].sum(axis=-1, dtype=np.int64)
+
+
+def _init_worker(bitsets, min_count, max_length):
+    _WORKER.update({"bitsets": bitsets, "min_count": min_count, "max_length": max_length})
+
+
+def _eclat(prefix, prefix_bits, members, member_bits, min_count, max_length, results):
+    """Eclat 深度优先扩展：members 为可追加在 prefix 之后的项（已按编号排序）"""
+    if len(prefix) >= max_length or len(members) == 0:
+        return
+    # 前缀与全部候选项一次性按位与、计数
+    joined = prefix_bits & member_bits
+    support = popcount(joined)
+    frequent = np.flatnonzero(support >= min_count)
+    for pos, idx in enumerate(frequent):
+        itemset = prefix + (int(members[idx]),)
+        results.append((itemset, int(support[idx])))
+        later = frequent[pos + 1:]
+        _eclat(itemset, joined[idx], members[later], member_bits[later], min_count, max_length, results)
+
+
+def mine_prefix(item):
+    """以单个频繁项为第一层前缀，挖掘其子树中的全部频繁项集"""
+    bitsets, min_count, max_length = _WORKER["bitsets"], _WORKER["min_count"], _WORKER["max_length"]
+    members = np.arange(item + 1, len(bitsets))
+    results = []
+    _eclat((item,), bitsets[item], members, bitsets[members], min_count, max_length, results)
+    return results
+
+
+def eclat(bitsets, n_transactions, min_support=MIN_SUPPORT, max_length=MAX_LENGTH, max_workers=None):
+    """位向量 Eclat，返回 {项集(项编号元组): 支持数}"""
+    min_count = max(1, int(np.ceil(min_support * n_transactions)))
+    item_support = popcount(bitsets)
+    frequent = np.flatnonzero(item_support >= min_count)
+    bitsets = bitsets[frequent]
+    itemsets = {(int(i),): int(item_support[f]) for i, f in enumerate(frequent)}
+
+    prefixes = list(range(len(frequent) - 1))
+    if max_workers == 1:
+        _init_worker(bitsets, min_count, max_length)
+        subtrees = [mine_prefix(p) for p in prefixes]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                 initargs=(bitsets, min_count, max_length)) as executor:
+            subtrees = list(executor.map(mine_prefix, prefixes, chunksize=4))
+    for subtree in subtrees:
+        itemsets.update(subtree)
+
+    # 项编号映射回原始项矩阵的列号
+    return {tuple(int(frequent[i]) for i in itemset): support for itemset, support in itemsets.items()}
+
+
+def generate_rules(itemsets, n_transactions, item_names, min_confidence=MIN_CONFIDENCE):
+    """由频繁项集生成关联规则（前件、后件非空），计算支持度、置信度、提升度"""
+    rows = []
+    for itemset, support in itemsets.items():
+        if len(itemset) < 2:
+            continue
+        for size in range(1, len(itemset)):
+            for antecedent in combinations(itemset, size):
+                consequent = tuple(i for i in itemset if i not in antecedent)
+                confidence = support / itemsets[antecedent]
+                if confidence < min_confidence:
+                    continue
+                rows.append({
+                    '前件': ' & '.join(item_names[i] for i in antecedent),
+                    '后件': ' & '.join(item_names[i] for i in consequent),
+                    '项数': len(itemset),
+                    '支持数': support,
+                    '支持度': support / n_transactions,
+                    '置信度': confidence,
+                    '提升度': confidence / (itemsets[consequent] / n_transactions),
+                })
+    columns = ['前件', '后件', '项数', '支持数', '支持度', '置信度', '提升度']
+    return pd.DataFrame(rows, columns=columns).sort_values(['提升度', '置信度'], ascending=False)
+
+
+def itemset_table(itemsets, n_transactions, item_names):
+    """频繁项集结果表"""
+    table = pd.DataFrame({
+        '项集': [' & '.join(item_names[i] for i in itemset) for itemset in itemsets],
+        '项数': [len(itemset) for itemset in itemsets],
+        '支持数': list(itemsets.values()),
+    })
+    table['支持度'] = table['支持数'] / n_transactions
+    return table.sort_values(['项数', '支持数'], ascending=[True, False])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="学生特征频繁项集与关联规则挖掘（位向量 Eclat）")
+    parser.add_argument("--min-support", type=float, default=MIN_SUPPORT, help="最小支持度")
+    parser.add_argument("--min-confidence", type=float, default=MIN_CONFIDENCE, help="最小置信度")
+    parser.add_argument("--max-length", type=int, default=MAX_LENGTH, help="最大项集长度")
+    parser.add_argument("--workers", type=int, default=None, help="并行进程数")
+    args = parser.parse_args()
+
+    student_df = load_student_features()
+    item_table = build_item_table(student_df)
+    item_names = list(item_table.columns)
+    n_students = len(item_table)
+    print(f"学生 {n_students} 人，离散化后共 {len(item_names)} 个项")
+
+    itemsets = eclat(pack_items(item_table), n_students, args.min_support, args.max_length, args.workers)
+    rules = generate_rules(itemsets, n_students, item_names, args.min_confidence)
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    with pd.ExcelWriter(OUTPUT_FILE) as writer:
+        itemset_table(itemsets, n_students, item_names).to_excel(writer, sheet_name="频繁项集", index=False)
+        rules.to_excel(writer, sheet_name="关联规则", index=False)
+
+    # 打印以成绩变化为后件、提升度最高的规则
+    gain_rules = rules[rules['后件'].str.startswith('成绩变化=')]
+    print("\n成绩变化相关规则（提升度前10）:")
+    for _, row in gain_rules.head(10).iterrows():
+        print(f"- {row['前件']} => {row['后件']}: 支持度={row['支持度']:.2f}, "
+              f"置信度={row['置信度']:.2f}, 提升度={row['提升度']:.2f}")
+    print(f"\n关联分析完成！频繁项集 {len(itemsets)} 个，关联规则 {len(rules)} 条，结果已保存到: {OUTPUT_FILE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+# 路径分析 / 结构方程模型（观测变量，RAM 表示）：游戏行为 → 知识掌握 → 学习效果
+# - 模型语法（与 lavaan 一致的子集）：  y ~ x1 + x2   回归路径；  a ~~ b   残差协方差
+# - RAM 表示：Σ(θ) = B P Bᵀ，B = (I - A)⁻¹，A 为路径系数矩阵，P 为（残差）方差协方差矩阵
+# - 极大似然拟合函数 F = log|Σ| + tr(S Σ⁻¹) - log|S| - p，解析梯度：
+#     G = Σ⁻¹ - Σ⁻¹ S Σ⁻¹，  ∂F/∂A = 2 Bᵀ G Σ，  ∂F/∂P = Bᵀ G B
+#   用 scipy.optimize L-BFGS-B 求解
+# - 拟合指数：χ²、df、CFI、TLI、RMSEA、SRMR、AIC、BIC；CFI 或 RMSEA 超出常用界值时给出警告
+# - 参数标准误：自举法（Bootstrap），重抽样拟合在进程池中并行，以全样本估计值为初值
+
+import os
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy import optimize, stats
+
+from event_data import MASTERY_FEATURES, load_student_features
+
+# 默认模型：阅读/探索/练习/反馈行为 → 各知识点掌握程度 → 后测成绩（掌握程度与后测均控制前测成绩）
+# 各知识点掌握程度来自同一批游戏事件，彼此高度相关，允许其残差两两相关
+BEHAVIOR_PREDICTORS = "avg_read_duration + avg_explore_count + avg_practice_count + avg_feedback_duration"
+DEFAULT_MODEL = "\n".join(
+    [f"{m} ~ preScore + {BEHAVIOR_PREDICTORS}" for m in MASTERY_FEATURES]
+    + [f"postScore ~ preScore + {' + '.join(MASTERY_FEATURES)}"]
+    + [f"{m} ~~ {' + '.join(MASTERY_FEATURES[i + 1:])}" for i, m in enumerate(MASTERY_FEATURES[:-1])]
+)
+
+N_BOOTSTRAP = 500
+CI_LEVEL = 0.95
+RANDOM_SEED = 42
+CHUNK_SIZE = 25             # 每个进程任务包含的自举次数
+MIN_VARIANCE = 1e-6         # 方差参数下界
+CFI_CUTOFF = 0.90           # 拟合可接受的常用界值：CFI ≥ 0.90 且 RMSEA ≤ 0.08
+RMSEA_CUTOFF = 0.08
+OUTPUT_DIR = "./result"
+OUTPUT_FILE = f"{OUTPUT_DIR}/路径分析结果.xlsx"
+
+_WORKER = {}
+
+
+def parse_model(spec):
+    """解析模型语法，返回 (变量列表, 回归路径[(因变量, 自变量)], 协方差[(a, b)])"""
+    variables, paths, covariances = [], [], []
+
+    def add(var):
+        if var not in variables:
+            variables.append(var)
+
+    for line in spec.splitlines():
+        line = line.split("#")[0].strip()
+        if not line:
+            continue
+        if "~~" in line:
+            lhs, rhs = [part.strip() for part in line.split("~~", 1)]
+            add(lhs)
+            for var in [v.strip() for v in rhs.split("+")]:
+                add(var)
+                covariances.append((lhs, var))
+        elif "~" in line:
+            lhs, rhs = [part.strip() for part in line.split("~", 1)]
+            add(lhs)
+            for var in [v.strip() for v in rhs.split("+")]:
+                add(var)
+                paths.append((lhs, var))
+        else:
+            raise ValueError(f"无法解析的模型语句: {line}")
+    return variables, paths, covariances
+
+
+class PathModel:
+    """观测变量路径模型的参数结构（RAM 表示中自由参数在 A、P 矩阵中的位置）"""
+
+    def __init__(self, spec):
+        self.variables, self.paths, covariances = parse_model(spec)
+        index = {v: i for i, v in enumerate(self.variables)}
+        self.p = len(self.variables)
+        endogenous = {dv for dv, _ in self.paths}
+        self.exogenous = [v for v in self.variables if v not in endogenous]
+
+        self.a_idx = np.array([(index[dv], index[iv]) for dv, iv in self.paths], dtype=int).reshape(-1, 2)
+
+        # P：全部变量的（残差）方差 + 外生变量两两协方差 + 用户指定的残差协方差
+        p_pairs = [(i, i) for i in range(self.p)]
+        exo = [index[v] for v in self.exogenous]
+        p_pairs += [(exo[j], exo[i]) for i in range(len(exo)) for j in range(i + 1, len(exo))]
+        for a, b in covariances:
+            pair = tuple(sorted((index[a], index[b]), reverse=True))
+            if pair[0] != pair[1] and pair not in p_pairs:
+                p_pairs.append(pair)
+        self.p_idx = np.array(p_pairs, dtype=int)
+        self.n_a = len(self.a_idx)
+        self.n_params = self.n_a + len(self.p_idx)
+        self.is_variance = np.r_[np.zeros(self.n_a, bool), self.p_idx[:, 0] == self.p_idx[:, 1]]
+
+    def matrices(self, theta):
+        A = np.zeros((self.p, self.p))
+        A[self.a_idx[:, 0], self.a_idx[:, 1]] = theta[:self.n_a]
+        P = np.zeros((self.p, self.p))
+        P[self.p_idx[:, 0], self.p_idx[:, 1]] = theta[self.n_a:]
+        P[self.p_idx[:, 1], self.p_idx[:, 0]] = theta[self.n_a:]
+        return A, P
+
+    def implied_cov(self, theta):
+        A, P = self.matrices(theta)
+        B = np.linalg.inv(np.eye(self.p) - A)
+        return B @ P @ B.T
+
+    def start_values(self, S):
+        """初值：逐方程最小二乘路径系数 + 对应残差方差，外生变量方差协方差取样本值，残差协方差取最小二乘残差的协方差"""
+        theta = np.zeros(self.n_params)
+        index = {v: i for i, v in enumerate(self.variables)}
+        residual_var = np.diag(S).copy()
+        # 每个变量写成 e = (I - A) x 的行系数：外生变量为自身，内生变量为最小二乘残差
+        weights = np.eye(self.p)
+        for dv in dict.fromkeys(dv for dv, _ in self.paths):
+            rows = np.flatnonzero(self.a_idx[:, 0] == index[dv])
+            ivs = self.a_idx[rows, 1]
+            beta = np.linalg.lstsq(S[np.ix_(ivs, ivs)], S[ivs, index[dv]], rcond=None)[0]
+            theta[rows] = beta
+            weights[index[dv], ivs] -= beta
+            residual_var[index[dv]] = max(S[index[dv], index[dv]] - S[index[dv], ivs] @ beta, MIN_VARIANCE)
+        residual_cov = weights @ S @ weights.T
+        for k, (i, j) in enumerate(self.p_idx):
+            theta[self.n_a + k] = residual_var[i] if i == j else residual_cov[i, j]
+        return theta
+
+
+def ml_discrepancy(theta, model, S, logdet_S):
+    """极大似然拟合函数值及解析梯度"""
+    A, P = model.matrices(theta)
+    B = np.linalg.inv(np.eye(model.p) - A)
+    sigma = B @ P @ B.T
+    sign, logdet = np.linalg.slogdet(sigma)
+    if sign <= 0:
+        return 1e10, np.zeros_like(theta)
+    sigma_inv = np.linalg.inv(sigma)
+    f = logdet + np.trace(S @ sigma_inv) - logdet_S - model.p
+
+    G = sigma_inv - sigma_inv @ S @ sigma_inv
+    grad_A = 2 * B.T @ G @ sigma
+    grad_P = B.T @ G @ B
+    grad_p = grad_P[model.p_idx[:, 0], model.p_idx[:, 1]]
+    grad_p = np.where(model.p_idx[:, 0] == model.p_idx[:, 1], grad_p, 2 * grad_p)
+    grad = np.r_[grad_A[model.a_idx[:, 0], model.a_idx[:, 1]], grad_p]
+    return f, grad
+
+
+def fit_model(model, S, theta0=None):
+    """L-BFGS-B 极大似然拟合，返回 (参数估计, 最小拟合函数值, 是否收敛)"""
+    if theta0 is None:
+        theta0 = model.start_values(S)
+    logdet_S = np.linalg.slogdet(S)[1]
+    bounds = [(MIN_VARIANCE, None) if v else (None, None) for v in model.is_variance]
+    res = optimize.minimize(ml_discrepancy, theta0, args=(model, S, logdet_S), jac=True,
+                            method="L-BFGS-B", bounds=bounds, options={"maxiter": 2000, "ftol": 1e-12})
+    return res.x, res.fun, res.success
+
+
+def fit_indices(model, S, theta, f_min, n):
+    """χ²、CFI、TLI、RMSEA、SRMR、AIC、BIC"""
+    p, q = model.p, model.n_params
+    chi2 = (n - 1) * f_min
+    df = p * (p + 1) // 2 - q
+    # 独立模型（只估计各变量方差）
+    chi2_base = (n - 1) * (np.sum(np.log(np.diag(S))) - np.linalg.slogdet(S)[1])
+    df_base = p * (p - 1) // 2
+
+    d, d_base = max(chi2 - df, 0), max(chi2_base - df_base, 0)
+    cfi = 1 - d / max(d, d_base) if max(d, d_base) > 0 else 1.0
+    tli = ((chi2_base / df_base) - (chi2 / df)) / ((chi2_base / df_base) - 1) if df > 0 else np.nan
+    rmsea = np.sqrt(d / (df * (n - 1))) if df > 0 else np.nan
+
+    sigma = model.implied_cov(theta)
+    scale = np.sqrt(np.outer(np.diag(S), np.diag(S)))
+    lower = np.tril_indices(p)
+    srmr = np.sqrt(np.mean(((S - sigma) / scale)[lower] ** 2))
+
+    return {
+        "χ²": chi2, "df": df, "p值": stats.chi2.sf(chi2, df) if df > 0 else np.nan,
+        "CFI": cfi, "TLI": tli, "RMSEA": rmsea, "SRMR": srmr,
+        "AIC": chi2 + 2 * q, "BIC": chi2 + q * np.log(n), "样本量": n, "参数个数": q,
+    }
+
+
+def _init_worker(spec, data, theta_hat):
+    _WORKER.update({"model": PathModel(spec), "data": data, "theta_hat": theta_hat})
+
+
+def _bootstrap_chunk(task):
+    """一个分块的自举拟合，返回 (size, 参数个数) 估计值（未收敛的重抽样为 NaN）"""
+    seed, size = task
+    model, data, theta_hat = _WORKER["model"], _WORKER["data"], _WORKER["theta_hat"]
+    rng = np.random.default_rng(seed)
+    n = len(data)
+    estimates = np.full((size, model.n_params), np.nan)
+    for b in range(size):
+        S = np.cov(data[rng.integers(0, n, n)], rowvar=False)
+        theta, _, success = fit_model(model, S, theta_hat)
+        if success:
+            estimates[b] = theta
+    return estimates
+
+
+def bootstrap_estimates(spec, data, theta_hat, n_bootstrap=N_BOOTSTRAP, seed=RANDOM_SEED, max_workers=None):
+    """并行自举，返回 (n_bootstrap, 参数个数) 估计值矩阵"""
+    sizes = [CHUNK_SIZE] * (n_bootstrap // CHUNK_SIZE) + ([n_bootstrap % CHUNK_SIZE] if n_bootstrap % CHUNK_SIZE else [])
+    tasks = list(zip(np.random.SeedSequence(seed).spawn(len(sizes)), sizes))
+    if max_workers == 1:
+        _init_worker(spec, data, theta_hat)
+        chunks = [_bootstrap_chunk(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                 initargs=(spec, data, theta_hat)) as executor:
+            chunks = list(executor.map(_bootstrap_chunk, tasks))
+    return np.vstack(chunks)
+
+
+def parameter_table(model, theta, boot, ci_level=CI_LEVEL):
+    """参数估计表：估计值、自举标准误、z、p、百分位置信区间"""
+    names, kinds = [], []
+    for dv, iv in model.paths:
+        names.append(f"{dv} ← {iv}")
+        kinds.append("回归路径")
+    for i, j in model.p_idx:
+        vi, vj = model.variables[i], model.variables[j]
+        names.append(f"{vi} ~~ {vj}")
+        kinds.append("方差" if i == j else "协方差")
+
+    se = np.nanstd(boot, axis=0, ddof=1)
+    tail = (1 - ci_level) / 2 * 100
+    lower, upper = np.nanpercentile(boot, [tail, 100 - tail], axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = theta / se
+    ci = int(ci_level * 100)
+    return pd.DataFrame({
+        '参数': names, '类型': kinds, '估计值': theta, '自举标准误': se, 'z值': z,
+        'p值': 2 * stats.norm.sf(np.abs(z)), f'{ci}%CI下限': lower, f'{ci}%CI上限': upper,
+    })
+
+
+def run_path_analysis(df, spec=DEFAULT_MODEL, standardize=True, n_bootstrap=N_BOOTSTRAP,
+                      seed=RANDOM_SEED, max_workers=None):
+    """拟合路径模型并自举标准误，返回 (参数估计表, 拟合指数)"""
+    model = PathModel(spec)
+    missing = [v for v in model.variables if v not in df.columns]
+    if missing:
+        raise ValueError(f"数据中缺少模型变量: {missing}")
+
+    data = df[model.variables].dropna().to_numpy(dtype=float)
+    if standardize:
+        data = (data - data.mean(axis=0)) / data.std(axis=0, ddof=1)
+    S = np.cov(data, rowvar=False)
+
+    theta, f_min, success = fit_model(model, S)
+    if not success:
+        print("警告：全样本拟合未收敛，结果仅供参考")
+    indices = fit_indices(model, S, theta, f_min, len(data))
+    if indices["CFI"] < CFI_CUTOFF or indices["RMSEA"] > RMSEA_CUTOFF:
+        print(f"警告：模型拟合欠佳（CFI={indices['CFI']:.3f}，RMSEA={indices['RMSEA']:.3f}；"
+              f"常用界值 CFI ≥ {CFI_CUTOFF}、RMSEA ≤ {RMSEA_CUTOFF}），路径系数解释需谨慎")
+
+    boot = bootstrap_estimates(spec, data, theta, n_bootstrap, seed, max_workers)
+    return parameter_table(model, theta, boot), indices
+
+
+def main():
+    parser = argparse.ArgumentParser(description="路径分析 / 结构方程模型（观测变量）")
+    parser.add_argument("--model", default=None, help="模型语法文件（默认使用 DEFAULT_MODEL）")
+    parser.add_argument("--raw", action="store_true", help="使用原始量纲（默认标准化后拟合，路径系数为标准化系数）")
+    parser.add_argument("--bootstrap", type=int, default=N_BOOTSTRAP, help="自举次数")
+    parser.add_argument("--workers", type=int, default=None, help="并行进程数")
+    args = parser.parse_args()
+
+    spec = DEFAULT_MODEL
+    if args.model:
+        with open(args.model, encoding="utf-8") as f:
+            spec = f.read()
+
+    df = load_student_features()
+    params, indices = run_path_analysis(df, spec, not args.raw, args.bootstrap, max_workers=args.workers)
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    with pd.ExcelWriter(OUTPUT_FILE) as writer:
+        params.to_excel(writer, sheet_name="参数估计", index=False)
+        pd.DataFrame([indices]).T.rename(columns={0: '值'}).to_excel(writer, sheet_name="拟合指数")
+
+    print("\n拟合指数:")
+    for name, value in indices.items():
+        print(f"- {name}: {value:.4f}" if isinstance(value, float) else f"- {name}: {value}")
+    print("\n显著的回归路径（自举 p < 0.05）:")
+    for _, row in params[(params['类型'] == '回归路径') & (params['p值'] < 0.05)].iterrows():
+        print(f"- {row['参数']}: β={row['估计值']:.3f}, SE={row['自举标准误']:.3f}, p={row['p值']:.4f}")
+    print(f"\n路径分析完成！结果已保存到: {OUTPUT_FILE}")
+
+
+if __name__ == "__main__":
+    main()
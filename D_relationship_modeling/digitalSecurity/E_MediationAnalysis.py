@@ -0,0 +1,192 @@
+# 中介效应分析：知识掌握程度是否在探索/练习行为与成绩提升之间起中介作用
+# - 每个 (行为 X, 掌握程度 M, 结果 Y) 三元组拟合简单中介模型：
+#     M = a X + 协变量,   Y = c' X + b M + 协变量,   间接效应 = a b，总效应 c = c' + a b
+# - 自举重抽样用索引矩阵 (B, n) 表示，换算为每个样本被抽中的次数作为权重，
+#   一次矩阵乘法得到 B 个重抽样的加权协方差矩阵，再对全部三元组批量解正规方程
+# - 间接效应置信区间：偏差校正（BC）自举区间，同时给出百分位区间
+# - 重抽样按分块在进程池中并行，每块使用独立的 SeedSequence 子种子，结果与进程数无关
+
+import os
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from event_data import MASTERY_FEATURES, load_student_features
+from learning_gain import join_learning_gains
+
+BEHAVIOR_FEATURES = [
+    'avg_explore_count', 'avg_explore_duration',
+    'avg_explore_positive_count', 'avg_explore_negative_count',
+    'avg_practice_count', 'avg_practice_duration',
+    'avg_practice_choice_count', 'avg_practice_sub_count',
+]
+OUTCOME = 'raw_gain'        # 学习增益结果表中的原始增益（postScore - preScore）
+
+N_BOOTSTRAP = 5000
+CI_LEVEL = 0.95
+RANDOM_SEED = 42
+CHUNK_SIZE = 500            # 每个进程任务包含的自举次数
+OUTPUT_DIR = "./result"
+OUTPUT_FILE = f"{OUTPUT_DIR}/中介效应分析结果.xlsx"
+
+_WORKER = {}
+
+
+def build_triples(behaviors, mediators, outcome, covariates, columns):
+    """三元组 -> 两组回归的列号：M ~ [X, 协变量]，Y ~ [X, M, 协变量]"""
+    col = {name: i for i, name in enumerate(columns)}
+    cov = [col[c] for c in covariates]
+    triples = [(x, m) for x in behaviors for m in mediators]
+    return {
+        "names": triples,
+        "a_pred": np.array([[col[x]] + cov for x, _ in triples], dtype=np.int64),
+        "a_resp": np.array([col[m] for _, m in triples], dtype=np.int64),
+        "b_pred": np.array([[col[x], col[m]] + cov for x, m in triples], dtype=np.int64),
+        "b_resp": np.full(len(triples), col[outcome], dtype=np.int64),
+    }
+
+
+def weighted_covariances(data, weights):
+    """weights (B, n) 为每个样本的抽中次数，返回 B 个加权协方差矩阵 (B, p, p)"""
+    total = weights.sum(axis=1)[:, None, None]
+    mean = (weights @ data)[:, :, None] / total
+    second = (data.T[None] * weights[:, None, :]) @ data / total
+    return second - mean * mean.transpose(0, 2, 1)
+
+
+def solve_paths(cov, pred, resp):
+    """批量解正规方程：cov (B, p, p)，pred (T, k) 自变量列号，resp (T,) 因变量列号，返回系数 (B, T, k)"""
+    lhs = cov[:, pred[:, :, None], pred[:, None, :]]
+    rhs = cov[:, pred, resp[:, None]][..., None]
+    try:
+        return np.linalg.solve(lhs, rhs)[..., 0]
+    except np.linalg.LinAlgError:
+        # 某个重抽样中自变量退化（如方差为 0）时退回伪逆
+        return (np.linalg.pinv(lhs) @ rhs)[..., 0]
+
+
+def mediation_effects(cov, triples):
+    """由协方差矩阵批量计算各三元组的 a、b、直接效应、间接效应、总效应，返回 (B, T, 5)"""
+    a = solve_paths(cov, triples["a_pred"], triples["a_resp"])[..., 0]
+    b_coef = solve_paths(cov, triples["b_pred"], triples["b_resp"])
+    direct, b = b_coef[..., 0], b_coef[..., 1]
+    indirect = a * b
+    return np.stack([a, b, direct, indirect, direct + indirect], axis=-1)
+
+
+def _init_worker(data, triples):
+    _WORKER.update({"data": data, "triples": triples})
+
+
+def _bootstrap_chunk(task):
+    """一个分块的自举：生成重抽样索引矩阵，换算为抽中次数后批量估计"""
+    seed, size = task
+    data, triples = _WORKER["data"], _WORKER["triples"]
+    n = len(data)
+    rng = np.random.default_rng(seed)
+    idx = rng.integers(0, n, (size, n))
+    flat = (idx + np.arange(size)[:, None] * n).ravel()
+    weights = np.bincount(flat, minlength=size * n).reshape(size, n).astype(float)
+    return mediation_effects(weighted_covariances(data, weights), triples)
+
+
+def bootstrap_effects(data, triples, n_bootstrap=N_BOOTSTRAP, seed=RANDOM_SEED, max_workers=None):
+    """并行自举，返回 (n_bootstrap, 三元组数, 5) 效应估计"""
+    sizes = [CHUNK_SIZE] * (n_bootstrap // CHUNK_SIZE) + ([n_bootstrap % CHUNK_SIZE] if n_bootstrap % CHUNK_SIZE else [])
+    tasks = list(zip(np.random.SeedSequence(seed).spawn(len(sizes)), sizes))
+    if max_workers == 1:
+        _init_worker(data, triples)
+        chunks = [_bootstrap_chunk(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                 initargs=(data, triples)) as executor:
+            chunks = list(executor.map(_bootstrap_chunk, tasks))
+    return np.concatenate(chunks, axis=0)
+
+
+def bias_corrected_ci(estimate, boot, ci_level=CI_LEVEL):
+    """偏差校正自举置信区间：estimate (T,)，boot (B, T)"""
+    below = (boot < estimate).mean(axis=0) + 0.5 * (boot == estimate).mean(axis=0)
+    z0 = stats.norm.ppf(np.clip(below, 1 / (len(boot) + 1), len(boot) / (len(boot) + 1)))
+    z_alpha = stats.norm.ppf([(1 - ci_level) / 2, (1 + ci_level) / 2])
+    quantiles = stats.norm.cdf(2 * z0[:, None] + z_alpha[None, :])
+    sorted_boot = np.sort(boot, axis=0)
+    pos = np.clip(np.round(quantiles * (len(boot) - 1)).astype(int), 0, len(boot) - 1)
+    cols = np.arange(boot.shape[1])
+    return sorted_boot[pos[:, 0], cols], sorted_boot[pos[:, 1], cols]
+
+
+def run_mediation_analysis(df, behaviors=BEHAVIOR_FEATURES, mediators=MASTERY_FEATURES, outcome=OUTCOME,
+                           covariates=(), standardize=True, n_bootstrap=N_BOOTSTRAP, seed=RANDOM_SEED,
+                           max_workers=None):
+    """全部三元组的中介效应估计与自举置信区间，返回结果表"""
+    columns = list(dict.fromkeys(list(behaviors) + list(mediators) + [outcome] + list(covariates)))
+    data = df[columns].apply(pd.to_numeric, errors='coerce').dropna()
+    print(f"完整样本 {len(data)} 人（共 {len(df)} 人），三元组 {len(behaviors) * len(mediators)} 个")
+    if standardize:
+        data = (data - data.mean()) / data.std(ddof=0)
+    data = data.to_numpy(dtype=float)
+
+    triples = build_triples(behaviors, mediators, outcome, covariates, columns)
+    point = mediation_effects(np.cov(data, rowvar=False, ddof=0)[None], triples)[0]
+    boot = bootstrap_effects(data, triples, n_bootstrap, seed, max_workers)
+
+    indirect, boot_indirect = point[:, 3], boot[:, :, 3]
+    bc_low, bc_high = bias_corrected_ci(indirect, boot_indirect)
+    alpha = (1 - CI_LEVEL) / 2
+    pct_low, pct_high = np.nanquantile(boot_indirect, [alpha, 1 - alpha], axis=0)
+
+    table = pd.DataFrame({
+        '自变量': [x for x, _ in triples["names"]],
+        '中介变量': [m for _, m in triples["names"]],
+        '因变量': outcome,
+        'a路径': point[:, 0],
+        'b路径': point[:, 1],
+        "直接效应c'": point[:, 2],
+        '总效应c': point[:, 4],
+        '间接效应ab': indirect,
+        '间接效应自举标准误': np.nanstd(boot_indirect, axis=0, ddof=1),
+        'BC下限': bc_low,
+        'BC上限': bc_high,
+        '百分位下限': pct_low,
+        '百分位上限': pct_high,
+    })
+    with np.errstate(divide='ignore', invalid='ignore'):
+        table['中介比例'] = np.where(np.abs(point[:, 4]) > 1e-12, indirect / point[:, 4], np.nan)
+    table['显著性'] = np.where((bc_low > 0) | (bc_high < 0), '显著', '不显著')
+    return table.sort_values('间接效应ab', key=np.abs, ascending=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="知识掌握程度的中介效应分析（偏差校正自举）")
+    parser.add_argument("--behaviors", nargs="*", default=BEHAVIOR_FEATURES, help="自变量（行为特征）")
+    parser.add_argument("--mediators", nargs="*", default=MASTERY_FEATURES, help="中介变量")
+    parser.add_argument("--outcome", default=OUTCOME, help="因变量：学习增益指标（raw_gain、normalized_gain、residualized_gain 等）或任意列名")
+    parser.add_argument("--covariates", nargs="*", default=[], help="控制变量（如 preScore）")
+    parser.add_argument("--raw", action="store_true", help="使用原始量纲（默认标准化后估计）")
+    parser.add_argument("--bootstrap", type=int, default=N_BOOTSTRAP, help="自举次数")
+    parser.add_argument("--workers", type=int, default=None, help="并行进程数")
+    args = parser.parse_args()
+
+    df = join_learning_gains(load_student_features())
+    result = run_mediation_analysis(df, args.behaviors, args.mediators, args.outcome, args.covariates,
+                                    not args.raw, args.bootstrap, max_workers=args.workers)
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    result.to_excel(OUTPUT_FILE, index=False)
+
+    significant = result[result['显著性'] == '显著']
+    print(f"\n显著的间接效应（{CI_LEVEL:.0%} 偏差校正置信区间不含 0）:")
+    for _, row in significant.iterrows():
+        print(f"- {row['自变量']} → {row['中介变量']} → {row['因变量']}: ab={row['间接效应ab']:.3f}, "
+              f"CI=[{row['BC下限']:.3f}, {row['BC上限']:.3f}]")
+    if significant.empty:
+        print("- 无")
+    print(f"\n中介效应分析完成！结果已保存到: {OUTPUT_FILE}")
+
+
+if __name__ == "__main__":
+    main()
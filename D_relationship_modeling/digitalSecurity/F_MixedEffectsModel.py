@@ -0,0 +1,270 @@
+# 多水平（学生嵌套于班级、学校）线性混合模型：行为特征 → 学习结果，班级与学校随机截距
+#   y = Xβ + Σ_k Z_k u_k + e,   u_k ~ N(0, σ_k² I),   e ~ N(0, σ² I)
+# - 随机效应设计矩阵 Z 为稀疏 one-hot 矩阵（scipy.sparse），X'Z、Z'Z 等交叉积一次算好（保持稀疏），迭代中不再访问原始数据
+# - Henderson 混合模型方程：[[X'X, X'Z], [Z'X, Z'Z + Λ]] [β; u] = [X'y; Z'y]，Λ = diag(σ²/σ_k²)
+#   水平数最多的分组因子对应对角块，先吸收（消元）该块，只对剩余的小 Schur 补做稠密 Cholesky 分解，
+#   C⁻¹ 只计算 EM 与标准误需要的对角线，不再构造完整逆矩阵
+# - 方差分量用 EM-REML 迭代（SQUAREM 外推加速），直到 REML 对数似然不再变化：
+#     σ_k² = (u_k'u_k + σ² tr(C^{kk})) / q_k,   σ² = (y'y - β'X'y - u'Z'y) / (n - p)
+# - 趋于 0 的方差分量固定在下界并标记为边界估计，不再以次线性速度迭代到 MAX_ITER
+# - 输出固定效应（标准误、t、p）、方差分量与组内相关系数 ICC、各班级/学校的随机截距（BLUP）
+# - 可对每个行为特征分别拟合 "结果 ~ 控制变量 + 该特征" 做逐特征筛选
+
+import os
+import argparse
+
+import numpy as np
+import pandas as pd
+from scipy import linalg, sparse, stats
+
+from event_data import MASTERY_FEATURES, load_student_features, school_of
+from learning_gain import join_learning_gains
+
+OUTCOME = 'postScore'
+CONTROLS = ['preScore']
+DEFAULT_PREDICTORS = ['avg_read_duration', 'avg_explore_count', 'avg_practice_count', 'avg_feedback_duration']
+GROUP_FACTORS = ['班级', '学校']          # 随机截距（学校由班级名称提取）
+SCREEN_PREFIX = 'avg_'                  # 逐特征筛选的行为特征列前缀
+
+MAX_ITER = 1000
+TOL = 1e-8                              # REML 对数似然变化收敛阈值
+MIN_VARIANCE_RATIO = 1e-10              # 方差分量下界（相对 y 的方差）
+BOUNDARY_RATIO = 1e-4                   # 方差分量占总方差的比例低于该值时尝试固定在下界
+OUTPUT_DIR = "./result"
+OUTPUT_FILE = f"{OUTPUT_DIR}/多水平混合模型结果.xlsx"
+
+
+def add_group_columns(df):
+    """补充分组因子列：班级、学校"""
+    df = df.copy()
+    df['班级'] = df['Class']
+    df['学校'] = df['Class'].map(school_of)
+    return df
+
+
+def random_effect_design(df, factors):
+    """各分组因子的 one-hot 稀疏矩阵按列拼接，返回 (Z, 每个因子的列切片, 每个因子的水平名称)"""
+    blocks, slices, levels, start = [], [], [], 0
+    n = len(df)
+    for factor in factors:
+        codes, names = pd.factorize(df[factor], sort=True)
+        blocks.append(sparse.csr_matrix((np.ones(n), (np.arange(n), codes)), shape=(n, len(names))))
+        slices.append(slice(start, start + len(names)))
+        levels.append(list(names))
+        start += len(names)
+    return sparse.hstack(blocks, format='csr'), slices, levels
+
+
+def _mme_blocks(X, Z, y, slices):
+    """混合模型方程的稀疏系数矩阵，按"吸收块 a + 其余 r"切分
+
+    a 为水平数最多的分组因子（单个因子的 Z_k'Z_k 是对角阵），r 为固定效应与其余分组因子
+    """
+    p = X.shape[1]
+    design = sparse.hstack([sparse.csr_matrix(X), Z], format='csr')
+    coef = (design.T @ design).tocsr()
+    absorb = max(slices, key=lambda s: s.stop - s.start)
+    a = np.arange(absorb.start, absorb.stop) + p
+    r = np.setdiff1d(np.arange(coef.shape[0]), a)
+    return {"r": r, "a": a, "A": coef[r][:, r].toarray(), "B": coef[r][:, a], "d": coef.diagonal()[a],
+            "rhs": design.T @ y}
+
+
+def _solve_mme(mme, yty, slices, sigma2, sigma2_k, n, p):
+    """给定方差分量求解混合模型方程，返回 (C⁻¹ 的对角线, [β; u], REML 对数似然)
+
+    吸收对角块 a：S = C_rr - C_ra D⁻¹ C_ar 为小的稠密矩阵，只对 S 做 Cholesky 分解；
+    C⁻¹ 只需要对角线（EM 的 tr(C^{kk}) 与标准误）：r 部分取 S⁻¹ 的对角线，a 部分为 D⁻¹ + diag(W S⁻¹ Wᵀ)，W = D⁻¹ C_ar
+    log|V| + log|X'V⁻¹X| = n log σ² + Σ q_k log σ_k² + log|C| - (p + q) log σ²，log|C| = log|D| + log|S|
+    """
+    q_k = np.array([s.stop - s.start for s in slices])
+    r, a, rhs = mme["r"], mme["a"], mme["rhs"]
+    lam = np.r_[np.zeros(p), np.repeat(sigma2 / sigma2_k, q_k)]
+    d = mme["d"] + lam[a]
+    W = (mme["B"] @ sparse.diags(1 / d)).T.tocsr()
+    S = mme["A"] + np.diag(lam[r]) - (mme["B"] @ W).toarray()
+    factor = linalg.cho_factor(S)
+
+    sol = np.empty(len(rhs))
+    sol[r] = linalg.cho_solve(factor, rhs[r] - W.T @ rhs[a])
+    sol[a] = (rhs[a] - mme["B"].T @ sol[r]) / d
+
+    S_inv = linalg.cho_solve(factor, np.eye(len(r)))
+    C_inv_diag = np.empty(len(rhs))
+    C_inv_diag[r] = np.diag(S_inv)
+    C_inv_diag[a] = 1 / d + np.asarray(W.multiply(W @ S_inv).sum(axis=1)).ravel()
+
+    logdet_C = np.log(d).sum() + 2 * np.log(np.diag(factor[0])).sum()
+    y_P_y = (yty - sol @ rhs) / sigma2
+    reml = -0.5 * ((n - p - q_k.sum()) * np.log(sigma2) + q_k @ np.log(sigma2_k) + logdet_C
+                   + y_P_y + (n - p) * np.log(2 * np.pi))
+    return C_inv_diag, sol, reml
+
+
+def _em_update(C_inv_diag, sol, rhs, yty, slices, sigma2, n, p, floor):
+    """一次 EM-REML 更新，返回新的方差参数向量 [σ_1², ..., σ_K², σ²]"""
+    u = sol[p:]
+    sigma2_k = [(u[s] @ u[s] + sigma2 * C_inv_diag[p + s.start:p + s.stop].sum()) / (s.stop - s.start)
+                for s in slices]
+    return np.maximum(np.append(sigma2_k, (yty - sol @ rhs) / (n - p)), floor)
+
+
+def fit_mixed_model(y, X, Z, slices, max_iter=MAX_ITER, tol=TOL):
+    """EM-REML 拟合（SQUAREM 加速），返回 dict（β、u、方差分量、C⁻¹ 对角线、REML 对数似然、迭代次数、边界分量）
+
+    方差分量趋于 0 时普通 EM 只能次线性收敛，SQUAREM 用连续两步 EM 的差分外推，
+    外推结果的似然下降时退回普通 EM 步；
+    某个方差分量占总方差的比例低于 BOUNDARY_RATIO、且固定在下界不降低似然时，将其固定在下界（边界估计）不再迭代
+    """
+    n, p = X.shape
+    mme = _mme_blocks(X, Z, y, slices)
+    rhs = mme["rhs"]
+    yty = y @ y
+    floor = MIN_VARIANCE_RATIO * max(np.var(y), 1e-12)
+    at_boundary = np.zeros(len(slices) + 1, dtype=bool)
+
+    def solve(theta):
+        return _solve_mme(mme, yty, slices, theta[-1], theta[:-1], n, p)
+
+    def em(theta, state):
+        return np.where(at_boundary, floor, _em_update(state[0], state[1], rhs, yty, slices, theta[-1], n, p, floor))
+
+    theta = np.append(np.full(len(slices), np.var(y) / (len(slices) + 1)), np.var(y))
+    state = solve(theta)
+    converged = False
+    for iteration in range(1, max_iter + 1):
+        theta1 = em(theta, state)
+        state1 = solve(theta1)
+        theta2 = em(theta1, state1)
+        state2 = solve(theta2)
+        r, v = theta1 - theta, theta2 - 2 * theta1 + theta
+        alpha = -np.linalg.norm(r) / max(np.linalg.norm(v), 1e-300)
+        new_theta, new_state = theta2, state2
+        if alpha < -1:
+            extrapolated = np.where(at_boundary, floor, np.maximum(theta - 2 * alpha * r + alpha ** 2 * v, floor))
+            candidate = em(extrapolated, solve(extrapolated))
+            candidate_state = solve(candidate)
+            if candidate_state[2] >= state2[2]:
+                new_theta, new_state = candidate, candidate_state
+
+        # 趋于 0 的方差分量：固定在下界后似然不降低则视为边界估计
+        for k in np.flatnonzero(~at_boundary[:-1] & (new_theta[:-1] < BOUNDARY_RATIO * new_theta.sum())):
+            capped = new_theta.copy()
+            capped[k] = floor
+            capped_state = solve(capped)
+            if capped_state[2] >= new_state[2] - tol:
+                at_boundary[k] = True
+                new_theta, new_state = capped, capped_state
+
+        converged = abs(new_state[2] - state[2]) < tol
+        theta, state = new_theta, new_state
+        if converged:
+            break
+
+    C_inv_diag, sol, reml = state
+    return {"beta": sol[:p], "u": sol[p:], "sigma2": theta[-1], "sigma2_k": theta[:-1], "C_inv_diag": C_inv_diag,
+            "reml": reml, "n_iter": iteration, "converged": converged, "at_boundary": at_boundary[:-1]}
+
+
+def run_mixed_model(df, outcome=OUTCOME, predictors=DEFAULT_PREDICTORS, factors=GROUP_FACTORS, standardize=True):
+    """拟合一个混合模型，返回 (固定效应表, 方差分量表, 随机截距表, 模型信息)"""
+    df = add_group_columns(df)
+    predictors = list(dict.fromkeys(predictors))
+    data = df[[outcome] + predictors + list(factors)].dropna()
+    values = data[[outcome] + predictors].apply(pd.to_numeric, errors='coerce').astype(float)
+    if standardize:
+        values = (values - values.mean()) / values.std(ddof=0).replace(0, 1)
+    y = values[outcome].to_numpy()
+    X = np.column_stack([np.ones(len(data)), values[predictors].to_numpy()])
+    Z, slices, levels = random_effect_design(data, factors)
+    fit = fit_mixed_model(y, X, Z, slices)
+
+    n, p = X.shape
+    se = np.sqrt(fit["sigma2"] * fit["C_inv_diag"][:p])
+    t = fit["beta"] / se
+    fixed = pd.DataFrame({
+        '变量': ['截距'] + predictors,
+        '估计值': fit["beta"],
+        '标准误': se,
+        't值': t,
+        'p值': 2 * stats.t.sf(np.abs(t), n - p),
+    })
+
+    total_var = fit["sigma2"] + fit["sigma2_k"].sum()
+    variance = pd.DataFrame({
+        '成分': [f"{f}随机截距" for f in factors] + ['残差'],
+        '水平数': [len(l) for l in levels] + [n],
+        '方差': list(fit["sigma2_k"]) + [fit["sigma2"]],
+    })
+    variance['ICC'] = variance['方差'] / total_var
+    variance['是否在边界'] = list(fit["at_boundary"]) + [False]
+
+    blup = pd.DataFrame({
+        '分组因子': np.repeat(list(factors), [len(l) for l in levels]),
+        '水平': [name for l in levels for name in l],
+        '随机截距': fit["u"],
+        '标准误': np.sqrt(fit["sigma2"] * fit["C_inv_diag"][p:]),
+    })
+
+    info = {'因变量': outcome, '样本量': n, '固定效应数': p, 'REML对数似然': fit["reml"],
+            'AIC(REML)': -2 * fit["reml"] + 2 * (len(factors) + 1), '迭代次数': fit["n_iter"],
+            '是否收敛': fit["converged"],
+            '边界方差分量': "、".join(f for f, b in zip(factors, fit["at_boundary"]) if b) or "无"}
+    return fixed, variance, blup, info
+
+
+def screen_features(df, features, outcome=OUTCOME, controls=CONTROLS, factors=GROUP_FACTORS, standardize=True):
+    """逐特征拟合 "结果 ~ 控制变量 + 特征"，汇总各特征的固定效应"""
+    rows = []
+    for feature in features:
+        if feature in controls or feature == outcome or df[feature].nunique(dropna=True) < 2:
+            continue
+        fixed, variance, _, info = run_mixed_model(df, outcome, list(controls) + [feature], factors, standardize)
+        row = fixed[fixed['变量'] == feature].iloc[0].to_dict()
+        row.update({'样本量': info['样本量'], '班级ICC': variance['ICC'].iloc[0], '是否收敛': info['是否收敛']})
+        rows.append(row)
+    table = pd.DataFrame(rows)
+    return table.sort_values('p值') if len(table) else table
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多水平线性混合模型（班级/学校随机截距，EM-REML）")
+    parser.add_argument("--outcome", default=OUTCOME, help="因变量（可用学习增益指标，如 normalized_gain、residualized_gain）")
+    parser.add_argument("--predictors", nargs="*", default=CONTROLS + DEFAULT_PREDICTORS, help="固定效应自变量")
+    parser.add_argument("--groups", nargs="*", choices=GROUP_FACTORS, default=GROUP_FACTORS, help="随机截距分组因子")
+    parser.add_argument("--screen", action="store_true", help="对全部行为特征与掌握程度逐一筛选（控制前测成绩）")
+    parser.add_argument("--raw", action="store_true", help="使用原始量纲（默认标准化后拟合）")
+    args = parser.parse_args()
+
+    df = join_learning_gains(load_student_features())
+    fixed, variance, blup, info = run_mixed_model(df, args.outcome, args.predictors, args.groups, not args.raw)
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    with pd.ExcelWriter(OUTPUT_FILE) as writer:
+        fixed.to_excel(writer, sheet_name="固定效应", index=False)
+        variance.to_excel(writer, sheet_name="方差分量", index=False)
+        blup.to_excel(writer, sheet_name="随机截距", index=False)
+        pd.DataFrame([info]).T.rename(columns={0: '值'}).to_excel(writer, sheet_name="模型信息")
+        if args.screen:
+            features = [c for c in df.columns if c.startswith(SCREEN_PREFIX)] + MASTERY_FEATURES
+            screen = screen_features(df, features, args.outcome, CONTROLS, args.groups, not args.raw)
+            screen.to_excel(writer, sheet_name="逐特征筛选", index=False)
+
+    print(f"\n模型: {args.outcome} ~ {' + '.join(args.predictors)} + ({' + '.join(args.groups)} 随机截距)")
+    print(f"样本量 {info['样本量']}，迭代 {info['迭代次数']} 次，REML 对数似然 {info['REML对数似然']:.3f}")
+    print("\n方差分量:")
+    for _, row in variance.iterrows():
+        print(f"- {row['成分']}: 方差={row['方差']:.4f}, ICC={row['ICC']:.3f}"
+              + ("（边界估计，方差固定在下界）" if row['是否在边界'] else ""))
+    print("\n固定效应:")
+    for _, row in fixed.iterrows():
+        print(f"- {row['变量']}: β={row['估计值']:.3f}, SE={row['标准误']:.3f}, p={row['p值']:.4f}")
+    if args.screen:
+        print("\n逐特征筛选（p < 0.05）:")
+        for _, row in screen[screen['p值'] < 0.05].iterrows():
+            print(f"- {row['变量']}: β={row['估计值']:.3f}, p={row['p值']:.4f}")
+    print(f"\n混合模型分析完成！结果已保存到: {OUTPUT_FILE}")
+
+
+if __name__ == "__main__":
+    main()
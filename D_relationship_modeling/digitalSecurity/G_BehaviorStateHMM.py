@@ -0,0 +1,254 @@
+# 隐马尔可夫模型（离散观测）：从编码事件序列中推断学生的潜在投入状态（阅读、探索、练习作答、反馈反思等）
+# - 每个学生的每一轮游戏为一条序列，事件按粒度整数编码
+# - 序列按长度排序后切分为若干分片，每个分片补齐成 (序列数, 最大长度) 矩阵 + 掩码，减少补齐浪费
+# - 前向-后向算法在对数空间进行，每个时间步对整个分片向量化计算（按行减最大值后做矩阵乘法）；补齐位置不更新 α、β
+# - Baum-Welch（EM）：E 步按分片在进程池中并行，汇总期望计数后 M 步更新参数；多次随机初始化取似然最大者
+# - 状态自动命名：按状态发射分布中占比最高的行为大类命名（同名时附加最常见的子类）
+# - 输出每个学生的状态占比、状态切换率，供聚类与路径分析使用
+
+import os
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from event_data import EVENT_LEVELS, load_raw_data, load_student_groups, load_coded_events, event_labels, encode_sequences
+
+N_STATES = 4
+EVENT_LEVEL = "subcategory"
+COLLAPSE_REPEATS = False    # 保留连续重复事件，状态停留时长由重复事件体现
+N_INIT = 3                  # 随机初始化次数
+MAX_ITER = 200
+TOL = 1e-4                  # 对数似然变化收敛阈值
+N_SHARDS = 4                # 序列分片数（进程池任务数）
+PSEUDO_COUNT = 1e-3         # M 步伪计数，避免概率为 0
+RANDOM_SEED = 42
+STATE_NAMES = {'read': 'reading', 'explore': 'exploring', 'practice': 'practicing',
+               'feedback': 'feedback', 'replay_end': 'replaying'}
+OUTPUT_DIR = "./result"
+MODEL_OUTPUT_FILE = f"{OUTPUT_DIR}/行为状态隐马尔可夫模型.xlsx"
+FEATURE_OUTPUT_FILE = f"{OUTPUT_DIR}/学生行为状态特征.xlsx"
+
+_WORKER = {}
+
+
+def make_shards(items, offsets, n_shards=N_SHARDS):
+    """一维事件数组 + 偏移量 -> 分片列表 [(观测矩阵 (b, T), 序列长度 (b,), 序列编号 (b,)), ...]"""
+    lengths = np.diff(offsets)
+    order = np.argsort(lengths, kind="stable")
+    # 按累计事件数均分，使各分片计算量接近
+    cum = np.cumsum(lengths[order])
+    cuts = np.searchsorted(cum, np.linspace(0, cum[-1], n_shards + 1)[1:-1])
+    shards = []
+    for seq_ids in np.split(order, cuts):
+        if len(seq_ids) == 0:
+            continue
+        shard_len = lengths[seq_ids]
+        obs = np.zeros((len(seq_ids), shard_len.max()), dtype=np.int64)
+        mask = np.arange(obs.shape[1]) < shard_len[:, None]
+        obs[mask] = np.concatenate([items[offsets[s]:offsets[s + 1]] for s in seq_ids])
+        shards.append((obs, shard_len, seq_ids))
+    return shards
+
+
+def _logsumexp(x, axis):
+    m = x.max(axis=axis, keepdims=True)
+    return (m + np.log(np.exp(x - m).sum(axis=axis, keepdims=True))).squeeze(axis)
+
+
+def _log_matmul(log_x, A):
+    """log(exp(log_x) @ A)：按行减去最大值后用矩阵乘法，保持对数空间数值稳定"""
+    m = log_x.max(axis=1, keepdims=True)
+    return m + np.log(np.exp(log_x - m) @ A)
+
+
+def forward_backward(obs, lengths, log_pi, log_A, log_B, per_sequence=False):
+    """对一个补齐分片做对数空间前向-后向，返回期望计数（及可选的每条序列状态占用、切换次数）"""
+    b, T = obs.shape
+    K = len(log_pi)
+    A = np.exp(log_A)
+    mask = np.arange(T) < lengths[:, None]
+    emit = log_B[:, obs].transpose(1, 2, 0)             # (b, T, K)
+
+    alpha = np.empty((b, T, K))
+    alpha[:, 0] = log_pi + emit[:, 0]
+    for t in range(1, T):
+        step = _log_matmul(alpha[:, t - 1], A) + emit[:, t]
+        alpha[:, t] = np.where(mask[:, t, None], step, alpha[:, t - 1])
+    loglik = _logsumexp(alpha[:, -1], axis=1)           # 补齐位置保留最后一个有效 α
+
+    beta = np.zeros((b, T, K))
+    xi_sum = np.zeros((K, K))
+    switches = np.zeros(b)
+    for t in range(T - 2, -1, -1):
+        nxt = emit[:, t + 1] + beta[:, t + 1]           # (b, K)
+        beta[:, t] = np.where(mask[:, t + 1, None], _log_matmul(nxt, A.T), 0.0)
+        xi = np.exp(alpha[:, t, :, None] + log_A + nxt[:, None, :] - loglik[:, None, None])
+        xi *= mask[:, t + 1, None, None]
+        xi_sum += xi.sum(axis=0)
+        if per_sequence:
+            switches += xi.sum(axis=(1, 2)) - np.einsum("bkk->b", xi)
+
+    gamma = np.exp(alpha + beta - loglik[:, None, None]) * mask[:, :, None]
+    emission = np.zeros((log_B.shape[1], K))
+    np.add.at(emission, obs[mask], gamma[mask])
+    stats = {"start": gamma[:, 0].sum(axis=0), "trans": xi_sum, "emit": emission.T, "loglik": loglik.sum()}
+    if per_sequence:
+        stats.update({"occupancy": gamma.sum(axis=1), "switches": switches, "seq_loglik": loglik})
+    return stats
+
+
+def _init_worker(shards):
+    _WORKER["shards"] = shards
+
+
+def _e_step_shard(task):
+    shard_id, log_pi, log_A, log_B, per_sequence = task
+    obs, lengths, _ = _WORKER["shards"][shard_id]
+    return forward_backward(obs, lengths, log_pi, log_A, log_B, per_sequence)
+
+
+def random_params(rng, n_states, n_symbols, symbol_freq):
+    """随机初始化：发射分布在总体频率附近扰动，转移矩阵偏向自转移"""
+    pi = np.full(n_states, 1 / n_states)
+    A = 0.7 * np.eye(n_states) + 0.3 * rng.dirichlet(np.ones(n_states), size=n_states)
+    B = 0.5 * symbol_freq + 0.5 * rng.dirichlet(np.ones(n_symbols), size=n_states)
+    return pi, A, B
+
+
+def m_step(stats):
+    pi = stats["start"] + PSEUDO_COUNT
+    A = stats["trans"] + PSEUDO_COUNT
+    B = stats["emit"] + PSEUDO_COUNT
+    return pi / pi.sum(), A / A.sum(axis=1, keepdims=True), B / B.sum(axis=1, keepdims=True)
+
+
+def e_step(run_shard, n_shards, params, per_sequence=False):
+    """全部分片的 E 步，按分片顺序汇总（结果与进程数无关）"""
+    log_pi, log_A, log_B = (np.log(p) for p in params)
+    results = run_shard([(i, log_pi, log_A, log_B, per_sequence) for i in range(n_shards)])
+    total = {key: sum(r[key] for r in results) for key in ("start", "trans", "emit", "loglik")}
+    return total, results
+
+
+def baum_welch(run_shard, n_shards, init_params, max_iter=MAX_ITER, tol=TOL):
+    """EM 迭代，返回 (参数, 该参数下的对数似然, 迭代次数)
+
+    E 步得到的对数似然对应 M 步之前的参数，因此返回的是最后一次 E 步所用的参数
+    """
+    params, prev = init_params, -np.inf
+    for iteration in range(1, max_iter + 1):
+        stats, _ = e_step(run_shard, n_shards, params)
+        if stats["loglik"] - prev < tol:
+            break
+        prev = stats["loglik"]
+        params = m_step(stats)
+    return params, stats["loglik"], iteration
+
+
+def label_states(B, vocab, label_category):
+    """按发射分布中占比最高的行为大类命名状态，同名时附加最常见的事件"""
+    categories = sorted(set(label_category.values()))
+    cat_idx = np.array([categories.index(label_category[v]) for v in vocab])
+    cat_mass = np.zeros((len(B), len(categories)))
+    np.add.at(cat_mass.T, cat_idx, B.T)
+    names = [STATE_NAMES.get(categories[c], categories[c]) for c in cat_mass.argmax(axis=1)]
+    labels = []
+    for k, name in enumerate(names):
+        labels.append(f"{name}_{vocab[B[k].argmax()]}" if names.count(name) > 1 else name)
+    return labels
+
+
+def fit_hmm(items, offsets, n_symbols, n_states=N_STATES, n_init=N_INIT, seed=RANDOM_SEED, max_workers=None):
+    """多次随机初始化拟合 HMM，返回 (最优参数, 对数似然, 迭代次数, 每条序列状态占用/切换次数/对数似然)"""
+    shards = make_shards(items, offsets, N_SHARDS)
+    symbol_freq = np.bincount(items, minlength=n_symbols) / len(items)
+    rngs = [np.random.default_rng(s) for s in np.random.SeedSequence(seed).spawn(n_init)]
+
+    def fit_all(run_shard):
+        best = None
+        for rng in rngs:
+            params, loglik, n_iter = baum_welch(run_shard, len(shards), random_params(rng, n_states, n_symbols, symbol_freq))
+            if best is None or loglik > best[1]:
+                best = (params, loglik, n_iter)
+        # 最终 E 步的对数似然即保存参数的对数似然，用于报告对数似然与 BIC
+        total, results = e_step(run_shard, len(shards), best[0], per_sequence=True)
+        return (best[0], total["loglik"], best[2]), results
+
+    if max_workers == 1:
+        _init_worker(shards)
+        best, results = fit_all(lambda tasks: [_e_step_shard(t) for t in tasks])
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(shards,)) as executor:
+            best, results = fit_all(lambda tasks: list(executor.map(_e_step_shard, tasks)))
+
+    # 分片结果按序列编号还原
+    n_seq = len(offsets) - 1
+    occupancy, switches, seq_loglik = np.zeros((n_seq, n_states)), np.zeros(n_seq), np.zeros(n_seq)
+    for (_, _, seq_ids), r in zip(shards, results):
+        occupancy[seq_ids], switches[seq_ids], seq_loglik[seq_ids] = r["occupancy"], r["switches"], r["seq_loglik"]
+    return best, occupancy, switches, seq_loglik
+
+
+def student_state_features(groups, seq_rows, occupancy, switches, labels):
+    """序列级状态占用 -> 学生级特征：各状态占比、状态切换率（每个事件的期望切换次数）"""
+    n_students = len(groups)
+    occ = np.zeros((n_students, occupancy.shape[1]))
+    np.add.at(occ, seq_rows, occupancy)
+    n_events = occ.sum(axis=1)
+    n_switches = np.bincount(seq_rows, weights=switches, minlength=n_students)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        features = pd.DataFrame(occ / n_events[:, None], columns=[f"hmm_{label}_occupancy" for label in labels])
+        features['hmm_switch_rate'] = n_switches / n_events
+    features.insert(0, 'hmm_dominant_state', [labels[k] if n > 0 else None for k, n in zip(occ.argmax(axis=1), n_events)])
+    return pd.concat([groups[['Class', 'StuNum']].reset_index(drop=True), features], axis=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="行为序列隐马尔可夫模型：潜在投入状态推断")
+    parser.add_argument("--states", type=int, default=N_STATES, help="隐状态个数")
+    parser.add_argument("--level", choices=EVENT_LEVELS, default=EVENT_LEVEL, help="事件粒度")
+    parser.add_argument("--collapse-repeats", action="store_true", help="合并连续重复事件")
+    parser.add_argument("--n-init", type=int, default=N_INIT, help="随机初始化次数")
+    parser.add_argument("--workers", type=int, default=None, help="并行进程数")
+    args = parser.parse_args()
+
+    raw_df = load_raw_data()
+    events = load_coded_events(raw_df)
+    groups = load_student_groups(raw_df)
+    items, offsets, vocab, seq_rows = encode_sequences(events, args.level, args.collapse_repeats)
+    print(f"编码事件 {len(items)} 条，序列 {len(offsets) - 1} 条，事件种类 {len(vocab)} 个")
+
+    (params, loglik, n_iter), occupancy, switches, _ = fit_hmm(
+        items, offsets, len(vocab), args.states, args.n_init, max_workers=args.workers)
+    pi, A, B = params
+    label_category = pd.Series(events['category'].to_numpy(),
+                               index=event_labels(events, args.level).astype(str).to_numpy()).groupby(level=0).first()
+    labels = label_states(B, vocab, label_category.to_dict())
+
+    n_params = (args.states - 1) + args.states * (args.states - 1) + args.states * (len(vocab) - 1)
+    bic = -2 * loglik + n_params * np.log(len(items))
+    features = student_state_features(groups, seq_rows, occupancy, switches, labels)
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    with pd.ExcelWriter(MODEL_OUTPUT_FILE) as writer:
+        state_table = pd.DataFrame(B, index=labels, columns=vocab)
+        state_table.insert(0, '初始概率', pi)
+        state_table.insert(1, '自转移概率', np.diag(A))
+        state_table.to_excel(writer, sheet_name="状态发射分布")
+        pd.DataFrame(A, index=labels, columns=labels).to_excel(writer, sheet_name="状态转移矩阵")
+        pd.DataFrame([{'状态数': args.states, '对数似然': loglik, 'BIC': bic, '迭代次数': n_iter}]).T \
+            .rename(columns={0: '值'}).to_excel(writer, sheet_name="模型信息")
+    features.to_excel(FEATURE_OUTPUT_FILE, index=False)
+
+    print(f"\n对数似然 {loglik:.2f}，BIC {bic:.2f}，迭代 {n_iter} 次")
+    print("\n各状态最常见的事件:")
+    for k, label in enumerate(labels):
+        top = np.argsort(B[k])[::-1][:3]
+        print(f"- {label}: 自转移={A[k, k]:.2f}, " + ", ".join(f"{vocab[i]}={B[k, i]:.2f}" for i in top))
+    print(f"\n隐马尔可夫模型分析完成！模型参数: {MODEL_OUTPUT_FILE}，学生状态特征: {FEATURE_OUTPUT_FILE}")
+
+
+if __name__ == "__main__":
+    main()
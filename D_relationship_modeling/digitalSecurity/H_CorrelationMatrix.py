@@ -0,0 +1,153 @@
+# 全特征相关矩阵：学生行为画像 + 知识掌握表全部数值列的 Pearson / Spearman 相关系数及显著性
+# - 成对删除（pairwise-complete）：缺失掩码 M、补零数据 X0 后，全部列对的样本量与各项和均由矩阵乘法得到：
+#     n = MᵀM,  Σx = X0ᵀM,  Σx² = (X0²)ᵀM,  Σxy = X0ᵀX0
+#   r = (n Σxy - Σx Σy) / sqrt((n Σx² - (Σx)²)(n Σy² - (Σy)²))
+# - 列先按各自均值中心化，减少求和相消误差
+# - Spearman：每列只做一次秩变换（平均秩，缺失保持缺失），再按 Pearson 计算
+#   （成对删除时不在每个列对的公共样本上重新求秩，缺失模式不同的列对为近似值）
+# - p 值：t = r sqrt((n-2)/(1-r²))，自由度 n-2
+# - 列数很多时按列分块计算，只计算上三角块再镜像
+# - 导出 xlsx（相关矩阵 + 长表）和仪表盘可直接加载的 JSON（缺失为 null）
+
+import os
+import json
+import argparse
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from event_data import load_student_features
+
+EXCLUDE_COLUMNS = ['StuNum']
+BLOCK_SIZE = 512            # 分块计算的列块大小
+MIN_PAIRS = 3               # 成对有效样本少于该值时相关系数记为缺失
+ALPHA = 0.05
+JSON_DECIMALS = 4
+OUTPUT_DIR = "./result"
+OUTPUT_FILE = f"{OUTPUT_DIR}/特征相关矩阵.xlsx"
+JSON_DIR = "../../F_dashBoard_web/data"
+JSON_FILE = f"{JSON_DIR}/特征相关矩阵.json"
+
+
+def _block_corr(Xa, Ma, Xb, Mb):
+    """两个列块之间的成对删除相关系数与样本量"""
+    n = Ma.T @ Mb
+    sum_a = Xa.T @ Mb
+    sum_b = Ma.T @ Xb
+    sq_a = (Xa * Xa).T @ Mb
+    sq_b = Ma.T @ (Xb * Xb)
+    cross = Xa.T @ Xb
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cov = n * cross - sum_a * sum_b
+        var = (n * sq_a - sum_a ** 2) * (n * sq_b - sum_b ** 2)
+        r = np.clip(cov / np.sqrt(var), -1, 1)
+    r[(n < MIN_PAIRS) | ~(var > 0)] = np.nan
+    return r, n
+
+
+def pairwise_corr(X, block_size=BLOCK_SIZE):
+    """X (样本, 列)，可含 NaN；返回 (相关系数矩阵, 成对样本量矩阵)"""
+    mask = ~np.isnan(X)
+    X0 = np.where(mask, X - np.nanmean(X, axis=0), 0.0)
+    M = mask.astype(float)
+    p = X.shape[1]
+    r = np.empty((p, p))
+    n = np.empty((p, p))
+    for i in range(0, p, block_size):
+        a = slice(i, min(i + block_size, p))
+        for j in range(i, p, block_size):
+            b = slice(j, min(j + block_size, p))
+            r[a, b], n[a, b] = _block_corr(X0[:, a], M[:, a], X0[:, b], M[:, b])
+            r[b, a], n[b, a] = r[a, b].T, n[a, b].T
+    return r, n
+
+
+def corr_pvalues(r, n):
+    """相关系数的双侧 t 检验 p 值"""
+    df = n - 2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = r * np.sqrt(df / (1 - r ** 2))
+        p = 2 * stats.t.sf(np.abs(t), df)
+    p[np.abs(r) >= 1] = 0.0
+    p[np.isnan(r) | (df <= 0)] = np.nan
+    return p
+
+
+def correlation_matrices(df, block_size=BLOCK_SIZE):
+    """返回 {方法: (r, p)} 及成对样本量矩阵"""
+    X = df.to_numpy(dtype=float)
+    ranks = df.rank(method='average').to_numpy(dtype=float)
+    result = {}
+    for method, values in (('pearson', X), ('spearman', ranks)):
+        r, n = pairwise_corr(values, block_size)
+        result[method] = (r, corr_pvalues(r, n))
+    return result, n
+
+
+def long_table(features, result, n):
+    """上三角列对的长表"""
+    i, j = np.triu_indices(len(features), k=1)
+    table = pd.DataFrame({
+        '特征1': np.asarray(features, dtype=object)[i],
+        '特征2': np.asarray(features, dtype=object)[j],
+        '样本量': n[i, j].astype(int),
+    })
+    for method, name in (('pearson', 'Pearson'), ('spearman', 'Spearman')):
+        r, p = result[method]
+        table[f'{name} r'] = r[i, j]
+        table[f'{name} p值'] = p[i, j]
+    return table
+
+
+def _to_json_matrix(values, decimals=JSON_DECIMALS):
+    """矩阵 -> 嵌套列表，NaN 转为 null"""
+    rounded = np.round(values, decimals).astype(object)
+    rounded[np.isnan(values)] = None
+    return rounded.tolist()
+
+
+def export_json(features, result, n, path=JSON_FILE):
+    """导出仪表盘可直接加载的 JSON：{features, n, pearson: {r, p}, spearman: {r, p}}"""
+    payload = {'features': list(features), 'n': n.astype(int).tolist()}
+    for method, (r, p) in result.items():
+        payload[method] = {'r': _to_json_matrix(r), 'p': _to_json_matrix(p)}
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, separators=(",", ":"), allow_nan=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="学生画像与知识掌握全部特征的 Pearson/Spearman 相关矩阵")
+    parser.add_argument("--block-size", type=int, default=BLOCK_SIZE, help="分块计算的列块大小")
+    parser.add_argument("--no-json", action="store_true", help="不导出前端 JSON")
+    args = parser.parse_args()
+
+    df = load_student_features(knowledge_columns=None)
+    numeric = df.drop(columns=EXCLUDE_COLUMNS).select_dtypes('number')
+    features = list(numeric.columns)
+    print(f"学生 {len(numeric)} 人，数值特征 {len(features)} 个")
+
+    result, n = correlation_matrices(numeric, args.block_size)
+    table = long_table(features, result, n)
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    with pd.ExcelWriter(OUTPUT_FILE) as writer:
+        table.to_excel(writer, sheet_name="列对长表", index=False)
+        for method, name in (('pearson', 'Pearson'), ('spearman', 'Spearman')):
+            pd.DataFrame(result[method][0], index=features, columns=features).to_excel(writer, sheet_name=f"{name}相关矩阵")
+    if not args.no_json:
+        export_json(features, result, n)
+        print(f"JSON 已生成到 {JSON_FILE}")
+
+    outcome_pairs = table[table['特征1'].isin(['preScore', 'postScore', 'p_postScore'])
+                          | table['特征2'].isin(['preScore', 'postScore', 'p_postScore'])]
+    significant = outcome_pairs[outcome_pairs['Spearman p值'] < ALPHA]
+    print(f"\n与成绩显著相关的特征对（Spearman p < {ALPHA}，前10）:")
+    for _, row in significant.reindex(significant['Spearman r'].abs().sort_values(ascending=False).index).head(10).iterrows():
+        print(f"- {row['特征1']} ~ {row['特征2']}: ρ={row['Spearman r']:.3f}, p={row['Spearman p值']:.4f}, n={row['样本量']}")
+    print(f"\n相关分析完成！共 {len(table)} 个特征对，结果已保存到: {OUTPUT_FILE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# D 层公共数据加载：编码事件长表 + 学生分组信息 + 学生特征表（行为画像 + 知识掌握程度）
+# 编码事件直接复用 B 层 B_Coding_process.build_coded_event_table，保证与 B 层行为编码口径一致
+# 序列切分与编码（encode_sequences）供序列模式挖掘、隐马尔可夫模型等共用
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+B_DIR = "../../B_data_preprocessing/StandardizationOfGameBehaviorCoding/digitalSecurity"
+C_DIR = "../../C_behavior_mining/digitalSecurity"
+RAW_FILE = f"{B_DIR}/result/人口学信息_问卷_游戏匹配整合数据.xlsx"
+CLUSTER_FILE = f"{C_DIR}/result/学生聚类结果.xlsx"
+BEHAVIOR_FILE = f"{B_DIR}/result/每个学生游戏行为画像.xlsx"
+KNOWLEDGE_FILE = f"{C_DIR}/result/学生知识掌握程度评估.xlsx"
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), B_DIR))
+from B_Coding_process import build_coded_event_table
+from class_names import school_of   # 供 D 层各脚本按班级名称提取学校
+
+EVENT_LEVELS = ["code", "subcategory", "category"]   # 事件粒度：原始事件代码 / 行为子类 / 行为大类
+SCORE_GROUPS = ['低分组', '中分组', '高分组']
+MASTERY_FEATURES = [
+    'passwordFunction_mastery', 'passwordComposition_mastery', 'cybersecurityTools_mastery',
+    'cyberattackAvoidance_mastery', 'passwordStrengthMemory_mastery',
+]
+
+
+def load_raw_data(raw_file=RAW_FILE):
+    """读取 B 层整合后的原始数据（含各轮行为序列）"""
+    return pd.read_excel(raw_file)
+
+
+def load_student_groups(raw_df, cluster_file=CLUSTER_FILE):
+    """学生分组信息：每个 raw_df 行位置一行，含成绩三分组与 C 层聚类簇（无聚类结果时为空）"""
+    groups = raw_df[['Class', 'StuNum', 'Sex', 'preScore', 'postScore']].reset_index(drop=True)
+    groups.insert(0, 'row_idx', range(len(groups)))
+    groups['score_group'] = pd.qcut(groups['postScore'], q=3, labels=SCORE_GROUPS).astype(str)
+    groups.loc[groups['postScore'].isna(), 'score_group'] = None
+
+    if os.path.exists(cluster_file):
+        clusters = pd.read_excel(cluster_file, usecols=['Class', 'StuNum', 'cluster'])
+        groups = groups.merge(clusters, on=['Class', 'StuNum'], how='left')
+        groups['cluster'] = groups['cluster'].map(lambda c: None if pd.isna(c) else f"簇{int(c)}")
+    else:
+        print(f"未找到聚类结果 {cluster_file}，跳过按簇分组")
+        groups['cluster'] = None
+    return groups
+
+
+def event_labels(events, level="subcategory"):
+    """按粒度生成事件标签（子类名在不同大类中有重名，如 positive，因此带上大类前缀）"""
+    if level == "code":
+        return events["event_code"]
+    if level == "category":
+        return events["category"]
+    if level == "subcategory":
+        return events["category"] + "_" + events["subcategory"]
+    raise ValueError(f"未知的事件粒度: {level}，可选: {EVENT_LEVELS}")
+
+
+def sequence_starts(events):
+    """每个事件是否为一条序列（同一学生同一轮游戏）的首个事件
+
+    按 (row_idx, game_round) 两列逐一比较相邻事件，events 需已按 row_idx、game_round 排好序
+    """
+    row_idx = events["row_idx"].to_numpy()
+    game_round = events["game_round"].to_numpy()
+    starts = np.ones(len(events), dtype=bool)
+    starts[1:] = (row_idx[1:] != row_idx[:-1]) | (game_round[1:] != game_round[:-1])
+    return starts
+
+
+def encode_sequences(events, level="subcategory", collapse_repeats=False):
+    """编码事件长表 -> (事件编码一维数组, 序列偏移量, 事件词表, 每条序列对应的 row_idx)
+
+    events 需已按 row_idx、game_round、event_idx 排好序（build_coded_event_table 的输出即如此）
+    """
+    labels = event_labels(events, level).to_numpy()
+    row_idx = events["row_idx"].to_numpy()
+    new_seq = sequence_starts(events)
+
+    vocab, items = np.unique(labels.astype(str), return_inverse=True)
+    items = items.astype(np.int32)
+
+    if collapse_repeats:
+        keep = new_seq.copy()
+        keep[1:] |= items[1:] != items[:-1]
+        items, row_idx, new_seq = items[keep], row_idx[keep], new_seq[keep]
+
+    starts = np.flatnonzero(new_seq)
+    offsets = np.append(starts, len(items)).astype(np.int64)
+    seq_rows = row_idx[starts]
+    return items, offsets, list(vocab), seq_rows
+
+
+def load_coded_events(raw_df=None):
+    """加载编码事件长表"""
+    if raw_df is None:
+        raw_df = load_raw_data()
+    return build_coded_event_table(raw_df)
+
+
+def load_student_features(behavior_file=BEHAVIOR_FILE, knowledge_file=KNOWLEDGE_FILE,
+                          knowledge_columns=MASTERY_FEATURES):
+    """学生特征表：B 层行为画像（含前后测成绩）合并 C 层知识掌握程度（按班级+学号）
+
+    knowledge_columns 为 None 时合并知识表中行为画像没有的全部列
+    """
+    behavior = pd.read_excel(behavior_file)
+    knowledge = pd.read_excel(knowledge_file)
+    if knowledge_columns is None:
+        knowledge_columns = [c for c in knowledge.columns if c not in behavior.columns]
+    return behavior.merge(knowledge[['Class', 'StuNum'] + list(knowledge_columns)], on=['Class', 'StuNum'], how='left')
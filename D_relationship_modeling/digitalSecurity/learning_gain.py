@@ -0,0 +1,77 @@
+# 学习增益结果表：由前测 preScore、后测 postScore、延迟后测 p_postScore 计算各类增益指标
+# - 原始增益 raw_gain = post - pre
+# - 标准化增益（Hake）normalized_gain = (post - pre) / (满分 - pre)，前测满分时缺失
+# - 保持 retention = p_post - post，保持率 retention_ratio = p_post / post
+# - 残差增益 residualized_gain：post 对 pre 回归（全体）的残差；residualized_gain_class：回归中加入班级截距后的残差
+# - 班级表：各指标班级均值，以及 Hake 的班级平均标准化增益 <g> = (均值post - 均值pre) / (满分 - 均值pre)
+# - 全部指标按列向量化一次算出，结果缓存为 xlsx；上游行为画像文件更新后自动重算
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from event_data import BEHAVIOR_FILE
+
+MAX_SCORE = 100
+SCORE_COLUMNS = ['preScore', 'postScore', 'p_postScore']
+MISSING_SCORE = 0           # B 层按题求和时未参加测试的学生为 0 分，视为缺失（如云山班未做延迟后测）
+GAIN_COLUMNS = ['raw_gain', 'normalized_gain', 'retention', 'retention_ratio',
+                'residualized_gain', 'residualized_gain_class']
+OUTPUT_DIR = "./result"
+GAIN_FILE = f"{OUTPUT_DIR}/学习增益结果表.xlsx"
+
+
+def _regression_residuals(y, X):
+    """最小二乘残差（y 或 X 缺失的行残差为缺失）"""
+    valid = ~np.isnan(y) & ~np.isnan(X).any(axis=1)
+    residuals = np.full(len(y), np.nan)
+    if valid.sum() > X.shape[1]:
+        coef = np.linalg.lstsq(X[valid], y[valid], rcond=None)[0]
+        residuals[valid] = y[valid] - X[valid] @ coef
+    return residuals
+
+
+def compute_learning_gains(scores, max_score=MAX_SCORE):
+    """scores 含 Class、StuNum 与三次成绩列，返回 (学生增益表, 班级增益表)"""
+    students = scores[['Class', 'StuNum'] + SCORE_COLUMNS].copy()
+    students[SCORE_COLUMNS] = students[SCORE_COLUMNS].astype(float).replace(MISSING_SCORE, np.nan)
+    pre, post, delayed = (students[c].to_numpy() for c in SCORE_COLUMNS)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        students['raw_gain'] = post - pre
+        students['normalized_gain'] = np.where(pre < max_score, (post - pre) / (max_score - pre), np.nan)
+        students['retention'] = delayed - post
+        students['retention_ratio'] = delayed / post
+
+    class_codes, class_names = pd.factorize(students['Class'], sort=True)
+    ones = np.ones((len(students), 1))
+    class_dummies = np.eye(len(class_names))[class_codes]
+    students['residualized_gain'] = _regression_residuals(post, np.hstack([ones, pre[:, None]]))
+    students['residualized_gain_class'] = _regression_residuals(post, np.hstack([class_dummies, pre[:, None]]))
+
+    grouped = students.groupby('Class', sort=True)
+    classes = grouped[SCORE_COLUMNS + GAIN_COLUMNS].mean()
+    classes.insert(0, 'n', grouped.size())
+    classes['class_normalized_gain'] = (classes['postScore'] - classes['preScore']) / (max_score - classes['preScore'])
+    return students, classes.reset_index()
+
+
+def load_learning_gains(behavior_file=BEHAVIOR_FILE, gain_file=GAIN_FILE, refresh=False):
+    """读取学习增益结果表（缓存不存在、比上游文件旧或 refresh 时重新计算并写入缓存）"""
+    if not refresh and os.path.exists(gain_file) and os.path.getmtime(gain_file) >= os.path.getmtime(behavior_file):
+        return pd.read_excel(gain_file, sheet_name='学生'), pd.read_excel(gain_file, sheet_name='班级')
+
+    scores = pd.read_excel(behavior_file, usecols=['Class', 'StuNum'] + SCORE_COLUMNS)
+    students, classes = compute_learning_gains(scores)
+    os.makedirs(os.path.dirname(gain_file), exist_ok=True)
+    with pd.ExcelWriter(gain_file) as writer:
+        students.to_excel(writer, sheet_name='学生', index=False)
+        classes.to_excel(writer, sheet_name='班级', index=False)
+    return students, classes
+
+
+def join_learning_gains(df):
+    """按 (Class, StuNum) 把学生增益指标合并到特征表"""
+    students, _ = load_learning_gains()
+    return df.merge(students[['Class', 'StuNum'] + GAIN_COLUMNS], on=['Class', 'StuNum'], how='left')
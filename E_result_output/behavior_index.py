@@ -0,0 +1,104 @@
+# 仪表盘行为层级索引：(班级, 学号, 指标) -> 按"大类 + 子类"层级排好的行为数值向量
+# - 数据加载时一次性把学生表、班级表中各层级列抽成 (学生数, 行为项数) 矩阵，并算好学生与所在班级均值的差
+# - 切换学生、班级或指标时只做字典查找和矩阵取行，不再扫描整张表、逐行拼接层级列表
+# - 层级列表与原仪表盘一致：热力图只含数据中存在的列（子类需其大类存在），对比表包含层级中的全部行为（缺列记 0）
+
+import numpy as np
+
+BEHAVIOR_HIERARCHY = {
+    "read": ["read_knowledge", "read_rules", "read_return"],
+    "explore": ["explore_move", "explore_feedback_positive", "explore_feedback_negative"],
+    "practice": ["practice_choice", "practice_sub"],
+    "feedback": ["feedback_explaint", "feedback_sumAssessment"],
+    "replay_end": ["replay_end_part_replay", "replay_end_replay"]
+}
+METRICS = ["duration", "count"]
+SUB_PREFIX = "  → "
+
+
+def _hierarchy_items():
+    """层级展开为 [(行为名, 是否大类), ...]"""
+    items = []
+    for main_behavior, subs in BEHAVIOR_HIERARCHY.items():
+        items.append((main_behavior, True))
+        items.extend((sub, False) for sub in subs)
+    return items
+
+
+def _column_matrix(df, columns):
+    """按列名取数值矩阵，不存在的列填 0"""
+    matrix = np.zeros((len(df), len(columns)))
+    for j, col in enumerate(columns):
+        if col in df.columns:
+            matrix[:, j] = df[col].to_numpy(dtype=float)
+    return matrix
+
+
+class BehaviorIndex:
+    """学生/班级行为层级向量索引"""
+
+    def __init__(self, student_df, class_df):
+        self.items = _hierarchy_items()
+        self.names = [name for name, _ in self.items]
+        self.is_main = np.array([is_main for _, is_main in self.items])
+        self.student_pos = {key: i for i, key in enumerate(zip(student_df["Class"], student_df["StuNum"]))}
+        self.class_pos = {name: j for j, name in enumerate(class_df["Class"])}
+        if "班级" in class_df.columns:
+            self.class_pos.update({name: j for j, name in enumerate(class_df["班级"])})
+        student_class = np.array([self.class_pos.get(c, -1) for c in student_df["Class"]])
+
+        self.student_values, self.class_values, self.diff = {}, {}, {}
+        self.student_heatmap_items, self.class_heatmap_items = {}, {}
+        for metric in METRICS:
+            student_cols = [f"total_{name}_{metric}" for name in self.names]
+            class_cols = [f"class_avg_total_{name}_{metric}" for name in self.names]
+            self.student_values[metric] = _column_matrix(student_df, student_cols)
+            self.class_values[metric] = _column_matrix(class_df, class_cols)
+            class_rows = np.where(student_class[:, None] >= 0,
+                                  self.class_values[metric][np.maximum(student_class, 0)], np.nan)
+            self.diff[metric] = self.student_values[metric] - class_rows
+            self.student_heatmap_items[metric] = self._present_items(student_df.columns, student_cols)
+            self.class_heatmap_items[metric] = self._present_items(class_df.columns, class_cols)
+
+    def _present_items(self, columns, item_columns):
+        """热力图使用的行为项位置：列存在的大类，及其下列存在的子类"""
+        positions, main_present = [], False
+        for pos, ((_, is_main), col) in enumerate(zip(self.items, item_columns)):
+            if is_main:
+                main_present = col in columns
+                if main_present:
+                    positions.append(pos)
+            elif main_present and col in columns:
+                positions.append(pos)
+        return np.array(positions, dtype=int)
+
+    def categories(self, positions):
+        return [name if self.is_main[p] else f"{SUB_PREFIX}{name}" for p, name in zip(positions, np.array(self.names)[positions])]
+
+    def student_row(self, class_name, stu_num):
+        """学生在学生表中的行位置（找不到时为 None）"""
+        return self.student_pos.get((class_name, stu_num))
+
+    def student_heatmap(self, class_name, stu_num, metric):
+        """学生热力图数据：(数值列表, 行为类别列表)"""
+        row = self.student_row(class_name, stu_num)
+        if row is None:
+            return [], []
+        positions = self.student_heatmap_items[metric]
+        return self.student_values[metric][row, positions].tolist(), self.categories(positions)
+
+    def class_heatmap(self, class_name, metric):
+        """班级热力图数据：(数值列表, 行为类别列表)，class_name 可为全称或简称"""
+        row = self.class_pos.get(class_name)
+        if row is None:
+            return [], []
+        positions = self.class_heatmap_items[metric]
+        return self.class_values[metric][row, positions].tolist(), self.categories(positions)
+
+    def comparison_rows(self, class_name, stu_num, metric):
+        """学生与班级均值对比：[(行为名, 是否大类, 学生值, 班级均值, 差异), ...]（学生或班级不存在时为空）"""
+        row, class_row = self.student_row(class_name, stu_num), self.class_pos.get(class_name)
+        if row is None or class_row is None:
+            return []
+        return list(zip(self.names, self.is_main.tolist(), self.student_values[metric][row].tolist(),
+                        self.class_values[metric][class_row].tolist(), self.diff[metric][row].tolist()))
@@ -0,0 +1,185 @@
+# 仪表盘公共数据访问层：三个 Streamlit 仪表盘共用的数据加载与派生列
+# - 上游 Excel 首次读取后转存为列式缓存文件（有 pyarrow 时为 Feather，按内存映射读取；否则退回 pickle）
+# - 缓存签名为上游文件的 (修改时间, 大小)，上游结果重新生成后自动失效并重建
+# - 每个进程内再保留一份内存缓存，Streamlit 每次重跑只需 stat 上游文件，不再读盘
+# - 派生列在建缓存时一次算好：班级（班级简称）、是否有游戏记录、游戏成绩列转为数值
+# - 行为层级索引（BehaviorIndex）随学生表、班级表一起缓存，数据版本不变时不重建
+# - 每次单表加载的耗时、命中层级（memory / file / source）与缓存格式（feather / pickle）写入 telemetry 日志；
+#   退回 pickle 时（未安装 pyarrow 或 Feather 写入失败）另用 logging 给出警告及原因
+# - 内存缓存由各会话线程共享：字典读写加锁，同一张表的加载/建缓存按表名串行，避免并发重复读 Excel、同时写缓存文件
+# - 返回的 DataFrame 在各会话间共享，调用方不要原地修改
+
+import os
+import sys
+import json
+import time
+import logging
+import threading
+
+import numpy as np
+import pandas as pd
+
+import telemetry
+from behavior_index import BehaviorIndex
+
+try:
+    import pyarrow.feather as feather
+except ImportError:
+    feather = None
+
+B_DIR = "../B_data_preprocessing/StandardizationOfGameBehaviorCoding/digitalSecurity"
+B_RESULT_DIR = f"{B_DIR}/result"
+ARTIFACTS = {
+    "student": f"{B_RESULT_DIR}/每个学生游戏行为画像.xlsx",
+    "class": f"{B_RESULT_DIR}/班级行为画像.xlsx",
+    "raw": f"{B_RESULT_DIR}/人口学信息_问卷_游戏匹配整合数据.xlsx",
+    "behavior": f"{B_RESULT_DIR}/学生游戏行为画像.xlsx",
+}
+SCORE_COLUMN_PREFIXES = ["gameScore_", "TotalScore_"]   # 原始数据中需要转为数值的游戏成绩列
+CACHE_DIR = "./cache"
+CACHE_VERSION = 1           # 派生列逻辑变化时递增，使旧缓存失效
+
+_MEMORY = {}
+_MEMORY_LOCK = threading.Lock()     # 保护 _MEMORY 与 _LOAD_LOCKS
+_LOAD_LOCKS = {}                    # 表名 -> 该表的加载锁
+
+logger = logging.getLogger(__name__)
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), B_DIR))
+from class_names import short_class_name
+
+
+def artifact_signature(path):
+    """上游文件签名：修改时间（纳秒）与文件大小"""
+    stat = os.stat(path)
+    return [CACHE_VERSION, stat.st_mtime_ns, stat.st_size]
+
+
+def add_derived_columns(df):
+    """建缓存时一次性计算派生列"""
+    df = df.copy()
+    if "Class" in df.columns:
+        short_names = {name: short_class_name(name) for name in df["Class"].dropna().unique()}
+        df["班级"] = df["Class"].map(short_names)
+    if "game_count" in df.columns:
+        df["是否有游戏记录"] = np.where(df["game_count"] > 0, "有", "无")
+    for col in df.columns:
+        if any(str(col).startswith(prefix) for prefix in SCORE_COLUMN_PREFIXES):
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+    return df
+
+
+def _cache_paths(name):
+    return f"{CACHE_DIR}/{name}.feather", f"{CACHE_DIR}/{name}.pkl", f"{CACHE_DIR}/{name}.json"
+
+
+def _read_cache(name, signature):
+    """签名一致时读取列式缓存，返回 (DataFrame, 缓存格式)，否则返回 (None, None)"""
+    feather_path, pickle_path, meta_path = _cache_paths(name)
+    if not os.path.exists(meta_path):
+        return None, None
+    with open(meta_path, encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("signature") != signature:
+        return None, None
+    if meta.get("format") == "feather" and feather is not None and os.path.exists(feather_path):
+        return feather.read_feather(feather_path, memory_map=True), "feather"
+    if meta.get("format") == "pickle" and os.path.exists(pickle_path):
+        return pd.read_pickle(pickle_path), "pickle"
+    return None, None
+
+
+def _write_cache(name, df, signature):
+    """写列式缓存（Feather 写入失败，如列类型混杂时，退回 pickle 并记录原因），最后写签名文件，返回缓存格式"""
+    feather_path, pickle_path, meta_path = _cache_paths(name)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    fmt = "pickle"
+    if feather is None:
+        logger.warning("数据表 %s 的缓存使用 pickle：未安装 pyarrow", name)
+    else:
+        try:
+            feather.write_feather(df.reset_index(drop=True), feather_path, compression="uncompressed")
+            fmt = "feather"
+        except Exception as e:
+            logger.warning("数据表 %s 的 Feather 缓存写入失败，退回 pickle：%s", name, e)
+    if fmt == "pickle":
+        df.to_pickle(pickle_path)
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump({"signature": signature, "format": fmt}, f)
+    return fmt
+
+
+def _memory_get(key, signature):
+    """内存缓存中签名一致的对象，否则返回 None"""
+    with _MEMORY_LOCK:
+        cached = _MEMORY.get(key)
+    return cached[1] if cached is not None and cached[0] == signature else None
+
+
+def _memory_put(key, signature, value):
+    with _MEMORY_LOCK:
+        _MEMORY[key] = (signature, value)
+
+
+def _load_lock(key):
+    """同一张表（或索引）的加载锁"""
+    with _MEMORY_LOCK:
+        return _LOAD_LOCKS.setdefault(key, threading.Lock())
+
+
+def load_table(name):
+    """按名称加载数据表（已含派生列）：进程内存缓存 -> 列式缓存文件 -> 上游 Excel"""
+    start = time.perf_counter()
+    source = ARTIFACTS[name]
+    signature = artifact_signature(source)
+    df = _memory_get(name, signature)
+    if df is not None:
+        telemetry.log_event("table_load", name, (time.perf_counter() - start) * 1000, cache="memory")
+        return df
+
+    with _load_lock(name):
+        # 等锁期间其他会话可能已加载完成
+        df = _memory_get(name, signature)
+        if df is not None:
+            telemetry.log_event("table_load", name, (time.perf_counter() - start) * 1000, cache="memory")
+            return df
+        (df, fmt), tier = _read_cache(name, signature), "file"
+        if df is None:
+            df, tier = add_derived_columns(pd.read_excel(source)), "source"
+            fmt = _write_cache(name, df, signature)
+        _memory_put(name, signature, df)
+    telemetry.log_event("table_load", name, (time.perf_counter() - start) * 1000, cache=tier, format=fmt)
+    return df
+
+
+def load_behavior_index():
+    """学生表 + 班级表的行为层级索引（任一上游文件变化时重建）"""
+    signature = [artifact_signature(ARTIFACTS[name]) for name in ("student", "class")]
+    index = _memory_get("behavior_index", signature)
+    if index is not None:
+        return index
+    with _load_lock("behavior_index"):
+        index = _memory_get("behavior_index", signature)
+        if index is None:
+            index = BehaviorIndex(load_table("student"), load_table("class"))
+            _memory_put("behavior_index", signature, index)
+    return index
+
+
+def data_version(*names):
+    """若干上游文件签名组成的数据版本（可哈希，用作图表缓存键的一部分）"""
+    return tuple(tuple(artifact_signature(ARTIFACTS[name])) for name in names)
+
+
+def load_tables(*names):
+    """一次加载多张表"""
+    return tuple(load_table(name) for name in names)
+
+
+def clear_cache(remove_files=False):
+    """清空进程内缓存（可选同时删除缓存文件）"""
+    with _MEMORY_LOCK:
+        _MEMORY.clear()
+    if remove_files and os.path.isdir(CACHE_DIR):
+        for filename in os.listdir(CACHE_DIR):
+            os.remove(os.path.join(CACHE_DIR, filename))
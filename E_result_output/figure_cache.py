@@ -0,0 +1,46 @@
+# 仪表盘图表缓存：按 (标签页, 图表, 班级, 学号, 指标, 数据版本) 缓存已构建的 Plotly 图对象
+# - 老师连续切换学生时，回到看过的学生/指标直接复用图对象，不再重新拼 trace
+# - 容量有限，按最近使用淘汰（LRU）；数据版本变化后旧键自然不再命中，随后被淘汰
+# - 由 st.cache_resource 在进程内共享，各会话线程并发访问，读写加锁
+# - 缓存的图对象在会话间共享，调用方不要再修改
+
+import threading
+from collections import OrderedDict
+
+FIGURE_CACHE_SIZE = 256     # 约 40 名学生 × 每人若干张图
+
+
+class FigureCache:
+    """线程安全的 LRU 图表缓存"""
+
+    def __init__(self, max_entries=FIGURE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._figures = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_build(self, key, build):
+        """返回 (图, 是否命中)：命中时取缓存的图，否则调用 build() 构建并缓存"""
+        with self._lock:
+            if key in self._figures:
+                self._figures.move_to_end(key)
+                self.hits += 1
+                return self._figures[key], True
+            self.misses += 1
+        # 构建放在锁外，避免一张慢图阻塞其他会话
+        figure = build()
+        with self._lock:
+            self._figures[key] = figure
+            self._figures.move_to_end(key)
+            while len(self._figures) > self.max_entries:
+                self._figures.popitem(last=False)
+        return figure, False
+
+    def clear(self):
+        with self._lock:
+            self._figures.clear()
+            self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._figures)
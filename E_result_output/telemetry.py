@@ -0,0 +1,115 @@
+# 仪表盘响应时间监测：把每次重跑、每个标签页、每张图和数据加载的耗时写入本地滚动日志
+# - 每个仪表盘进程调用 setup(页面名) 后写入 ./logs/telemetry_<页面名>.log（单文件 1MB，保留 5 份）
+# - 每条记录一行 JSON：时间、页面、事件类型、名称、耗时（毫秒）及附加字段（缓存层级、是否命中、状态）
+# - 事件类型：rerun（整次重跑）、tab（标签页渲染）、figure（图表构建 + 渲染）、data_load（仪表盘 load_data）、
+#   table_load（data_access 单表加载，cache 为 memory / file / source，读盘时 format 为 feather / pickle）
+# - 未调用 setup 时（如离线脚本中使用 data_access）不写任何日志
+# - load_records / summarize 读取全部页面的日志供管理员标签页展示
+
+import os
+import glob
+import json
+import time
+import logging
+from contextlib import contextmanager
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+import numpy as np
+import pandas as pd
+
+LOG_DIR = "./logs"
+LOG_MAX_BYTES = 1024 * 1024
+LOG_BACKUP_COUNT = 5
+CACHE_HIT_TIERS = {"memory", "file", "hit"}     # table_load 的内存/文件缓存、figure 的图表缓存均算命中
+
+_logger = logging.getLogger("dashboard_telemetry")
+_logger.propagate = False
+_logger.setLevel(logging.INFO)
+_STATE = {"page": None}
+
+
+def setup(page, log_dir=LOG_DIR):
+    """为当前仪表盘进程配置滚动日志（Streamlit 每次重跑都会调用，只在首次添加 handler）"""
+    _STATE["page"] = page
+    if not _logger.handlers:
+        os.makedirs(log_dir, exist_ok=True)
+        handler = RotatingFileHandler(f"{log_dir}/telemetry_{page}.log", maxBytes=LOG_MAX_BYTES,
+                                      backupCount=LOG_BACKUP_COUNT, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        _logger.addHandler(handler)
+
+
+def log_event(event, name, ms, **fields):
+    """写一条耗时记录"""
+    if not _logger.handlers:
+        return
+    record = {"ts": datetime.now().isoformat(timespec="milliseconds"), "page": _STATE["page"],
+              "event": event, "name": name, "ms": round(ms, 3)}
+    record.update(fields)
+    _logger.info(json.dumps(record, ensure_ascii=False, default=str))
+
+
+class Timer:
+    """计时器：由 timed 创建并在退出时结束，也可提前调用 finish 指定状态（如 st.stop 前记为 stopped）"""
+
+    def __init__(self, event, name=None, **fields):
+        self.event, self.name, self.fields = event, name, fields
+        self.start = time.perf_counter()
+        self.finished = False
+
+    def finish(self, **fields):
+        """记录耗时，重复调用只记一次"""
+        if self.finished:
+            return
+        self.finished = True
+        log_event(self.event, self.name, (time.perf_counter() - self.start) * 1000, **{**self.fields, **fields})
+
+
+@contextmanager
+def timed(event, name=None, **fields):
+    """计时上下文（也可作装饰器）；Streamlit 的 st.stop / 重跑中断记为 interrupted"""
+    timer = Timer(event, name, **fields)
+    status = "ok"
+    try:
+        yield timer
+    except Exception:
+        status = "error"
+        raise
+    except BaseException:
+        status = "interrupted"
+        raise
+    finally:
+        timer.finish(status=status)
+
+
+def load_records(log_dir=LOG_DIR):
+    """读取全部页面的日志（含已滚动的旧文件），返回按时间排序的记录表"""
+    records = []
+    for path in glob.glob(f"{log_dir}/telemetry_*.log*"):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    if not records:
+        return pd.DataFrame(columns=["ts", "page", "event", "name", "ms"])
+    df = pd.DataFrame(records)
+    df["ts"] = pd.to_datetime(df["ts"])
+    return df.sort_values("ts").reset_index(drop=True)
+
+
+def summarize(records):
+    """按 (页面, 事件, 名称) 汇总次数、耗时分位数与缓存命中率"""
+    if records.empty:
+        return pd.DataFrame()
+    df = records.copy()
+    df["name"] = df["name"].fillna("")
+    cache = df["cache"] if "cache" in df.columns else pd.Series(np.nan, index=df.index)
+    df["cache_hit"] = np.where(cache.isna(), np.nan, cache.isin(CACHE_HIT_TIERS).astype(float))
+    grouped = df.groupby(["page", "event", "name"], sort=True)
+    summary = grouped["ms"].agg(次数="count", 平均毫秒="mean", 中位毫秒="median",
+                                P95毫秒=lambda s: s.quantile(0.95), 最大毫秒="max")
+    summary["缓存命中率"] = grouped["cache_hit"].mean()
+    return summary.reset_index().sort_values("P95毫秒", ascending=False)